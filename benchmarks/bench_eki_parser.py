@@ -0,0 +1,107 @@
+"""Compares the single-pass EKI extraction against re-querying the whole page for each entry.
+
+Pass a directory of saved EKI pages (ies/*.html for translations, ekss/*.html for examples) to run on those,
+otherwise pages in EKI's markup are built with an increasing number of entries. Run from the project root:
+    python -m benchmarks.bench_eki_parser [<saved pages dir>]
+"""
+from io import StringIO
+import pathlib
+import re
+import sys
+import timeit
+from typing import (
+    List,
+    Tuple,
+)
+
+from lxml import etree
+
+from viktor.core.eki_parser import (
+    extract_examples,
+    extract_translations,
+    parse_html,
+)
+
+WORD = 'maja'
+ENTRY_COUNTS = [5, 25, 100, 250]
+
+
+def build_ies_page(n_entries: int) -> bytes:
+    entries = []
+    for i in range(n_entries):
+        headword = WORD if i % 5 == 0 else f'{WORD}{i}'
+        entries.append(f'<div class="tervikart"><p><span lang="et">{headword}</span> <i>s</i> '
+                       f'<span lang="en">house {i}</span>, <span lang="en">home {i}</span></p></div>')
+    return f'<html><body><div id="results">{"".join(entries)}</div></body></html>'.encode('utf-8')
+
+
+def build_ekss_page(n_entries: int) -> bytes:
+    entries = []
+    for i in range(n_entries):
+        # The matching entry comes last, as the worst case
+        headword = WORD if i == n_entries - 1 else f'{WORD}{i}'
+        entries.append(f'<div class="tervikart"><p><span class="m leitud_id">{headword}</span> '
+                       f'<span class="n">Suur {headword}. Vana {headword}! Kas see on {headword}?</span></p></div>')
+    return f'<html><body><div id="results">{"".join(entries)}</div></body></html>'.encode('utf-8')
+
+
+def per_index_translations(content: bytes, word: str) -> List[str]:
+    """Roughly what happened before: decode, re-wrap & parse, then two whole-page queries per entry"""
+    tree = etree.parse(StringIO(content.decode('utf-8')), parser=etree.HTMLParser())
+    result = []
+    for i in range(len(tree.xpath('//div[@class="tervikart"]'))):
+        et_result = tree.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@lang="et"]')
+        en_result = tree.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@lang="en"]')
+        if word in [''.join(x.itertext()) for x in et_result]:
+            result += [''.join(x.itertext()) for x in en_result]
+    return result
+
+
+def per_index_examples(content: bytes, word: str) -> List[str]:
+    tree = etree.parse(StringIO(content.decode('utf-8')), parser=etree.HTMLParser())
+    for i in range(len(tree.xpath('//div[@class="tervikart"]'))):
+        result = tree.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@class="m leitud_id"]')
+        examples = tree.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@class="n"]')
+        if word in [''.join(x.itertext()) for x in result]:
+            exp_list = re.split(r'[?.!]', ''.join([''.join(x.itertext()) for x in examples]))
+            return [x.strip() for x in exp_list if x.strip() != '']
+    return []
+
+
+def load_pages(pages_dir: pathlib.Path) -> Tuple[List[Tuple[str, bytes]], List[Tuple[str, bytes]]]:
+    ies = [(x.name, x.read_bytes()) for x in sorted(pages_dir.glob('ies/*.html'))]
+    ekss = [(x.name, x.read_bytes()) for x in sorted(pages_dir.glob('ekss/*.html'))]
+    return ies, ekss
+
+
+def time_per_call(func, content: bytes) -> float:
+    n = 20
+    return min(timeit.repeat(lambda: func(content, WORD), number=n, repeat=5)) / n
+
+
+def main():
+    if len(sys.argv) > 1:
+        ies_pages, ekss_pages = load_pages(pathlib.Path(sys.argv[1]))
+    else:
+        ies_pages = [(f'{n} entries', build_ies_page(n)) for n in ENTRY_COUNTS]
+        ekss_pages = [(f'{n} entries', build_ekss_page(n)) for n in ENTRY_COUNTS]
+
+    cases = [
+        ('translations (ies)', ies_pages, per_index_translations,
+         lambda content, word: extract_translations(parse_html(content), word, target='en')),
+        ('examples (ekss)', ekss_pages, per_index_examples,
+         lambda content, word: extract_examples(parse_html(content), word)),
+    ]
+    for name, pages, old_func, new_func in cases:
+        print(f'{name}:')
+        for page_name, content in pages:
+            # Make sure both ways pull out the same thing
+            assert old_func(content, WORD) == new_func(content, WORD), page_name
+            old_s = time_per_call(old_func, content)
+            new_s = time_per_call(new_func, content)
+            print(f'\t{page_name:>20}: per-index queries {old_s * 1e3:8.2f} ms, '
+                  f'single pass {new_s * 1e3:8.2f} ms ({old_s / new_s:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Times the message path with and without the TriggerScreen in front of it.
+
+SlackBotBase (slacktools) matches the command for every message it's handed, by trying each pattern in turn. The
+screened path is the screen plus that same loop for triggered messages - those pay a little more than before.
+Messages without a trigger skip the loop, along with the rest of SlackBotBase's message parsing, which isn't
+measured here.
+
+Uses the real viktor/commands.yaml. Run from the project root:
+    python -m benchmarks.bench_trigger_screen
+"""
+import random
+import re
+import timeit
+from typing import List
+
+import yaml
+
+from viktor import ROOT_PATH
+from viktor.core.trigger_screen import TriggerScreen
+
+TRIGGERS = ['viktor', 'v!']
+N_MESSAGES = 10000
+# Share of channel messages that are actually addressed to the bot
+TRIGGERED_SHARE = 0.05
+
+
+def load_patterns() -> List[str]:
+    with ROOT_PATH.parent.joinpath('commands.yaml').open() as f:
+        groups = yaml.safe_load(f)['commands']
+    return [pattern for group in groups.values() for pattern in group.keys()]
+
+
+def build_messages() -> List[str]:
+    commands = ['help', 'uwu that', 'insult me -n 5', 'phrase -g work', 'ag lol -n 3', 'facts',
+                'conspiracy fact', 'show my perks', 'e[t] keel', 'lemma olema', 'bot timeout', 'not a command']
+    chatter = ['anyone up for lunch?', 'lol', 'did the deploy go out', 'viktory is ours', 'pls review my pr',
+               'https://example.com/some/link', ':party-parrot:', 'brb']
+    random.seed(1)
+    messages = []
+    for _ in range(N_MESSAGES):
+        if random.random() < TRIGGERED_SHARE:
+            messages.append(f'{random.choice(TRIGGERS)} {random.choice(commands)}')
+        else:
+            messages.append(random.choice(chatter))
+    return messages
+
+
+def per_pattern_loop(messages: List[str], patterns: List[str]):
+    """Roughly what SlackBotBase does: each message is matched pattern by pattern"""
+    for text in messages:
+        lowered = text.lower()
+        for trigger in TRIGGERS:
+            if lowered.startswith(trigger):
+                message = lowered[len(trigger):].strip()
+                for pattern in patterns:
+                    if re.match(pattern, message) is not None:
+                        break
+                break
+
+
+def screened(messages: List[str], patterns: List[str], trigger_screen: TriggerScreen):
+    """Only messages that get past the screen are handed on to the per-pattern loop"""
+    for text in messages:
+        if trigger_screen.screen(text):
+            per_pattern_loop([text], patterns)
+
+
+def main():
+    patterns = load_patterns()
+    trigger_screen = TriggerScreen(triggers=TRIGGERS)
+    messages = build_messages()
+    commands_only = [x for x in messages if trigger_screen.is_triggered(x)]
+
+    print(f'{len(patterns)} command patterns, {len(messages)} messages ({len(commands_only)} with a trigger)')
+    for name, msgs in [('all messages', messages), ('triggered messages only', commands_only)]:
+        loop_s = min(timeit.repeat(lambda: per_pattern_loop(msgs, patterns), number=1, repeat=5))
+        screened_s = min(timeit.repeat(lambda: screened(msgs, patterns, trigger_screen), number=1, repeat=5))
+        print(f'{name}:')
+        print(f'\tper-pattern loop:          {loop_s / len(msgs) * 1e6:8.2f} us/msg')
+        print(f'\tscreen + per-pattern loop: {screened_s / len(msgs) * 1e6:8.2f} us/msg')
+
+
+if __name__ == '__main__':
+    main()
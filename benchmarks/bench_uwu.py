@@ -0,0 +1,126 @@
+"""Compares the precompiled UwuEngine against converting word by word with uncompiled patterns.
+
+Measures words/sec on long messages and on deep block payloads (run through `recursive_uwu`, as with uwu that).
+Run from the project root:
+    python -m benchmarks.bench_uwu
+"""
+import copy
+import random
+import re
+import timeit
+from typing import (
+    Dict,
+    List,
+)
+
+from viktor.core.uwu import (
+    UWU,
+    UwuEngine,
+    recursive_uwu,
+)
+
+VOCAB = ['the', 'that', 'is', 'has', 'back', 'love', 'none', 'Really', 'LOL', 'said', 'The', 'another', 'nothing',
+         'clock', 'rolling', 'over', 'nation', 'dough', 'bounce', 'thanks!', '<https://example.com|a link>',
+         '<@U123ABC>', 'math', 'CLEARLY', 'knack', 'banana', 'says']
+N_WORDS = 2000
+
+
+def legacy_convert(message: str, stutter: float = UWU.STUTTER, owo_repeater: float = UWU.OWO_REPEATER) -> str:
+    """Roughly what happened before: a translate table & five uncompiled subs for every word"""
+    converted = re.sub(r'^[Uu][Ww][Uu]', '', message).strip()
+    words = []
+    for word in converted.split(' '):
+        if word.startswith('<') or word.startswith('&lt;') or word.endswith('>'):
+            if '|' in word:
+                link_split = word.split('|')
+                link_name = link_split[1].translate(str.maketrans('rRlL', 'wWwW'))
+                word = '|'.join([link_split[0], link_name])
+            words.append(word)
+            continue
+        word = word.translate(str.maketrans('rRlL', 'wWwW'))
+        lower_word = word.lower()
+        if lower_word in UWU.word_map.keys():
+            new_lower_word = UWU.word_map[lower_word]
+            if word.islower():
+                word = new_lower_word
+            elif word.istitle():
+                word = new_lower_word.title()
+            elif word.isupper():
+                word = new_lower_word.upper()
+            else:
+                word = new_lower_word
+        for pattern, replacement in UWU.char_cluster_map.items():
+            word = re.sub(pattern=pattern, repl=replacement, string=word)
+        if len(word) > 1 and re.match(r'\w', word[0]) and random.random() <= stutter:
+            for i in range(random.randint(1, 4)):
+                word = f'{word[0]}-{word}'
+        if len(word) > 4 and random.random() <= owo_repeater:
+            for uwu_type, repeat_list in UWU.repeater_map.items():
+                for frag in repeat_list:
+                    if frag in word:
+                        word = word.replace(uwu_type[0], uwu_type)
+        words.append(word)
+    return ' '.join(words)
+
+
+def build_message(n_words: int) -> str:
+    return ' '.join(random.choice(VOCAB) for _ in range(n_words))
+
+
+def build_blocks(depth: int, width: int) -> Dict:
+    """Nested attachments/blocks, with a short text field at every level"""
+    if depth == 0:
+        return {'type': 'mrkdwn', 'text': build_message(12)}
+    return {
+        'title': build_message(4),
+        'fallback': build_message(6),
+        'blocks': [build_blocks(depth - 1, width) for _ in range(width)],
+    }
+
+
+def count_words(payload) -> int:
+    n = 0
+
+    def count(text: str) -> str:
+        nonlocal n
+        n += len(text.split(' '))
+        return text
+
+    recursive_uwu(None, copy.deepcopy(payload), replace_func=count)
+    return n
+
+
+def words_per_sec(func, n_words: int) -> float:
+    return n_words / min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main():
+    random.seed(1)
+    engine = UWU.get_uwu_engine()
+    # Without the random stutter/owo, both ways have to give the same output
+    no_random = UwuEngine(char_cluster_map=UWU.char_cluster_map, word_map=UWU.word_map,
+                          repeater_map=UWU.repeater_map, stutter=0, owo_repeater=0)
+    for _ in range(200):
+        message = build_message(50)
+        assert legacy_convert(message, stutter=0, owo_repeater=0) == no_random.convert(message), message
+
+    message = build_message(N_WORDS)
+    blocks = [build_blocks(depth=4, width=3) for _ in range(5)]
+    n_block_words = count_words(blocks)
+    cases = [
+        (f'long message ({N_WORDS} words)', N_WORDS,
+         lambda: legacy_convert(message), lambda: engine.convert(message)),
+        (f'deep blocks ({n_block_words} words)', n_block_words,
+         lambda: recursive_uwu(None, copy.deepcopy(blocks), replace_func=legacy_convert),
+         lambda: recursive_uwu(None, copy.deepcopy(blocks), replace_func=engine.convert)),
+    ]
+    for name, n_words, legacy_func, engine_func in cases:
+        legacy_wps = words_per_sec(legacy_func, n_words)
+        engine_wps = words_per_sec(engine_func, n_words)
+        print(f'{name}:')
+        print(f'\tper-word subs: {legacy_wps:12,.0f} words/sec')
+        print(f'\tcompiled:      {engine_wps:12,.0f} words/sec ({engine_wps / legacy_wps:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,7 @@ class TestViktor(TestCase):
 
         self.mock_config = MagicMock(name='config')
         self.mock_config.UPDATE_DATE = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
+        self.mock_config.WORD_LOOKUP_CACHE_PATH = ':memory:'
 
         self.mock_creds = {
             'team': 't;a',
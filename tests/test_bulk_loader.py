@@ -0,0 +1,76 @@
+from datetime import datetime
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from viktor.etl.bulk_loader import (
+    copy_rows,
+    to_copy_value,
+)
+from viktor.model import (
+    ResponseCategory,
+    ResponseType,
+    TableEmoji,
+    TableResponse,
+)
+
+from .common import get_test_logger
+
+
+class TestBulkLoader(TestCase):
+
+    def setUp(self) -> None:
+        self.log = get_test_logger()
+        self.mock_engine = MagicMock(name='Engine')
+        self.mock_engine.dialect = postgresql.dialect()
+        self.mock_cursor = self.mock_engine.raw_connection.return_value.cursor.return_value.__enter__.return_value
+        self.copied = []
+        self.mock_cursor.copy_expert.side_effect = lambda sql, buf: self.copied.append((sql, buf.read()))
+
+    def test_to_copy_value(self):
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual('\\N', to_copy_value(None))
+        self.assertEqual('\\N', to_copy_value(float('nan')))
+        self.assertEqual('INSULT', to_copy_value(ResponseType.INSULT))
+        self.assertEqual('t', to_copy_value(True))
+        self.assertEqual('2022-03-04T05:06:07', to_copy_value(datetime(2022, 3, 4, 5, 6, 7)))
+        self.assertEqual('tab\\there\\nnewline \\\\', to_copy_value('tab\there\nnewline \\'))
+        self.assertEqual('{"a","b \\\\"c\\\\"",NULL}', to_copy_value(['a', 'b "c"', None]))
+
+    def test_copy_rows(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        rows = ({'type': ResponseType.FACT, 'category': ResponseCategory.STANDARD, 'text': f'fact {i}'}
+                for i in range(5))
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        stats = copy_rows(self.mock_engine, TableResponse, rows, log=self.log, chunk_size=2)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Stage, is_user_added and is_deleted aren't in the rows, but they have defaults
+        self.assertEqual(3, len(self.copied))
+        self.assertEqual('COPY viktor.response (type, category, stage, text, is_user_added, is_deleted) FROM STDIN',
+                         self.copied[0][0])
+        self.assertEqual('FACT\tSTANDARD\t1\tfact 0\tf\tf\nFACT\tSTANDARD\t1\tfact 1\tf\tf\n', self.copied[0][1])
+        self.assertEqual(5, stats['rows'])
+        self.mock_engine.raw_connection.return_value.commit.assert_called_once()
+
+    def test_copy_rows_errors(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        stats = copy_rows(self.mock_engine, TableEmoji, [], log=self.log)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(0, stats['rows'])
+        self.mock_engine.raw_connection.assert_not_called()
+        with self.assertRaises(ValueError):
+            copy_rows(self.mock_engine, TableEmoji, [{'name': 'party', 'colour': 'red'}], log=self.log)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import pathlib
+from tempfile import TemporaryDirectory
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.cache import (
+    BucketedDedupeStore,
+    PersistentLookupCache,
+    TTLCache,
+)
+
+
+class TestBucketedDedupeStore(TestCase):
+
+    def setUp(self) -> None:
+        self.bucket = 'hour-1'
+        self.store = BucketedDedupeStore(max_keys=3, max_buckets=2, bucket_func=lambda: self.bucket)
+
+    def test_check_and_add(self):
+        self.assertTrue(self.store.check_and_add('a'))
+        self.assertFalse(self.store.check_and_add('a'))
+        self.assertIn('a', self.store)
+        stats = self.store.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    def test_expires_by_bucket(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        self.store.check_and_add('a')
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.bucket = 'hour-2'
+        is_new_in_next_hour = self.store.check_and_add('a')
+        self.bucket = 'hour-3'
+        self.store.check_and_add('b')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertTrue(is_new_in_next_hour)
+        self.assertEqual(1, self.store.get_stats()['expirations'])
+        self.assertEqual(2, len(self.store))
+
+    def test_max_keys_ceiling(self):
+        for key in 'abcde':
+            self.store.check_and_add(key)
+        self.assertEqual(3, len(self.store))
+        self.assertEqual(2, self.store.get_stats()['evictions'])
+        self.assertNotIn('a', self.store)
+        self.assertIn('e', self.store)
+
+
+class TestTTLCache(TestCase):
+
+    def test_get_or_load(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        cache = TTLCache(max_size=10, ttl=60)
+        mock_loader = MagicMock(name='loader', return_value=None)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        first = cache.get_or_load('U123', mock_loader)
+        second = cache.get_or_load('U123', mock_loader)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Lookups that found nothing are cached as well
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        mock_loader.assert_called_once()
+        self.assertEqual(0.5, cache.get_stats()['hit_ratio'])
+
+    def test_expiry_and_invalidation(self):
+        cache = TTLCache(max_size=10, ttl=-1)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a', None))
+        self.assertEqual(1, cache.get_stats()['expirations'])
+
+        cache.ttl = 60
+        cache.set('a', 1)
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a', None))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Touch 'a' so 'b' becomes the least recently used
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b', None))
+        self.assertEqual(1, cache.get_stats()['evictions'])
+
+
+class TestPersistentLookupCache(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name).joinpath('lookups.sqlite')
+        self.cache = PersistentLookupCache(path=self.path, ttl=60, negative_ttl=60, max_size=10)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_or_load(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_loader = MagicMock(name='loader', return_value=['tere', 'hello'])
+        mock_missing_loader = MagicMock(name='missing_loader', return_value=None)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        for _ in range(2):
+            self.cache.get_or_load('translation_en', 'tere', mock_loader)
+            self.cache.get_or_load('lemma', 'asdf', mock_missing_loader)
+        # A fresh instance only has the disk to go on
+        restarted = PersistentLookupCache(path=self.path, ttl=60, negative_ttl=60)
+        from_disk = restarted.get_or_load('translation_en', 'tere', mock_loader)
+        from_memory = restarted.get_or_load('translation_en', 'tere', mock_loader)
+        restarted.close()
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        mock_loader.assert_called_once()
+        mock_missing_loader.assert_called_once()
+        self.assertEqual(['tere', 'hello'], from_disk)
+        self.assertEqual(['tere', 'hello'], from_memory)
+        stats = self.cache.get_stats()
+        self.assertEqual((1, 1, 0.5), tuple(stats['translation_en'][k] for k in ['misses', 'memory_hits',
+                                                                                   'hit_ratio']))
+        self.assertEqual(1, stats['lemma']['negative_hits'])
+        self.assertEqual((1, 1), tuple(restarted.get_stats()['translation_en'][k] for k in ['disk_hits',
+                                                                                           'memory_hits']))
+
+    def test_expiry(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.cache.negative_ttl = -1
+        mock_loader = MagicMock(name='loader', return_value=None)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.cache.get_or_load('etymology', 'asdf', mock_loader)
+        self.cache.get_or_load('etymology', 'asdf', mock_loader)
+        n_purged = self.cache.purge_expired()
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(2, mock_loader.call_count)
+        self.assertEqual(1, n_purged)
+
+    def test_loader_error_not_cached(self):
+        mock_loader = MagicMock(name='loader', side_effect=[ConnectionError, 'tere'])
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_load('lemma', 'tere', mock_loader)
+        self.assertEqual('tere', self.cache.get_or_load('lemma', 'tere', mock_loader))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.channel_stats import ChannelStatsEngine
+from viktor.core.rate_limit import TokenBucket
+
+from ..common import get_test_logger
+
+
+def make_page(messages: list, next_cursor: str = None) -> MagicMock:
+    return MagicMock(data={
+        'messages': messages,
+        'has_more': next_cursor is not None,
+        'response_metadata': {'next_cursor': next_cursor or ''},
+    })
+
+
+class TestChannelStatsEngine(TestCase):
+
+    def setUp(self) -> None:
+        self.mock_client = MagicMock(name='WebClient')
+        self.mock_eng = MagicMock(name='ViktorPSQLClient')
+        self.mock_eng.get_display_names.side_effect = lambda hashes: {
+            k: v for k, v in {'U1': 'dinkus', 'B1': 'somebot'}.items() if k in hashes
+        }
+        self.engine = ChannelStatsEngine(client=self.mock_client, eng=self.mock_eng, parent_log=get_test_logger(),
+                                         bucket=TokenBucket(rate=10000, capacity=10))
+
+    def test_get_channel_stats(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_client.conversations_history.side_effect = [
+            # Full history, newest first, over two pages
+            make_page([{'user': 'U1', 'text': 'abcd', 'ts': '3.0'}, {'user': 'U2', 'text': 'ab', 'ts': '2.0'}],
+                      next_cursor='page2'),
+            make_page([{'bot_id': 'B1', 'text': 'abcdef', 'ts': '1.0'}, {'user': 'U1', 'text': 'ab', 'ts': '0.5'}]),
+            # Only what's new
+            make_page([{'user': 'U1', 'text': 'abcdefgh', 'ts': '4.0'}]),
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        n_messages, rows = self.engine.get_channel_stats('C1')
+        n_messages_2, rows_2 = self.engine.get_channel_stats('C1')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(4, n_messages)
+        self.assertEqual([('dinkus', 2, 3.), ('Unknown User', 1, 2.), ('somebot', 1, 6.)], rows)
+        self.assertEqual(5, n_messages_2)
+        self.assertEqual(('dinkus', 3, 14 / 3), rows_2[0])
+        calls = self.mock_client.conversations_history.call_args_list
+        self.assertEqual((None, 'page2', '3.0'), tuple(x.kwargs.get(k) for x, k in zip(
+            calls, ['oldest', 'cursor', 'oldest'])))
+        stats = self.engine.get_stats()
+        self.assertEqual((3, 5), (stats['pages_fetched'], stats['messages_tallied']))
+
+    def test_failed_refresh_leaves_tally(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_client.conversations_history.side_effect = [
+            make_page([{'user': 'U1', 'text': 'abcd', 'ts': '3.0'}], next_cursor='page2'),
+            ValueError('boom'),
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        with self.assertRaises(ValueError):
+            self.engine.get_channel_stats('C1')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Nothing was tallied, so the next refresh starts over from the beginning
+        self.assertEqual(0, self.engine.tallies['C1'].n_messages)
+        self.assertIsNone(self.engine.tallies['C1'].latest_ts)
+
+
+if __name__ == '__main__':
+    main()
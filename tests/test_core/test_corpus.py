@@ -0,0 +1,141 @@
+from collections import namedtuple
+from datetime import datetime
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.corpus import (
+    AcronymIndex,
+    ResponseCorpus,
+)
+from viktor.model import (
+    AcronymType,
+    ResponseCategory,
+    ResponseType,
+)
+
+ResponseRow = namedtuple('ResponseRow', ['response_id', 'type', 'category', 'stage', 'text'])
+UwuRow = namedtuple('UwuRow', ['graphic'])
+UPDATED = datetime(2023, 1, 1)
+EmojiRow = namedtuple('EmojiRow', ['name'])
+AcronymRow = namedtuple('AcronymRow', ['acronym_id', 'text', 'update_date'])
+
+
+class TestResponseCorpus(TestCase):
+
+    def setUp(self) -> None:
+        self.mock_eng = MagicMock(name='ViktorPSQLClient')
+        self.mock_session = self.mock_eng.session_mgr.return_value.__enter__.return_value
+        self.mock_session.query().filter().order_by().all.return_value = [
+            ResponseRow(i, ResponseType.FACT, ResponseCategory.STANDARD, 1, f'fact {i}') for i in range(1, 11)
+        ] + [
+            ResponseRow(11, ResponseType.GENERAL, ResponseCategory.SARCASTIC, 1, 'sure'),
+            ResponseRow(12, ResponseType.INSULT, ResponseCategory.STANDARD, 1, 'big'),
+            ResponseRow(13, ResponseType.INSULT, ResponseCategory.STANDARD, 1, 'huge'),
+            ResponseRow(14, ResponseType.INSULT, ResponseCategory.STANDARD, 1, 'tiny'),
+            ResponseRow(15, ResponseType.INSULT, ResponseCategory.STANDARD, 2, 'dingus'),
+            ResponseRow(16, ResponseType.INSULT, ResponseCategory.STANDARD, 2, 'goober'),
+        ]
+        # Uwu graphics, then emoji names
+        self.mock_session.query().filter().all.side_effect = [
+            [UwuRow('(◕ᴥ◕)'), UwuRow('ʕ•ᴥ•ʔ')],
+            [EmojiRow('party'), EmojiRow('blob')],
+        ]
+        self.mock_eng.session_mgr.reset_mock()
+
+        self.corpus = ResponseCorpus(self.mock_eng)
+
+    def test_sample(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        facts = self.corpus.sample(ResponseType.FACT, ResponseCategory.STANDARD, k=20)
+        repeats = self.corpus.sample(ResponseType.FACT, ResponseCategory.STANDARD, k=20, is_replace=True)
+        missing = self.corpus.sample(ResponseType.INSULT, ResponseCategory.WORK)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Without replacement, the draw is capped at the size of the bucket and has no duplicates
+        self.assertEqual(10, len(facts))
+        self.assertEqual(10, len(set(facts)))
+        self.assertEqual(20, len(repeats))
+        self.assertEqual([], missing)
+        self.assertEqual(2, len(set(self.corpus.sample_uwu_graphics(k=2))))
+        self.assertEqual(['blob', 'party'], sorted(self.corpus.sample_emoji_names(k=5)))
+        # Loaded only once
+        self.mock_eng.session_mgr.assert_called_once()
+
+    def test_sample_stages(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        word_lists = self.corpus.sample_stages(ResponseType.INSULT, ResponseCategory.STANDARD, k=3)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Stage 2 only has two words, so the last phrase only gets a word from stage 1
+        self.assertEqual([2, 2, 1], [len(x) for x in word_lists])
+        self.assertEqual({'big', 'huge', 'tiny'}, {x[0] for x in word_lists})
+        self.assertEqual({'dingus', 'goober'}, {x[1] for x in word_lists[:2]})
+        self.assertEqual([], self.corpus.sample_stages(ResponseType.INSULT, ResponseCategory.STANDARD, k=0))
+
+    def test_add_response(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.corpus.add_response(12, ResponseType.FACT, ResponseCategory.FOILHAT, 'birds are drones')
+        resp = self.corpus.sample(ResponseType.FACT, ResponseCategory.FOILHAT)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual([(12, 'birds are drones')], resp)
+        stats = self.corpus.get_stats()
+        self.assertEqual({'FACT/FOILHAT': 1, 'FACT/STANDARD': 10, 'GENERAL/SARCASTIC': 1, 'INSULT/STANDARD': 5},
+                         stats['responses'])
+        self.assertEqual(1, stats['loads'])
+
+
+class TestAcronymIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.mock_eng = MagicMock(name='ViktorPSQLClient')
+        self.mock_session = self.mock_eng.session_mgr.return_value.__enter__.return_value
+        self.mock_session.query().filter().all.return_value = [
+            AcronymRow(1, 'Banana', UPDATED),
+            AcronymRow(2, 'bread\n', UPDATED),
+            AcronymRow(3, 'a', UPDATED),
+            AcronymRow(4, 'cheese', UPDATED),
+        ]
+        self.mock_session.query().filter().group_by().all.return_value = [(AcronymType.STANDARD, 4, 4, UPDATED)]
+        self.mock_eng.session_mgr.reset_mock()
+
+        self.acronym_index = AcronymIndex(self.mock_eng, check_interval=0)
+
+    def test_get_index(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        word_dict = self.acronym_index.get_index(AcronymType.STANDARD)
+        _ = self.acronym_index.get_index(AcronymType.STANDARD)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['banana', 'bread'], word_dict['b'])
+        self.assertEqual([], word_dict['a'])
+        self.assertEqual(1, self.acronym_index.get_stats()['builds'])
+
+    def test_reloaded_table_invalidates(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        _ = self.acronym_index.get_index(AcronymType.STANDARD)
+        # ETL reloaded the table
+        self.mock_session.query().filter().group_by().all.return_value = [(AcronymType.STANDARD, 5, 9, UPDATED)]
+        _ = self.acronym_index.get_index(AcronymType.STANDARD)
+        # ETL soft-deleted a word and revived another
+        self.mock_session.query().filter().group_by().all.return_value = [
+            (AcronymType.STANDARD, 4, 4, datetime(2023, 1, 2))
+        ]
+        _ = self.acronym_index.get_index(AcronymType.STANDARD)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        stats = self.acronym_index.get_stats()
+        self.assertEqual(3, stats['builds'])
+        self.assertEqual(2, stats['invalidations'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from viktor.core.eki_parser import (
+    extract_examples,
+    extract_translations,
+    parse_html,
+)
+
+IES_PAGE = '''
+<html><body>
+<div class="tervikart"><p><span lang="et">maja</span> <span lang="en">house</span>, <span lang="en">Home</span></p></div>
+<div class="tervikart"><p><span lang="et">majake</span> <span lang="en">cottage</span></p></div>
+<div class="tervikart"><p><span lang="et">maja</span> <span lang="en">building</span></p></div>
+</body></html>
+'''.encode('utf-8')
+
+EKSS_PAGE = '''
+<html><body>
+<div class="tervikart"><p><span class="m leitud_id">maa</span> <span class="n">Maa on ümmargune. </span></p></div>
+<div class="tervikart"><p><span class="m leitud_id">maja</span> <span class="n">Suur maja. Vana </span><span class="n">
+    maja! Kas see on maja?</span></p></div>
+</body></html>
+'''.encode('utf-8')
+
+
+class TestEKIParser(TestCase):
+
+    def test_extract_translations(self):
+        root = parse_html(IES_PAGE)
+        self.assertEqual(['house', 'Home', 'building'], extract_translations(root, 'maja', target='en'))
+        self.assertEqual(['majake'], extract_translations(root, 'cottage', target='et'))
+        self.assertEqual([], extract_translations(root, 'koer', target='en'))
+
+    def test_extract_examples(self):
+        root = parse_html(EKSS_PAGE)
+        self.assertEqual(['Suur maja', 'Vana \n    maja', 'Kas see on maja'], extract_examples(root, 'maja'))
+        self.assertEqual(['Maa on ümmargune'], extract_examples(root, 'maa'))
+        self.assertEqual([], extract_examples(root, 'koer'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.emoji_catalog import (
+    EmojiCatalog,
+    get_literal_prefix,
+)
+
+
+def make_eng(names: list) -> MagicMock:
+    mock_eng = MagicMock(name='ViktorPSQLClient')
+    mock_session = mock_eng.session_mgr.return_value.__enter__.return_value
+    rows = []
+    for name in names:
+        # MagicMock's name kwarg doesn't set the attribute
+        row = MagicMock()
+        row.name = name
+        rows.append(row)
+    mock_session.query.return_value.filter.return_value.all.return_value = rows
+    return mock_eng
+
+
+class TestGetLiteralPrefix(TestCase):
+
+    def test_get_literal_prefix(self):
+        cases = {
+            'party': 'party',
+            'party.*': 'party',
+            'parrot-?': 'parrot',
+            'ab*c': 'a',
+            'a+': '',
+            'blob\\-': 'blob-',
+            'blob\\d': 'blob',
+            '^party': '',
+            '.*party': '',
+            '(party|blob)': '',
+            'party|blob': '',
+        }
+        for pattern, expected in cases.items():
+            self.assertEqual(expected, get_literal_prefix(pattern), pattern)
+
+
+class TestEmojiCatalog(TestCase):
+
+    def setUp(self) -> None:
+        self.names = ['party-parrot', 'partyblob', 'blob-wave', 'parrot', 'ablobcat', 'party']
+        self.catalog = EmojiCatalog(eng=make_eng(self.names))
+
+    def test_match(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        prefixed = self.catalog.match('party.*')
+        scanned = self.catalog.match('.*blob')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['party', 'party-parrot', 'partyblob'], prefixed)
+        self.assertEqual(['ablobcat', 'blob-wave', 'partyblob'], scanned)
+        stats = self.catalog.get_stats()
+        self.assertEqual((6, 'table', 2, 1), (stats['names'], stats['seeded_from'], stats['lookups'],
+                                              stats['prefix_lookups']))
+        # Only the prefixed names were looked at for the first lookup
+        self.assertEqual(3 + 6, stats['names_scanned'])
+
+    def test_events(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.catalog.add('party-corgi')
+        self.catalog.add('party')
+        self.catalog.rename('partyblob', 'blobparty')
+        self.catalog.remove(['party-parrot', 'not-there'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['party', 'party-corgi'], self.catalog.match('party'))
+        self.assertEqual(['blob-wave', 'blobparty'], self.catalog.match('blob'))
+        self.assertEqual(sorted(self.catalog.names), self.catalog.names)
+
+    def test_seed_from_api(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        mock_fetch = MagicMock(return_value={'b': 'url', 'a': 'url'}.keys())
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        catalog = EmojiCatalog(eng=make_eng([]), fetch_names=mock_fetch)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['a', 'b'], catalog.match('.'))
+        self.assertEqual('api', catalog.get_stats()['seeded_from'])
+        catalog.reload()
+        catalog.match('a')
+        self.assertEqual(2, mock_fetch.call_count)
+
+
+if __name__ == '__main__':
+    main()
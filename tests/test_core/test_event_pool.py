@@ -0,0 +1,76 @@
+import threading
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.event_pool import EventWorkerPool
+
+from ..common import get_test_logger
+
+
+class TestEventWorkerPool(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_test_logger()
+
+    def test_submit_and_drain(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        n_tasks = 20
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_task = MagicMock(name='task')
+        pool = EventWorkerPool(lanes={'reactions': 2}, parent_log=self.log, max_depth=50)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        for _ in range(n_tasks):
+            self.assertTrue(pool.submit('reactions', mock_task))
+        remaining = pool.shutdown(timeout=5)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(0, remaining)
+        self.assertEqual(n_tasks, mock_task.call_count)
+        stats = pool.get_stats()['reactions']
+        self.assertEqual(n_tasks, stats['submitted'])
+        self.assertEqual(n_tasks, stats['completed'])
+        self.assertEqual(0, stats['depth'])
+
+    def test_full_lane_runs_inline(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        started = threading.Event()
+        release = threading.Event()
+
+        def _blocking_task():
+            started.set()
+            release.wait()
+
+        pool = EventWorkerPool(lanes={'general': 1}, parent_log=self.log, max_depth=1, put_timeout=0.01)
+        inline_task = MagicMock(name='inline_task')
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        # Occupy the only worker, then fill the only slot in the queue
+        pool.submit('general', _blocking_task)
+        started.wait(timeout=5)
+        pool.submit('general', lambda: None)
+        is_queued = pool.submit('general', inline_task)
+        release.set()
+        pool.shutdown(timeout=5)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertFalse(is_queued)
+        inline_task.assert_called_once()
+        self.assertEqual(1, pool.get_stats()['general']['overflowed'])
+
+    def test_failed_task_is_counted(self):
+        pool = EventWorkerPool(lanes={'general': 1}, parent_log=self.log)
+        pool.submit('general', MagicMock(side_effect=ValueError('boom')))
+        pool.shutdown(timeout=5)
+        self.assertEqual(1, pool.get_stats()['general']['failed'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+import requests
+
+from viktor.core.http_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HttpClient,
+)
+
+
+class TestCircuitBreaker(TestCase):
+
+    def test_open_and_reset(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual('open', breaker.state)
+        self.assertFalse(breaker.allow())
+
+        # Once the timeout's passed, only one trial call is let through
+        breaker.reset_timeout = 0
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual('closed', breaker.state)
+        self.assertTrue(breaker.allow())
+
+
+class TestHttpClient(TestCase):
+
+    def setUp(self) -> None:
+        self.client = HttpClient(timeout=(1., 2.), failure_threshold=2, reset_timeout=60)
+        self.mock_session = self.client.session = MagicMock(name='Session')
+
+    def test_request(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_session.request.return_value = MagicMock(status_code=200)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.client.get('https://icanhazdadjoke.com/', headers={'Accept': 'application/json'})
+        self.client.post('https://hooks.slack.com/actions/1', json={}, timeout=5)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_session.request.assert_any_call('GET', 'https://icanhazdadjoke.com/',
+                                                  headers={'Accept': 'application/json'}, timeout=(1., 2.))
+        self.mock_session.request.assert_any_call('POST', 'https://hooks.slack.com/actions/1', json={}, timeout=5)
+        stats = self.client.get_stats()
+        self.assertEqual({'icanhazdadjoke.com', 'hooks.slack.com'}, set(stats.keys()))
+        self.assertEqual((1, 0, 'closed'), tuple(stats['hooks.slack.com'][k] for k in ['requests', 'errors',
+                                                                                        'circuit']))
+
+    def test_circuit_opens(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_session.request.side_effect = [requests.exceptions.ReadTimeout, MagicMock(status_code=503)]
+        # Call / Assert
+        # -------------------------------------------------------------------------------------------------------------
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.client.get('https://evilinsult.com/generate_insult.php')
+        self.assertEqual(503, self.client.get('https://evilinsult.com/generate_insult.php').status_code)
+        with self.assertRaises(CircuitOpenError):
+            self.client.get('https://evilinsult.com/generate_insult.php')
+        self.assertEqual(2, self.mock_session.request.call_count)
+        stats = self.client.get_stats()['evilinsult.com']
+        self.assertEqual((0, 2, 1, 'open'), tuple(stats[k] for k in ['requests', 'errors', 'rejected', 'circuit']))
+
+    def test_trial_call_raising_other_error(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_session.request.side_effect = [requests.exceptions.ConnectionError] * 2 + \
+            [ValueError('bad url'), MagicMock(status_code=200)]
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.client.get('https://evilinsult.com/generate_insult.php')
+        breaker = self.client.breakers['evilinsult.com']
+        breaker.reset_timeout = 0
+        # Call / Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # The trial call fails with something other than a requests error...
+        with self.assertRaises(ValueError):
+            self.client.get('https://evilinsult.com/generate_insult.php')
+        # ...which still ends the trial, so the next one goes through
+        self.assertFalse(breaker.is_trial_running)
+        self.assertEqual(200, self.client.get('https://evilinsult.com/generate_insult.php').status_code)
+        self.assertEqual('closed', breaker.state)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
+import pathlib
+from tempfile import TemporaryDirectory
 from unittest import (
     TestCase,
     main,
 )
 
+from viktor.core.cache import PersistentLookupCache
 from viktor.core.linguistics import Linguistics
 
 from ..common import make_patcher
@@ -16,16 +19,56 @@ class TestLinguistics(TestCase):
         url = 'not_a-real-url'
         # Build / populate mocks
         # -------------------------------------------------------------------------------------------------------------
-        mock_requests = make_patcher(self, 'viktor.core.linguistics.requests')
-        mock_etree = make_patcher(self, 'viktor.core.linguistics.etree')
-        mock_requests.get().content.decode.return_value = '<html></html>'
+        mock_http = make_patcher(self, 'viktor.core.linguistics.get_http_client').return_value
+        mock_parse_html = make_patcher(self, 'viktor.core.linguistics.parse_html')
+        mock_http.get.return_value.content = b'<html></html>'
         # Call
         # -------------------------------------------------------------------------------------------------------------
         Linguistics._prep_for_xpath(url)
         # Assert
         # -------------------------------------------------------------------------------------------------------------
-        mock_requests.get.assert_called_with(url)
-        mock_etree.HTMLParser.assert_called()
+        mock_http.get.assert_called_with(url)
+        mock_parse_html.assert_called_with(b'<html></html>')
+
+    def test_get_root_cached(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        tmp_dir = TemporaryDirectory()
+        cache = PersistentLookupCache(path=pathlib.Path(tmp_dir.name).joinpath('lookups.sqlite'))
+        Linguistics.set_lookup_cache(cache)
+        self.addCleanup(tmp_dir.cleanup)
+        self.addCleanup(cache.close)
+        self.addCleanup(Linguistics.set_lookup_cache, None)
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_http = make_patcher(self, 'viktor.core.linguistics.get_http_client').return_value
+        mock_http.get.return_value.content = '<strong>Sõna lemma on:</strong><br>tere<br>'.encode('utf-8')
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        lemmas = [Linguistics.get_root('tere') for _ in range(3)]
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['tere'] * 3, lemmas)
+        mock_http.get.assert_called_once()
+        self.assertEqual(2, cache.get_stats()['lemma']['memory_hits'])
+
+    def test_prep_message_for_translation(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_load_root = make_patcher(self, 'viktor.core.linguistics.Linguistics._load_root')
+        mock_load_root.side_effect = {'maja': 'maja', 'majad': 'maja', 'koerad': 'koer', 'asdf': None}.get
+        mock_load_translation = make_patcher(self, 'viktor.core.linguistics.Linguistics._load_translation')
+        mock_load_translation.side_effect = lambda word, target: {'maja': ['house'], 'koer': ['dog']}.get(word)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        resp = Linguistics.prep_message_for_translation('en maja majad koerad asdf', match_pattern=r'^e[nt]\s+')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual('`maja`: house\n`maja`: house\n`koer`: dog\nTranslation not found for `asdf`.', resp)
+        # Each word as given, plus the one lemma that wasn't among them
+        self.assertEqual({'maja', 'majad', 'koerad', 'asdf', 'koer'},
+                         {x.args[0] for x in mock_load_translation.call_args_list})
+        self.assertEqual(5, mock_load_translation.call_count)
 
 
 if __name__ == '__main__':
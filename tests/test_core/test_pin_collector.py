@@ -1,26 +1,73 @@
+from types import SimpleNamespace
 from unittest import (
     TestCase,
     main,
 )
+from unittest.mock import MagicMock
+
+from viktor.core.pin_collector import (
+    PinKeyLookup,
+    PinRef,
+    collect_pins_batch,
+)
+
+from ..common import get_test_logger
 
-from ..common import make_patcher
+
+def make_pin(author_uid: str, pinner_uid: str, channel_id: str, ts: str = '1650000000.0001') -> SimpleNamespace:
+    message = SimpleNamespace(user=author_uid, text='quotable', permalink=f'https://slack.com/{ts}', ts=ts,
+                              files=[SimpleNamespace(url_private='https://files.slack.com/x.png')],
+                              attachments=[])
+    return SimpleNamespace(message=message, created='1650000100', created_by=pinner_uid, channel=channel_id)
 
 
 class TestPinCollector(TestCase):
 
-    def test_pin_collector(self):
+    def setUp(self) -> None:
+        self.log = get_test_logger()
+        self.rows = [
+            ('user', 1, 'UUNKNOWN', 'BUNKNOWN', 'unknown'),
+            ('user', 2, 'U1', None, 'dinkus'),
+            ('user', 3, 'U2', 'B2', 'somebot'),
+            ('channel', 10, 'C1', None, None),
+        ]
+
+    def test_key_lookup(self):
         # Set Variables
         # -------------------------------------------------------------------------------------------------------------
+        key_lookup = PinKeyLookup(self.rows)
+        by_user = PinRef(make_pin('U1', 'U2', 'C1'), is_event=False)
+        by_bot = PinRef(make_pin('B2', 'U9', 'C9'), is_event=False)
+        event = SimpleNamespace(item=SimpleNamespace(message=SimpleNamespace(user='B7', username='SomeBot')),
+                                event_ts='1650000100', channel_id='C1', created_by='U1')
+        by_name = PinRef(event, is_event=True)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual((2, 3, 10), (key_lookup.get_author_key(by_user), key_lookup.get_pinner_key(by_user),
+                                      key_lookup.get_channel_key(by_user)))
+        # Unknown pinners and channels fall back to the unknown user and null
+        self.assertEqual((3, 1, None), (key_lookup.get_author_key(by_bot), key_lookup.get_pinner_key(by_bot),
+                                        key_lookup.get_channel_key(by_bot)))
+        self.assertEqual(3, key_lookup.get_author_key(by_name))
 
+    def test_collect_pins_batch(self):
         # Build / populate mocks
         # -------------------------------------------------------------------------------------------------------------
-
+        mock_eng = MagicMock(name='ViktorPSQLClient')
+        mock_session = mock_eng.session_mgr.return_value.__enter__.return_value
+        mock_session.execute.return_value.all.return_value = self.rows
         # Call
         # -------------------------------------------------------------------------------------------------------------
-
+        pins = [make_pin('U1', 'U2', 'C1', ts=f'16500000{i:02d}.0001') for i in range(50)]
+        quotes = collect_pins_batch(pins, psql_client=mock_eng, log=self.log, is_event=False)
         # Assert
         # -------------------------------------------------------------------------------------------------------------
-        pass
+        # All the lookups happen in one query, regardless of the number of pins
+        mock_session.execute.assert_called_once()
+        self.assertEqual(50, len(quotes))
+        self.assertEqual({(2, 3, 10)}, {(x.author_user_key, x.pinner_user_key, x.channel_key) for x in quotes})
+        self.assertEqual(['https://files.slack.com/x.png'], quotes[0].file_urls)
+        self.assertEqual([], collect_pins_batch([], psql_client=mock_eng, log=self.log, is_event=False))
 
 
 if __name__ == '__main__':
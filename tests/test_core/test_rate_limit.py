@@ -0,0 +1,48 @@
+import time
+from unittest import (
+    TestCase,
+    main,
+)
+
+from viktor.core.rate_limit import TokenBucket
+
+
+class TestTokenBucket(TestCase):
+
+    def test_acquire(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        bucket = TokenBucket(rate=50, capacity=2)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # The first two come out of the burst, the other two have to wait for a refill (~20ms each)
+        self.assertGreaterEqual(elapsed, 0.035)
+        stats = bucket.get_stats()
+        self.assertEqual(4, stats['acquired'])
+        self.assertGreater(stats['waits'], 0)
+        self.assertEqual(3000, TokenBucket.per_minute(3000).get_stats()['rate_per_min'])
+
+    def test_pause(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        bucket = TokenBucket(rate=1000, capacity=5)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        bucket.pause(0.05)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Paused callers don't get a token, even with a full bucket
+        self.assertGreater(bucket.try_acquire(), 0)
+        self.assertFalse(bucket.acquire(timeout=0.01))
+        self.assertTrue(bucket.acquire(timeout=1))
+        self.assertEqual(1, bucket.get_stats()['pauses'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import threading
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from slack_sdk.errors import SlackApiError
+
+from viktor.core.rate_limit import TokenBucket
+from viktor.core.slack_scheduler import (
+    COALESCED_METHODS,
+    ScheduledClient,
+    SlackScheduler,
+    get_method_name,
+)
+
+from ..common import get_test_logger
+
+
+def make_rate_limit_error(retry_after: str = '0') -> SlackApiError:
+    resp = MagicMock(status_code=429, headers={'Retry-After': retry_after})
+    return SlackApiError(message='ratelimited', response=resp)
+
+
+class TestSlackScheduler(TestCase):
+
+    def setUp(self) -> None:
+        self.mock_client = MagicMock(name='WebClient')
+        self.scheduler = SlackScheduler(client=self.mock_client, parent_log=get_test_logger(), max_retries=2)
+        self.client = ScheduledClient(self.scheduler)
+
+    def test_get_method_name(self):
+        self.assertEqual('chat.postMessage', get_method_name('chat_postMessage'))
+        self.assertEqual('users.profile.get', get_method_name('users_profile_get'))
+
+    def test_pass_through(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.client.api_call('some.method')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_client.api_call.assert_called_once_with('some.method')
+        self.assertEqual({}, self.scheduler.get_stats())
+
+    def test_retry_after(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_client.reactions_add.side_effect = [make_rate_limit_error(), {'ok': True}]
+        # A fast bucket, so refilling after the pause doesn't hold up the test
+        self.scheduler.buckets[('reactions.add', None)] = TokenBucket(rate=1000, capacity=1)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        resp = self.client.reactions_add(channel='C1', name='party', timestamp='1.0')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual({'ok': True}, resp)
+        stats = self.scheduler.get_stats()['reactions.add']
+        self.assertEqual((2, 1, 0), (stats['calls'], stats['throttled'], stats['errors']))
+        self.assertEqual(1, self.scheduler.buckets[('reactions.add', None)].get_stats()['pauses'])
+
+    def test_retries_exhausted(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.mock_client.reactions_remove.side_effect = make_rate_limit_error()
+        self.scheduler.buckets[('reactions.remove', None)] = TokenBucket(rate=1000, capacity=1)
+        # Call / Assert
+        # -------------------------------------------------------------------------------------------------------------
+        with self.assertRaises(SlackApiError):
+            self.client.reactions_remove(channel='C1', name='party', timestamp='1.0')
+        stats = self.scheduler.get_stats()['reactions.remove']
+        self.assertEqual((3, 2, 1), (stats['calls'], stats['throttled'], stats['errors']))
+
+    def test_per_channel_buckets(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.client.chat_postMessage(channel='C1', text='hi')
+        self.client.chat_postMessage(channel='C2', text='hi')
+        self.client.reactions_add(channel='C1', name='party', timestamp='1.0')
+        self.client.reactions_add(channel='C2', name='party', timestamp='1.0')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual({('chat.postMessage', 'C1'), ('chat.postMessage', 'C2'), ('reactions.add', None)},
+                         set(self.scheduler.buckets.keys()))
+
+    def test_coalescing(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        release = threading.Event()
+        n_threads = 5
+        results = []
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+
+        def slow_get(**kwargs):
+            release.wait(5)
+            return {'ok': True, **kwargs}
+
+        self.mock_client.reactions_get.side_effect = slow_get
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        threads = [threading.Thread(target=lambda: results.append(
+            self.client.reactions_get(channel='C1', timestamp='1.0'))) for _ in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        # Let the others pile up behind the first call
+        while self.scheduler.get_stats().get('reactions.get', {}).get('coalesced', 0) < n_threads - 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(1, self.mock_client.reactions_get.call_count)
+        self.assertEqual([{'ok': True, 'channel': 'C1', 'timestamp': '1.0'}] * n_threads, results)
+        self.assertEqual({}, self.scheduler.in_flight)
+
+    def test_writes_are_not_coalesced(self):
+        for method in COALESCED_METHODS:
+            self.assertIn(method.split('.')[-1], ('get', 'info', 'list'), msg=method)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,7 @@
-from io import StringIO
 from unittest import (
     TestCase,
     main,
 )
-from unittest.mock import MagicMock
 
 from viktor.core.text_cleaner import XPathExtractor
 
@@ -19,15 +17,11 @@ class TestXPathExtractor(TestCase):
         # Build / populate mocks
         # -------------------------------------------------------------------------------------------------------------
 
-        self.mock_request = make_patcher(self, 'viktor.core.text_cleaner.Request')
-        self.mock_urlopen = make_patcher(self, 'viktor.core.text_cleaner.urlopen')
+        self.mock_get_http_client = make_patcher(self, 'viktor.core.text_cleaner.get_http_client')
         self.mock_etree = make_patcher(self, 'viktor.core.text_cleaner.etree')
-        # self.mock_urlopen().code = 200
-        self.mock_urlopen.return_value = MagicMock(
-            return_value=StringIO('<html><body><ul><li>Hello</li></ul></body></html>'),
-            code=200
-        )
-        self.mock_request.return_value = self.mock_urlopen
+        mock_resp = self.mock_get_http_client.return_value.get.return_value
+        mock_resp.status_code = 200
+        mock_resp.content = b'<html><body><ul><li>Hello</li></ul></body></html>'
 
         self.xp = XPathExtractor(url=url)
 
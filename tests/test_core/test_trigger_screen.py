@@ -0,0 +1,41 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from viktor.core.trigger_screen import TriggerScreen
+
+
+class TestTriggerScreen(TestCase):
+
+    def setUp(self) -> None:
+        self.trigger_screen = TriggerScreen(triggers=['viktor', 'v!', '<@U123>'])
+
+    def test_screen(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        cases = [
+            ('v! help', True),
+            ('Viktor uwu that', True),
+            ('  viktor', True),
+            ('viktor\thelp', True),
+            # Anything SlackBotBase would be handed before the screen still gets through
+            ('v!hello', True),
+            ('viktor, uwu that', True),
+            ('<@U123>: help', True),
+            ('help me', False),
+            ('hey viktor', False),
+            ('<@U999> help', False),
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        for text, expected in cases:
+            self.assertEqual(expected, self.trigger_screen.screen(text), text)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        stats = self.trigger_screen.get_stats()
+        self.assertEqual((10, 7, 3), (stats['messages'], stats['triggered'], stats['untriggered']))
+
+
+if __name__ == '__main__':
+    main()
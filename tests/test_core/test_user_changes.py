@@ -5,7 +5,14 @@ from unittest import (
 
 from slacktools.block_kit.blocks import PlainTextHeaderBlock
 
-from viktor.core.user_changes import build_profile_diff
+from viktor.core.user_changes import (
+    build_profile_diff,
+    diff_user_profile,
+)
+from viktor.model import (
+    TableSlackUser,
+    TableSlackUserChangeLog,
+)
 
 
 class TestUserChanges(TestCase):
@@ -32,6 +39,26 @@ class TestUserChanges(TestCase):
         # -------------------------------------------------------------------------------------------------------------
         self.assertEqual(len(blocks), 4)
 
+    def test_diff_user_profile(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        user = TableSlackUser(slack_user_hash='U123', real_name='someone', display_name='new_name',
+                              status_emoji=':beach:')
+        last_changelog = TableSlackUserChangeLog(real_name='someone', display_name='old_name',
+                                                 status_emoji=':beach:')
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        change_dict = diff_user_profile(user=user, last_changelog=last_changelog,
+                                        attrs=['real_name', 'display_name', 'status_emoji'])
+        no_change_dict = diff_user_profile(user=user, last_changelog=last_changelog, attrs=['real_name'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual({
+            'user_hashname': 'new_name|U123',
+            'display_name': {'old': 'old_name', 'new': 'new_name'}
+        }, change_dict)
+        self.assertIsNone(no_change_dict)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,49 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.uwu import (
+    UWU,
+    UwuEngine,
+    recursive_uwu,
+)
+
+
+class TestUwuEngine(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = UwuEngine(char_cluster_map=UWU.char_cluster_map, word_map=UWU.word_map,
+                                repeater_map=UWU.repeater_map, stutter=0, owo_repeater=0)
+
+    def test_convert(self):
+        cases = {
+            'uwu that is really the best': 'dat iz weawwy da best',
+            'The back of THE clock': 'Da bak of DA cwok',
+            'love has none  of this': 'wuv haz nyone  of dis',
+            # Words are split on spaces, so the link's last word gets bypassed as well
+            'look at <https://example.com/real|real link> and <@U123>': 'wook at <https://example.com/real|weaw link> '
+                                                                       'and <@U123>',
+        }
+        for message, expected in cases.items():
+            self.assertEqual(expected, self.engine.convert(message), message)
+
+    def test_convert_to_uwu(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_eng = MagicMock(name='ViktorPSQLClient')
+        mock_eng.corpus.sample_uwu_graphics.return_value = ['(◕ᴥ◕)', 'ʕ•`ᴥ•`ʔ']
+        uwu = UWU(eng=mock_eng)
+        blocks = [{'type': 'section', 'text': {'type': 'mrkdwn', 'text': 'hello'}, 'block_id': 'hello'}]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        converted = recursive_uwu(0, blocks, replace_func=uwu.convert_to_uwu)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual('(◕ᴥ◕) hewwo ʕ• ᴥ• ʔ', converted[0]['text']['text'])
+        self.assertEqual('hello', converted[0]['block_id'])
+
+
+if __name__ == '__main__':
+    main()
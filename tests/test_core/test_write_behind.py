@@ -0,0 +1,55 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.core.write_behind import ReactionCountAggregator
+
+from ..common import get_test_logger
+
+
+class TestReactionCountAggregator(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_test_logger()
+
+    def setUp(self) -> None:
+        self.mock_eng = MagicMock(name='ViktorPSQLClient')
+        self.mock_session = self.mock_eng.session_mgr.return_value.__enter__.return_value
+        self.aggregator = ReactionCountAggregator(eng=self.mock_eng, parent_log=self.log, flush_interval=60,
+                                                  max_pending=1000)
+
+    def tearDown(self) -> None:
+        self.aggregator.shutdown()
+
+    def test_flush_coalesces(self):
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        for name in ['party', 'party', 'party', 'blob']:
+            self.aggregator.add(name)
+        n_rows = self.aggregator.flush()
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(2, n_rows)
+        self.mock_session.execute.assert_called_once()
+        stats = self.aggregator.get_stats()
+        self.assertEqual(4, stats['last_flush_reactions'])
+        self.assertEqual(2, stats['last_flush_rows'])
+        self.assertEqual(0, stats['pending_reactions'])
+
+    def test_failed_flush_keeps_counts(self):
+        self.mock_session.execute.side_effect = ValueError('db went away')
+        self.aggregator.add('party', n=3)
+        self.assertEqual(0, self.aggregator.flush())
+        self.assertEqual(3, self.aggregator.get_stats()['pending_reactions'])
+        self.mock_session.execute.side_effect = None
+
+    def test_empty_flush_skips_db(self):
+        self.assertEqual(0, self.aggregator.flush())
+        self.mock_eng.session_mgr.assert_not_called()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,12 @@ from unittest import (
 from unittest.mock import MagicMock
 
 from viktor.db_eng import ViktorPSQLClient
-from viktor.model import BotSettingType
+from viktor.model import (
+    BotSettingType,
+    TableBotSetting,
+    TableEmoji,
+    TableSlackUser,
+)
 
 from .common import (
     get_test_logger,
@@ -41,6 +46,98 @@ class TestPSQLClient(TestCase):
         self.eng._dbsession().close.assert_called()
         self.assertIsNone(resp)
 
+    def test_get_user_from_hash_is_cached(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        user = TableSlackUser(slack_user_hash='U123', real_name='someone', display_name='some1')
+        self.eng._dbsession().query().filter().one_or_none.return_value = user
+        self.eng._dbsession.reset_mock()
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        first = self.eng.get_user_from_hash('U123')
+        second = self.eng.get_user_from_hash('U123')
+        self.eng.invalidate_user('U123')
+        _ = self.eng.get_user_from_hash('U123')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual('some1', second.display_name)
+        # Each caller gets its own instance
+        self.assertIsNot(first, second)
+        self.assertEqual(2, self.eng._dbsession().query.call_count)
+        self.assertEqual(1, self.eng.get_cache_stats()['users']['hits'])
+
+    def test_get_setting_reads_from_snapshot(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.eng._dbsession().query().all.return_value = [
+            TableBotSetting(setting_type=BotSettingType.IS_ALLOW_GLOBAL_REACTION, setting_int=0),
+            TableBotSetting(setting_type=BotSettingType.IS_ANNOUNCE_STARTUP, setting_int=1),
+        ]
+        self.eng._dbsession.reset_mock()
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        is_allow_react = self.eng.get_bot_setting(BotSettingType.IS_ALLOW_GLOBAL_REACTION)
+        is_announce = self.eng.get_bot_setting(BotSettingType.IS_ANNOUNCE_STARTUP)
+        is_post_tb = self.eng.get_bot_setting(BotSettingType.IS_POST_ERR_TRACEBACK)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertIs(False, is_allow_react)
+        self.assertIs(True, is_announce)
+        self.assertIsNone(is_post_tb)
+        # Only the first read went to the db
+        self.assertEqual(1, self.eng._dbsession().query.call_count)
+        with self.assertRaises(TypeError):
+            self.eng._bot_settings[BotSettingType.IS_ANNOUNCE_STARTUP] = False
+        # Setting a value refreshes the snapshot
+        self.eng.set_bot_setting(BotSettingType.IS_ANNOUNCE_STARTUP, False)
+        self.assertEqual(2, self.eng.get_cache_stats()['bot_settings']['refreshes'])
+
+    def test_get_display_names(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.eng._dbsession().query().filter().all.return_value = [
+            ('U1', None, 'dinkus', 'Dinkus McGee'),
+            ('U2', 'B2', '', 'somebot'),
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        names = self.eng.get_display_names(['U1', 'B2', 'U9'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Display name, or the real name if that's blank. Unknown hashes are left out
+        self.assertEqual({'U1': 'dinkus', 'B2': 'somebot'}, names)
+        self.assertEqual({}, self.eng.get_display_names([]))
+
+    def test_rename_emoji(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        session = self.eng._dbsession()
+        query = session.query()
+        query.filter().update.return_value = 1
+        session.reset_mock()
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        self.eng.rename_emoji('old-emoji', 'new-emoji')
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Any row already holding the new name is deleted before the rename, all in one transaction
+        calls = [x for x in query.filter().mock_calls if x[0] in ('delete', 'update')]
+        self.assertEqual(['delete', 'update'], [x[0] for x in calls])
+        self.assertEqual('new-emoji', calls[1].args[0][TableEmoji.name])
+        self.assertIs(False, calls[1].args[0][TableEmoji.is_deleted])
+        session.add.assert_not_called()
+        session.commit.assert_called_once()
+        # An emoji that was never recorded gets added under its new name
+        query.filter().update.return_value = 0
+        session.reset_mock()
+        self.eng.rename_emoji('old-emoji', 'new-emoji')
+        session.add.assert_called_once()
+        self.assertEqual('new-emoji', session.add.call_args.args[0].name)
+        # Nothing to do when the name hasn't changed
+        session.reset_mock()
+        self.eng.rename_emoji('same', 'same')
+        session.query.assert_not_called()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,136 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from viktor.etl.incremental import (
+    IncrementalSync,
+    diff_rows,
+    hash_rows,
+)
+from sqlalchemy.sql import not_
+
+from viktor.model import (
+    ResponseCategory,
+    ResponseType,
+    TableResponse,
+    TableSlackUser,
+)
+
+from .common import get_test_logger
+
+
+class TestIncremental(TestCase):
+
+    def test_hash_rows(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        rows = [
+            {'type': ResponseType.FACT, 'category': ResponseCategory.STANDARD, 'stage': 1, 'text': 'a'},
+            {'type': ResponseType.FACT, 'category': ResponseCategory.STANDARD, 'stage': np.int64(1), 'text': 'b'},
+        ]
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Order & numpy types don't matter, content does
+        self.assertEqual(hash_rows(rows), hash_rows(rows[::-1]))
+        self.assertNotEqual(hash_rows(rows), hash_rows(rows[:1]))
+
+    def test_diff_rows(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        existing = [
+            {'user_id': 1, 'slack_user_hash': 'U1', 'level': 1., 'is_deleted': False},
+            {'user_id': 2, 'slack_user_hash': 'U2', 'level': 2., 'is_deleted': False},
+            {'user_id': 3, 'slack_user_hash': 'U3', 'level': 3., 'is_deleted': True},
+            {'user_id': 4, 'slack_user_hash': 'U4', 'level': 4., 'is_deleted': False},
+            {'user_id': 5, 'slack_user_hash': 'U1', 'level': 1., 'is_deleted': False},
+        ]
+        incoming = [
+            {'slack_user_hash': 'U1', 'level': np.int64(1)},
+            {'slack_user_hash': 'U2', 'level': 5},
+            {'slack_user_hash': 'U3', 'level': 3},
+            {'slack_user_hash': 'U9', 'level': 0},
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        inserts, updates, deletes, n_revived = diff_rows(existing, incoming, pk_col='user_id',
+                                                         key_cols=['slack_user_hash'], update_cols=['level'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual([{'slack_user_hash': 'U9', 'level': 0}], inserts)
+        self.assertEqual([
+            {'user_id': 2, 'is_deleted': False, 'level': 5},
+            {'user_id': 3, 'is_deleted': False, 'level': 3},
+        ], updates)
+        # U4 is gone from the source, the second U1 is a duplicate
+        self.assertEqual([4, 5], deletes)
+        self.assertEqual(1, n_revived)
+
+    def test_diff_rows_insert_only_cols(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        existing = [
+            {'user_id': 1, 'slack_user_hash': 'U1', 'avatar_link': 'a.png', 'level': 7, 'is_deleted': False},
+        ]
+        incoming = [
+            {'slack_user_hash': 'U1', 'avatar_link': 'b.png', 'level': 0},
+            {'slack_user_hash': 'U2', 'avatar_link': 'c.png', 'level': 0},
+        ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        inserts, updates, deletes, _ = diff_rows(existing, incoming, pk_col='user_id', key_cols=['slack_user_hash'],
+                                                 update_cols=['avatar_link'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # The level the bot set is kept, while new rows get it from the source
+        self.assertEqual([{'user_id': 1, 'is_deleted': False, 'avatar_link': 'b.png'}], updates)
+        self.assertEqual([incoming[1]], inserts)
+        self.assertEqual([], deletes)
+
+    def test_sync_skips_unchanged(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        rows = [{'slack_user_hash': 'U1', 'real_name': 'dinkus'}]
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_eng = MagicMock(name='ViktorPSQLClient')
+        mock_session = mock_eng.session_mgr.return_value.__enter__.return_value
+        mock_session.get.return_value = MagicMock(content_hash=hash_rows(rows))
+        syncer = IncrementalSync(psql_client=mock_eng, parent_log=get_test_logger())
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        stats = syncer.sync('slack:users', TableSlackUser, rows, key_cols=['slack_user_hash'])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertTrue(stats['is_skipped'])
+        mock_session.execute.assert_not_called()
+
+
+    def test_sync_scope(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        rows = [{'type': ResponseType.FACT, 'category': ResponseCategory.FOILHAT, 'stage': 1, 'text': 'birds'}]
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        mock_eng = MagicMock(name='ViktorPSQLClient')
+        mock_session = mock_eng.session_mgr.return_value.__enter__.return_value
+        mock_session.get.return_value = None
+        mock_session.execute.return_value.all.return_value = []
+        syncer = IncrementalSync(psql_client=mock_eng, parent_log=get_test_logger())
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        stats = syncer.sync('sheet:facts', TableResponse, rows, key_cols=['type', 'category', 'stage', 'text'],
+                            scope=(TableResponse.type == ResponseType.FACT) & not_(TableResponse.is_user_added))
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        # Only the rows in scope are diffed against, so ifacts added from the bot are never soft-deleted
+        select_sql = str(mock_session.execute.call_args_list[0].args[0])
+        self.assertIn('WHERE viktor.response.type = :type_1 AND NOT viktor.response.is_user_added', select_sql)
+        self.assertEqual((1, 0), (stats['inserted'], stats['deleted']))
+
+
+if __name__ == '__main__':
+    main()
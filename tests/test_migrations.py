@@ -0,0 +1,52 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from viktor.etl.migrations import (
+    MIGRATIONS,
+    find_index_scans,
+)
+from viktor.model import Base
+
+
+class TestMigrations(TestCase):
+
+    def test_model_indexes_have_migrations(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        versions = [x.version for x in MIGRATIONS]
+        index_names = [idx.name for tbl in Base.metadata.tables.values() for idx in tbl.indexes]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        all_sql = '\n'.join(stmt for migration in MIGRATIONS for stmt in migration.statements)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(sorted(set(versions)), versions)
+        for index_name in index_names:
+            self.assertIn(f'IF NOT EXISTS {index_name} ', all_sql)
+
+    def test_find_index_scans(self):
+        # Set Variables
+        # -------------------------------------------------------------------------------------------------------------
+        plan = [{
+            'Plan': {
+                'Node Type': 'BitmapOr',
+                'Plans': [
+                    {'Node Type': 'Bitmap Index Scan', 'Index Name': 'slack_user_slack_user_hash_key'},
+                    {'Node Type': 'Bitmap Index Scan', 'Index Name': 'ix_slack_user_slack_bot_hash'},
+                ]
+            }
+        }]
+        seq_plan = [{'Plan': {'Node Type': 'Seq Scan', 'Relation Name': 'emoji'}}]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        indexes = find_index_scans(plan)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(['slack_user_slack_user_hash_key', 'ix_slack_user_slack_bot_hash'], indexes)
+        self.assertEqual([], find_index_scans(seq_plan))
+
+
+if __name__ == '__main__':
+    main()
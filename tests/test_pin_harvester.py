@@ -0,0 +1,93 @@
+import pathlib
+import tempfile
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from slack_sdk.errors import SlackApiError
+
+from viktor.core.rate_limit import TokenBucket
+from viktor.etl.pin_harvester import PinHarvester
+
+from .common import (
+    get_test_logger,
+    make_patcher,
+)
+
+
+def make_slack_error(error: str, status_code: int = 200, headers: dict = None) -> SlackApiError:
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.get.return_value = error
+    return SlackApiError(message=error, response=response)
+
+
+class TestPinHarvester(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.checkpoint_path = pathlib.Path(self.tmp_dir.name).joinpath('checkpoint.json')
+        self.mock_client = MagicMock(name='WebClient')
+        self.mock_client.pins_list.__name__ = 'pins_list'
+        self.mock_collect = make_patcher(self, 'viktor.etl.pin_harvester.collect_pins_batch')
+        self.mock_collect.side_effect = lambda pins, **kwargs: [MagicMock() for _ in pins]
+        make_patcher(self, 'viktor.etl.pin_harvester.Pin')
+        self.channels = [{'id': f'C{i}', 'name': f'channel-{i}', 'is_archived': False} for i in range(6)]
+
+    def make_harvester(self) -> PinHarvester:
+        return PinHarvester(client=self.mock_client, psql_client=MagicMock(name='ViktorPSQLClient'),
+                            parent_log=get_test_logger(), bucket=TokenBucket(rate=10000, capacity=10),
+                            checkpoint_path=self.checkpoint_path, n_workers=3)
+
+    def test_run(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        rate_limited = make_slack_error('ratelimited', status_code=429, headers={'Retry-After': '0.01'})
+        responses = {'C1': [rate_limited, {'items': [{}]}], 'C2': [make_slack_error('not_in_channel'),
+                                                                  {'items': [{}, {}]}]}
+
+        def pins_list(channel: str):
+            resp = responses[channel].pop(0) if channel in responses else {'items': [{}]}
+            if isinstance(resp, Exception):
+                raise resp
+            return resp
+        self.mock_client.pins_list.side_effect = pins_list
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        stats = self.make_harvester().run(self.channels)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(6, stats['channels'])
+        self.assertEqual(7, stats['pins'])
+        self.assertEqual(1, stats['rate_limited'])
+        self.mock_client.conversations_join.assert_called_once_with(channel='C2')
+        # Everything finished, so there's nothing to resume from
+        self.assertFalse(self.checkpoint_path.exists())
+
+    def test_resume(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        def pins_list(channel: str):
+            if channel == 'C3':
+                raise make_slack_error('channel_not_found')
+            return {'items': [{}]}
+        self.mock_client.pins_list.side_effect = pins_list
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        first_stats = self.make_harvester().run(self.channels)
+        self.mock_client.pins_list.side_effect = None
+        self.mock_client.pins_list.return_value = {'items': [{}]}
+        self.mock_client.pins_list.reset_mock()
+        second_stats = self.make_harvester().run(self.channels)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual((5, 1), (first_stats['channels'], first_stats['failed_channels']))
+        # Only the failed channel gets picked up again
+        self.assertEqual((1, 5), (second_stats['channels'], second_stats['skipped_channels']))
+        self.mock_client.pins_list.assert_called_once_with(channel='C3')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import pathlib
+import tempfile
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from viktor.etl.table_copier import TableCopier
+from viktor.model import (
+    TableSyncState,
+    TableUwu,
+)
+
+from .common import get_test_logger
+
+
+class TestTableCopier(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.checkpoint_path = pathlib.Path(self.tmp_dir.name).joinpath('checkpoint.json')
+        self.src_engine = MagicMock(name='SourceEngine')
+        self.tgt_engine = MagicMock(name='TargetEngine')
+        self.src_conn = self.src_engine.connect.return_value.__enter__.return_value
+        self.tgt_conn = self.tgt_engine.begin.return_value.__enter__.return_value
+
+    def make_copier(self) -> TableCopier:
+        return TableCopier(src_engine=self.src_engine, tgt_engine=self.tgt_engine, parent_log=get_test_logger(),
+                           checkpoint_path=self.checkpoint_path, batch_size=2)
+
+    def test_copy_table(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.src_conn.execute.return_value.scalar.return_value = 3
+        self.src_conn.execution_options.return_value.execute.return_value.mappings.return_value.\
+            partitions.return_value = [
+                [{'uwu_id': 1, 'graphic': 'a'}, {'uwu_id': 2, 'graphic': 'b'}],
+                [{'uwu_id': 3, 'graphic': 'c'}],
+            ]
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        copier = self.make_copier()
+        n_copied = copier.copy_table(TableUwu)
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual(3, n_copied)
+        # Two batches and the sequence reset
+        self.assertEqual(3, self.tgt_conn.execute.call_count)
+        self.assertIn('setval', str(self.tgt_conn.execute.call_args_list[-1][0][0]))
+        self.assertEqual(3, copier.checkpoint.get_last_pk('uwu'))
+        self.assertTrue(copier.checkpoint.is_done('uwu'))
+
+    def test_resume(self):
+        # Build / populate mocks
+        # -------------------------------------------------------------------------------------------------------------
+        self.src_conn.execute.return_value.scalar.return_value = 0
+        self.src_conn.execution_options.return_value.execute.return_value.mappings.return_value.\
+            partitions.return_value = []
+        # A previous run finished sync_state & got partway through uwu
+        first_copier = self.make_copier()
+        first_copier.checkpoint.update('sync_state', is_done=True)
+        first_copier.checkpoint.update('uwu', last_pk=2)
+        # Call
+        # -------------------------------------------------------------------------------------------------------------
+        copier = self.make_copier()
+        copied = copier.run([TableSyncState, TableUwu])
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertEqual({'uwu': 0}, copied)
+        query = self.src_conn.execution_options.return_value.execute.call_args[0][0]
+        self.assertIn('uwu_id >', str(query))
+        self.assertFalse(self.checkpoint_path.exists())
+
+    def test_build_sequence_reset(self):
+        # Assert
+        # -------------------------------------------------------------------------------------------------------------
+        self.assertIsNone(TableCopier.build_sequence_reset(TableSyncState))
+        self.assertEqual(
+            "SELECT setval(pg_get_serial_sequence('viktor.uwu', 'uwu_id'), COALESCE(MAX(uwu_id), 1), "
+            "MAX(uwu_id) IS NOT NULL) FROM viktor.uwu",
+            TableCopier.build_sequence_reset(TableUwu)
+        )
+
+
+if __name__ == '__main__':
+    main()
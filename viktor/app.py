@@ -84,7 +84,8 @@ def create_app(*args, **kwargs) -> Flask:
 
     # Set up database connection
     logg.debug('Initializing db engine...')
-    eng = ViktorPSQLClient(props=props, parent_log=logg)
+    eng = ViktorPSQLClient(props=props, parent_log=logg, cache_ttl=config_class.LOOKUP_CACHE_TTL,
+                           cache_max_size=config_class.LOOKUP_CACHE_MAX_SIZE)
     app.extensions.setdefault('eng', eng)
 
     logg.debug('Instantiating bot...')
@@ -17,7 +17,6 @@ from typing import (
     Dict,
     List,
     Optional,
-    Set,
     Union,
 )
 from urllib.parse import urlparse
@@ -25,7 +24,6 @@ from urllib.parse import urlparse
 from loguru import logger
 import numpy as np
 import pandas as pd
-import requests
 from slack_sdk.errors import SlackApiError
 from slacktools import SlackBotBase
 from slacktools.api.base import BaseApiObject
@@ -50,16 +48,30 @@ from slacktools.block_kit.elements.input import ButtonElement
 from slacktools.command_processing import build_commands
 from sqlalchemy.sql import (
     and_,
-    func,
+    not_,
 )
 
 from viktor import ROOT_PATH
+from viktor.core.cache import (
+    BucketedDedupeStore,
+    PersistentLookupCache,
+)
+from viktor.core.channel_stats import ChannelStatsEngine
+from viktor.core.emoji_catalog import EmojiCatalog
+from viktor.core.event_pool import EventWorkerPool
+from viktor.core.http_client import get_http_client
 from viktor.core.linguistics import Linguistics
 from viktor.core.phrases import PhraseBuilders
+from viktor.core.slack_scheduler import (
+    ScheduledClient,
+    SlackScheduler,
+)
+from viktor.core.trigger_screen import TriggerScreen
 from viktor.core.uwu import (
     UWU,
     recursive_uwu,
 )
+from viktor.core.write_behind import ReactionCountAggregator
 from viktor.db_eng import ViktorPSQLClient
 from viktor.forms import Forms
 from viktor.model import (
@@ -100,6 +112,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
         self.update_date = config.UPDATE_DATE
         self.spreadsheet_key = props['spreadsheet-key']
         self.onboarding_key = props['onboarding-key']
+        self.event_drain_timeout = config.EVENT_QUEUE_DRAIN_TIMEOUT
 
         super().__init__(eng=eng)
 
@@ -109,6 +122,9 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
         # Initate the bot, which comes with common tools for interacting with Slack's API
         self.log.debug('Spinning up SlackBotBase')
+        # Settings are read from memory from here on and kept current by polling
+        self.eng.refresh_bot_settings()
+        self.eng.start_settings_poller(interval=config.BOT_SETTINGS_POLL_INTERVAL)
         self.is_post_exceptions = self.eng.get_bot_setting(BotSettingType.IS_POST_ERR_TRACEBACK)
         self.st = SlackBotBase(props=props, triggers=self.triggers, main_channel=self.main_channel,
                                admins=self.admins, is_post_exceptions=self.is_post_exceptions, is_debug=config.DEBUG,
@@ -118,7 +134,26 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
         self.st.update_commands(commands=self.commands)
         self.bot_id = self.st.bot_id
         self.user_id = self.st.user_id
+        # Calls to the api get paced by their method's rate limit tier. The wrapped client stands in for
+        #   the original, so the calls SlackBotBase makes are covered as well
+        self.slack_scheduler = SlackScheduler(client=self.st.bot, parent_log=self.log,
+                                              max_retries=config.SLACK_MAX_RETRIES)
+        self.st.bot = ScheduledClient(self.slack_scheduler)
         self.bot = self.st.bot
+        # Running tallies of channel history, so stats requests only fetch what's new. This paces its own
+        #   history calls, so it's given the unwrapped client
+        self.channel_stats = ChannelStatsEngine(client=self.slack_scheduler.client, eng=self.eng, parent_log=self.log,
+                                                page_size=config.CHANNEL_STATS_PAGE_SIZE,
+                                                max_channels=config.CHANNEL_STATS_MAX_CHANNELS)
+        # Results of etymology, translation and lemma lookups, so repeat requests don't hit the sites again
+        self.set_lookup_cache(PersistentLookupCache(path=config.WORD_LOOKUP_CACHE_PATH, ttl=config.WORD_LOOKUP_TTL,
+                                                    negative_ttl=config.WORD_LOOKUP_NEGATIVE_TTL,
+                                                    max_size=config.WORD_LOOKUP_MAX_SIZE))
+        # Emoji names for pattern searches. Kept current by the emoji_changed event
+        self.emoji_catalog = EmojiCatalog(eng=self.eng, fetch_names=lambda: self.st.get_emojis().keys())
+        # Screens out messages without a trigger before SlackBotBase parses them.
+        #   Mentions of the bot are treated as a trigger as well, so they're never screened out.
+        self.trigger_screen = TriggerScreen(triggers=self.triggers + [f'<@{self.user_id}>'])
         self.generate_intro()
 
         if self.eng.get_bot_setting(BotSettingType.IS_ANNOUNCE_STARTUP):
@@ -127,12 +162,21 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
         # Place to temporarily store things. Typical structure is activity -> user -> data
         self.state_store = {
-            'react-events': set(),                              # type: Set[str]  # Used to det. unique react events
+            # Used to det. unique react events
+            'react-events': BucketedDedupeStore(max_keys=config.REACT_EVENT_MAX_KEYS),
             'reacts-store': self.eng.get_reaction_emojis(),     # type: List[str]   # List of reacts to randomly select
             'users': self.eng.get_all_users(),                  # type: Dict[str, TableSlackUser]
             'new-emoji': {},
             'new-ltit-req': {},
         }
+        # Slack events get handed off to these workers so the request can be acknowledged right away
+        self.event_pool = EventWorkerPool(lanes=config.EVENT_WORKER_LANES, parent_log=self.log,
+                                          max_depth=config.EVENT_QUEUE_MAX_DEPTH,
+                                          put_timeout=config.EVENT_QUEUE_PUT_TIMEOUT)
+        # Reaction counts are collected here and written to the emoji table in batches
+        self.reaction_counter = ReactionCountAggregator(eng=self.eng, parent_log=self.log,
+                                                        flush_interval=config.REACTION_FLUSH_INTERVAL,
+                                                        max_pending=config.REACTION_FLUSH_MAX_PENDING)
         self.st.rand_response_methods = [
             self.convert_to_uwu,
             self.convert_to_uwu,
@@ -182,9 +226,32 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
         self.st.refresh_xoxc_token(new_token=xoxc)
         return 'done.'
 
+    def get_perf_stats(self) -> Dict[str, Dict]:
+        """Collects the counters of the various performance-related components"""
+        return {
+            'event_pool': self.event_pool.get_stats(),
+            'react_events': self.state_store['react-events'].get_stats(),
+            'reaction_counts': self.reaction_counter.get_stats(),
+            'lookup_caches': self.eng.get_cache_stats(),
+            'response_corpus': self.eng.corpus.get_stats(),
+            'acronym_index': self.eng.acronym_index.get_stats(),
+            'trigger_screen': self.trigger_screen.get_stats(),
+            'channel_stats': self.channel_stats.get_stats(),
+            'emoji_catalog': self.emoji_catalog.get_stats(),
+            'slack_calls': self.slack_scheduler.get_stats(),
+            'word_lookups': self.lookup_cache.get_stats(),
+            'http_hosts': get_http_client().get_stats(),
+        }
+
     def cleanup(self, *args):
         """Runs just before instance is destroyed"""
         _ = args
+        self.log.info('Draining event worker pool...')
+        self.event_pool.shutdown(timeout=self.event_drain_timeout)
+        self.log.info('Flushing pending reaction counts...')
+        self.reaction_counter.shutdown()
+        self.eng.stop_settings_poller()
+        self.lookup_cache.close()
         notify_block = [
             MarkdownContextBlock(f'{self.bot_name} died. Pour one out `010100100100100101010000`').asdict()
         ]
@@ -202,6 +269,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
             session.query(TableSlackUser).filter(TableSlackUser.slack_user_hash == user).update({
                 TableSlackUser.is_in_bot_timeout: not user_obj.is_in_bot_timeout
             })
+        self.eng.invalidate_user(user)
 
         user_obj = self.eng.get_user_from_hash(user)
         self.state_store['users'][user] = user_obj
@@ -213,6 +281,10 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
     def process_event(self, event_dict: Dict):
         """Hands off the event data while also refreshing the session"""
+        text = event_dict.get('event', {}).get('text')
+        if text is not None and not self.trigger_screen.screen(text):
+            # Most messages aren't meant for the bot - no need to parse them any further
+            return
         self.st.parse_message_event(event_dict, users_dict=self.state_store['users'])
 
     def process_incoming_action(self, user: str, channel: str, action_dict: Dict, event_dict: Dict) -> Optional:
@@ -264,6 +336,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
                 with self.eng.session_mgr() as session:
                     session.add(user_obj)
                     user_obj.role_desc = action_value
+                self.eng.invalidate_user(user)
             self.build_role_txt(channel=channel, user=user)
         elif action_id == 'bot-timeout-user':
             # Check status of user beforehand
@@ -431,55 +504,11 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
     def get_channel_stats(self, channel: str) -> str:
         """Collects posting stats for a given channel"""
-        chan_hist = self.st.get_channel_history(channel, limit=1000)
-        results = {}
-
-        for msg in chan_hist.messages:
-            try:
-                user = msg.user
-            except AttributeError:
-                user = msg.bot_id
-            txt_len = len(msg.text)
-            if user in results.keys():
-                results[user]['msgs'].append(txt_len)
-            else:
-                # Apply new dict for new user
-                results[user] = {'msgs': [txt_len]}
-
-        # Process messages
-        for k, v in results.items():
-            results[k] = {
-                'total_messages': len(v['msgs']),
-                'avg_msg_len': sum(v['msgs']) / len(v['msgs'])
-            }
-
-        res_df = pd.DataFrame(results).transpose()
-
-        res_df = res_df.reset_index()
-        res_df = res_df.rename(columns={'index': 'user'})
-        # Get list of users based on the ids we've got
-        users = self.st.get_users_info(res_df['user'].tolist(), throw_exception=False)
-        user_names = []
-        for user in users:
-            uid = user.id
-            try:
-                name = user.profile.display_name
-            except KeyError:
-                name = user.real_name
-
-            if name == '':
-                name = user.real_name
-            user_names.append({'id': uid, 'display_name': name})
-
-        user_names_df = pd.DataFrame(user_names).drop_duplicates()
-        res_df = res_df.merge(user_names_df, left_on='user', right_on='id', how='left')\
-            .drop(['user', 'id'], axis=1).fillna('Unknown User')
-        res_df = res_df[['display_name', 'total_messages', 'avg_msg_len']]
-        res_df['total_messages'] = res_df['total_messages'].astype(int)
+        n_messages, rows = self.channel_stats.get_channel_stats(channel)
+        res_df = pd.DataFrame(rows, columns=['display_name', 'total_messages', 'avg_msg_len'])
         res_df['avg_msg_len'] = res_df['avg_msg_len'].round(1)
-        res_df = res_df.sort_values('total_messages', ascending=False)
         response = '*Stats for this channel:*\n Total messages examined: {}\n' \
-                   '```{}```'.format(len(chan_hist.messages), self.st.df_to_slack_table(res_df))
+                   '```{}```'.format(n_messages, self.st.df_to_slack_table(res_df))
         return response
 
     def get_emojis_like(self, match_pattern: str, message: str, max_res: int = 500) -> str:
@@ -490,9 +519,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
         if ptrn != '':
             # We've got a pattern to use
-            pattern = re.compile(ptrn)
-            emojis = self.st.get_emojis()
-            matches = [k for k, v in emojis.items() if pattern.match(k)]
+            matches = self.emoji_catalog.match(ptrn)
             len_match = len(matches)
             if len_match > 0:
                 # Slack apparently handles message length limitations on its end, so
@@ -513,12 +540,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
     # ====================================================
     def sarcastic_response(self) -> str:
         """Sends back a sarcastic response when user is not allowed to use the action requested"""
-        with self.eng.session_mgr() as session:
-            resp = session.query(TableResponse.text).filter(and_(
-                TableResponse.type == ResponseType.GENERAL,
-                TableResponse.category == ResponseCategory.SARCASTIC
-            )).order_by(func.random()).limit(1).one().text
-            return resp
+        return self._get_random_response(ResponseType.GENERAL, category=ResponseCategory.SARCASTIC)
 
     @staticmethod
     def giggle() -> str:
@@ -669,11 +691,11 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
     # ====================================================
     def inspirational(self, channel: str):
         """Sends a random inspirational message"""
-        resp = requests.get('https://inspirobot.me/api?generate=true')
+        resp = get_http_client().get('https://inspirobot.me/api?generate=true')
         if resp.status_code == 200:
             url = resp.text
             # Download img
-            img = requests.get(url)
+            img = get_http_client().get(url)
             if img.status_code == 200:
                 with open('/tmp/inspirational.jpg', 'wb') as f:
                     f.write(img.content)
@@ -698,8 +720,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
         n_buttons = randint(5, 12)
         items = list(range(1, n_buttons + 1))
 
-        with self.eng.session_mgr() as session:
-            emojis = [x.name for x in session.query(TableEmoji).order_by(func.random()).limit(n_buttons).all()]
+        emojis = self.eng.corpus.sample_emoji_names(k=n_buttons)
         rand_val = randint(1, n_buttons)
         # Pick two places where negative values should go
         neg_items = list(np.random.choice([x for x in items if x != rand_val], int(n_buttons * .8), False))
@@ -813,15 +834,31 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
     def add_ifact(self, user: str, channel: str, txt: str):
         _ = user
-        fact = TableResponse(response_type=ResponseType.FACT, category=ResponseCategory.FOILHAT, text=txt)
+        fact = TableResponse(response_type=ResponseType.FACT, category=ResponseCategory.FOILHAT, text=txt,
+                             is_user_added=True)
         with self.eng.session_mgr() as session:
             session.add(fact)
-            msg = f'Fact added! id:`{fact.id}`\n{fact.text}'
-        self.st.send_message(channel=channel, message=msg)
+            session.flush()
+            fact_id = fact.response_id
+        self.eng.corpus.add_response(fact_id, resp_type=ResponseType.FACT, category=ResponseCategory.FOILHAT,
+                                     text=txt)
+        self.st.send_message(channel=channel, message=f'Fact added! id:`{fact_id}`\n{txt}')
+
+    def reload_corpus(self, user: str) -> str:
+        """Reads the responses, uwu graphics and emojis that get randomly drawn from into memory again.
+        Acronym indexes get rebuilt on their next use."""
+        if user not in self.admins:
+            return self.sarcastic_response()
+        self.eng.corpus.reload()
+        self.eng.acronym_index.invalidate()
+        self.emoji_catalog.reload()
+        stats = self.eng.corpus.get_stats()
+        return f'Reloaded {sum(stats["responses"].values())} responses, {stats["uwu_graphics"]} uwu graphics ' \
+               f'and {stats["emoji_names"]} emojis.'
 
     def get_fart(self, user: str, channel: str):
         fart_id = randint(1, 3000)
-        resp = requests.get(f'https://boredhumans.b-cdn.net/farts/{fart_id}.mp3')
+        resp = get_http_client().get(f'https://boredhumans.b-cdn.net/farts/{fart_id}.mp3')
         fartpath = Path(tempfile.gettempdir()).joinpath('fart.mp3')
         if resp.status_code == 200:
             with fartpath.open(mode='wb') as f:
@@ -852,7 +889,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
     def show_all_perks(self) -> BlocksType:
         """Displays all the perks"""
         with self.eng.session_mgr() as session:
-            perks = session.query(TablePerk).all()
+            perks = session.query(TablePerk).filter(not_(TablePerk.is_deleted)).all()
             session.expunge_all()
         final_perks = self._build_perks_list(perks)
         return [
@@ -896,7 +933,10 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
 
         # Get perks
         with self.eng.session_mgr() as session:
-            perks = session.query(TablePerk).filter(TablePerk.level <= level).all()
+            perks = session.query(TablePerk).filter(and_(
+                TablePerk.level <= level,
+                not_(TablePerk.is_deleted)
+            )).all()
             session.expunge_all()
         final_perks = self._build_perks_list(perks)
         return [
@@ -924,6 +964,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
                 session.add(user_obj)
                 user_obj.role_title = new_title
                 existing_desc = user_obj.role_desc
+            self.eng.invalidate_user(user)
         form2 = self.build_role_input_form_p2(title=new_title, existing_desc=existing_desc)
         _ = self.st.private_channel_message(user_id=user, channel=channel, message='New role form, p2',
                                             blocks=form2)
@@ -945,6 +986,7 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
             session.add(user_obj)
             user_obj.level += 1
             msg = f'Level for *`{user_obj.display_name}`* updated to *`{user_obj.level}`*.'
+        self.eng.invalidate_user(target_user)
         return msg
 
     def update_user_ltips(self, requesting_user: str, target_user: str, ltits: float) -> str:
@@ -959,7 +1001,9 @@ class Viktor(Linguistics, PhraseBuilders, Forms, UWU):
         with self.eng.session_mgr() as session:
             session.add(user_obj)
             user_obj.ltits += ltits
-            return f'LTITs for  *`{user_obj.display_name}`* updated by *`{ltits}`* to *`{user_obj.ltits}`*.'
+            msg = f'LTITs for  *`{user_obj.display_name}`* updated by *`{ltits}`* to *`{user_obj.ltits}`*.'
+        self.eng.invalidate_user(target_user)
+        return msg
 
     def show_roles(self, user: str = None) -> Union[BlocksType, str]:
         """Prints users roles to channel"""
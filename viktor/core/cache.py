@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from datetime import datetime
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Tuple,
+    Union,
+)
+
+
+class BucketedDedupeStore:
+    """Remembers keys that have already been seen within a time bucket (by default, the current hour).
+
+    Keys are kept in one insertion-ordered dict per bucket. Once a bucket falls out of the most recent
+    `max_buckets`, all of its keys are dropped at once. The total number of keys held is also capped at
+    `max_keys` - if that's reached, the oldest keys get evicted first.
+
+    Args:
+        max_keys: hard ceiling on the number of keys held across all buckets
+        max_buckets: number of most recent buckets to retain
+        bucket_func: returns the bucket the current moment falls into
+    """
+
+    def __init__(self, max_keys: int = 50000, max_buckets: int = 2,
+                 bucket_func: Callable[[], str] = lambda: f'{datetime.now():%F %H}'):
+        self.max_keys = max_keys
+        self.max_buckets = max_buckets
+        self.bucket_func = bucket_func
+        self.buckets = {}  # type: Dict[str, Dict[str, None]]
+        self.n_keys = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.n_keys
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self.buckets.get(self.bucket_func(), {})
+
+    def _rotate(self, bucket: str):
+        """Starts a new bucket, expiring the oldest ones past the retention limit"""
+        self.buckets[bucket] = {}
+        while len(self.buckets) > self.max_buckets:
+            oldest = next(iter(self.buckets))
+            expired = self.buckets.pop(oldest)
+            self.n_keys -= len(expired)
+            self.stats['expirations'] += len(expired)
+
+    def _evict_oldest(self):
+        for bucket_keys in self.buckets.values():
+            if len(bucket_keys) > 0:
+                bucket_keys.pop(next(iter(bucket_keys)))
+                self.n_keys -= 1
+                self.stats['evictions'] += 1
+                return
+
+    def check_and_add(self, key: str) -> bool:
+        """Registers the key in the current bucket
+
+        Returns:
+            True if the key hadn't been seen yet in this bucket, False if it's a duplicate
+        """
+        bucket = self.bucket_func()
+        with self._lock:
+            if bucket not in self.buckets:
+                self._rotate(bucket)
+            bucket_keys = self.buckets[bucket]
+            if key in bucket_keys:
+                self.stats['hits'] += 1
+                return False
+            self.stats['misses'] += 1
+            while 0 < self.n_keys >= self.max_keys:
+                self._evict_oldest()
+            bucket_keys[key] = None
+            self.n_keys += 1
+            return True
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': self.n_keys,
+                'max_keys': self.max_keys,
+                'buckets': len(self.buckets),
+                **self.stats
+            }
+
+
+class TTLCache:
+    """A size-bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    `None` is a valid value to cache, which lets lookups that found nothing be cached as well.
+
+    Args:
+        max_size: max number of entries to hold before evicting the least recently used one
+        ttl: number of seconds an entry stays valid
+    """
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 1000, ttl: float = 300.):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # type: OrderedDict[Hashable, Tuple[float, Any]]
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        """Returns the cached value, or `default` if the key isn't cached (or has expired)"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self.entries[key]
+                self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value, calling `loader` to fill the entry on a miss"""
+        value = self.get(key)
+        if value is self._MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidations'] += len(self.entries)
+            self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            n_lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hit_ratio': round(self.stats['hits'] / n_lookups, 4) if n_lookups > 0 else 0.,
+                **self.stats
+            }
+
+
+class PersistentLookupCache:
+    """Two-tier cache for the results of slow external lookups, keyed by source & lookup key.
+
+    Entries are held in memory (an LRU `TTLCache` per source) and in a SQLite file, so they survive restarts
+    and are shared between processes. A lookup that found nothing - `None` - is cached as well, but for the
+    (usually shorter) `negative_ttl`. Values have to be json-serializable.
+
+    Args:
+        path: the SQLite file to keep entries in
+        ttl: seconds a found result stays valid
+        negative_ttl: seconds a 'not found' stays valid
+        max_size: max number of entries held in memory per source
+    """
+    _MISSING = object()
+
+    def __init__(self, path: pathlib.Path, ttl: float = 30 * 86400., negative_ttl: float = 86400.,
+                 max_size: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.memory = {}  # type: Dict[str, TTLCache]
+        self.stats = {}  # type: Dict[str, Dict[str, int]]
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lookup (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+        """)
+
+    def _count(self, source: str, stat: str):
+        with self._lock:
+            source_stats = self.stats.setdefault(source, {
+                'memory_hits': 0,
+                'disk_hits': 0,
+                'negative_hits': 0,
+                'misses': 0,
+            })
+            source_stats[stat] += 1
+
+    def _get_memory(self, source: str) -> TTLCache:
+        with self._lock:
+            cache = self.memory.get(source)
+            if cache is None:
+                cache = self.memory[source] = TTLCache(max_size=self.max_size, ttl=self.ttl)
+            return cache
+
+    def get(self, source: str, key: str, default: Any = _MISSING) -> Any:
+        """Returns the cached value (which may be None, for 'not found'), or `default` if there isn't one"""
+        memory = self._get_memory(source)
+        # Memory entries carry their wall clock expiry, as 'not found' and entries read from disk
+        #   expire sooner than the memory cache's own ttl
+        entry = memory.get(key, None)
+        if entry is not None and entry[0] > time.time():
+            self._count(source, 'memory_hits' if entry[1] is not None else 'negative_hits')
+            return entry[1]
+
+        with self._lock:
+            row = self.conn.execute('SELECT value, expires_at FROM lookup WHERE source = ? AND key = ?',
+                                    (source, key)).fetchone()
+        if row is not None and row[1] > time.time():
+            value = json.loads(row[0]) if row[0] is not None else None
+            memory.set(key, (row[1], value))
+            self._count(source, 'disk_hits' if value is not None else 'negative_hits')
+            return value
+        self._count(source, 'misses')
+        return default
+
+    def set(self, source: str, key: str, value: Any):
+        expires_at = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        self._get_memory(source).set(key, (expires_at, value))
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO lookup (source, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                              (source, key, json.dumps(value) if value is not None else None, expires_at))
+
+    def get_or_load(self, source: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value, calling `loader` on a miss. If the loader raises, nothing gets cached"""
+        value = self.get(source, key)
+        if value is self._MISSING:
+            value = loader()
+            self.set(source, key, value)
+        return value
+
+    def purge_expired(self) -> int:
+        """Deletes the expired entries from disk
+
+        Returns:
+            the number of entries deleted
+        """
+        with self._lock:
+            return self.conn.execute('DELETE FROM lookup WHERE expires_at <= ?', (time.time(), )).rowcount
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        with self._lock:
+            stats = {source: dict(x) for source, x in self.stats.items()}
+        for source, source_stats in stats.items():
+            n_lookups = sum(source_stats.values())
+            n_hits = n_lookups - source_stats['misses']
+            source_stats['hit_ratio'] = round(n_hits / n_lookups, 4) if n_lookups > 0 else 0.
+            source_stats['memory_size'] = len(self._get_memory(source))
+        return stats
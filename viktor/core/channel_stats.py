@@ -0,0 +1,175 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from viktor.core.rate_limit import TokenBucket
+
+if TYPE_CHECKING:
+    from viktor.db_eng import ViktorPSQLClient
+
+
+class ChannelTally:
+    """Running per-poster message counts & total text lengths of a single channel.
+
+    Posters are given a position in the parallel count/length lists the first time they're seen, so tallying
+    a message is a dict lookup and two additions.
+    """
+
+    def __init__(self):
+        self.poster_index = {}  # type: Dict[str, int]
+        self.posters = []  # type: List[str]
+        self.counts = []  # type: List[int]
+        self.lengths = []  # type: List[int]
+        self.n_messages = 0
+        self.latest_ts = None  # type: Optional[str]
+        self.n_pages = 0
+        self.refreshed_at = None  # type: Optional[float]
+        self.lock = threading.Lock()
+
+    def add(self, poster: str, text_len: int):
+        i = self.poster_index.get(poster)
+        if i is None:
+            i = self.poster_index[poster] = len(self.posters)
+            self.posters.append(poster)
+            self.counts.append(0)
+            self.lengths.append(0)
+        self.counts[i] += 1
+        self.lengths[i] += text_len
+        self.n_messages += 1
+
+    def add_messages(self, messages: List[Dict]):
+        """Tallies a page of messages, keeping track of the newest timestamp seen"""
+        for msg in messages:
+            poster = msg.get('user', msg.get('bot_id'))
+            if poster is None:
+                continue
+            self.add(poster, len(msg.get('text') or ''))
+            ts = msg.get('ts')
+            if ts is not None and (self.latest_ts is None or float(ts) > float(self.latest_ts)):
+                self.latest_ts = ts
+
+    def get_rows(self) -> List[Tuple[str, int, float]]:
+        """(poster, total messages, avg message length), most messages first"""
+        rows = [(p, c, length / c) for p, c, length in zip(self.posters, self.counts, self.lengths)]
+        return sorted(rows, key=lambda x: x[1], reverse=True)
+
+
+class ChannelStatsEngine:
+    """Posting stats over the full history of a channel.
+
+    The first request for a channel pages through all of its history. After that, only messages newer than the
+    latest one already tallied are fetched, so repeat requests cost as many api calls as there are new pages.
+    Tallies of the `max_channels` most recently asked-for channels are kept.
+
+    Args:
+        client: the Slack web client
+        eng: the db client, for looking up names
+        parent_log: the logger to bind to
+        bucket: paces calls to conversations.history
+        page_size: number of messages asked for per page
+        max_channels: number of channel tallies kept in memory
+    """
+
+    def __init__(self, client: WebClient, eng: 'ViktorPSQLClient', parent_log: logger,
+                 bucket: TokenBucket = None, page_size: int = 200, max_channels: int = 50):
+        self.client = client
+        self.eng = eng
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        # conversations.history is a Tier 3 method (50+ calls/min)
+        self.bucket = bucket if bucket is not None else TokenBucket.per_minute(50, capacity=5)
+        self.page_size = page_size
+        self.max_channels = max_channels
+        self.tallies = OrderedDict()  # type: OrderedDict[str, ChannelTally]
+        self.stats = {
+            'requests': 0,
+            'pages_fetched': 0,
+            'messages_tallied': 0,
+            'rate_limited': 0,
+        }
+        self._lock = threading.Lock()
+
+    def _get_tally(self, channel: str) -> ChannelTally:
+        with self._lock:
+            tally = self.tallies.get(channel)
+            if tally is None:
+                tally = self.tallies[channel] = ChannelTally()
+            self.tallies.move_to_end(channel)
+            while len(self.tallies) > self.max_channels:
+                self.tallies.popitem(last=False)
+            return tally
+
+    def _fetch_page(self, channel: str, oldest: Optional[str], cursor: Optional[str]) -> Dict:
+        while True:
+            self.bucket.acquire()
+            try:
+                return self.client.conversations_history(channel=channel, limit=self.page_size, oldest=oldest,
+                                                         cursor=cursor).data
+            except SlackApiError as err:
+                if err.response.status_code != 429:
+                    raise
+                retry_after = float(err.response.headers.get('Retry-After', 1))
+                self.log.warning(f'Rate limited on conversations.history - waiting {retry_after}s')
+                with self._lock:
+                    self.stats['rate_limited'] += 1
+                self.bucket.pause(retry_after)
+
+    def refresh(self, channel: str) -> ChannelTally:
+        """Brings the channel's tally up to date with any messages posted since it was last refreshed"""
+        tally = self._get_tally(channel)
+        with tally.lock:
+            # Only what's newer than the latest message tallied. Until all pages are in, the tally's
+            #   not touched, so a failure partway through doesn't leave it half-updated
+            oldest = tally.latest_ts
+            cursor = None
+            pages = []
+            while True:
+                resp = self._fetch_page(channel, oldest=oldest, cursor=cursor)
+                pages.append(resp.get('messages', []))
+                cursor = resp.get('response_metadata', {}).get('next_cursor')
+                if not resp.get('has_more') or cursor in [None, '']:
+                    break
+            n_messages = tally.n_messages
+            for page in pages:
+                tally.add_messages(page)
+            tally.n_pages += len(pages)
+            tally.refreshed_at = time.monotonic()
+            with self._lock:
+                self.stats['pages_fetched'] += len(pages)
+                self.stats['messages_tallied'] += tally.n_messages - n_messages
+        return tally
+
+    def get_channel_stats(self, channel: str) -> Tuple[int, List[Tuple[str, int, float]]]:
+        """Refreshes the channel's tally and returns its stats
+
+        Returns:
+            the number of messages tallied, and rows of (display name, total messages, avg message length)
+                for each poster, most messages first
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+        tally = self.refresh(channel)
+        with tally.lock:
+            n_messages = tally.n_messages
+            rows = tally.get_rows()
+        names = self.eng.get_display_names([x[0] for x in rows])
+        return n_messages, [(names.get(poster, 'Unknown User'), n, avg) for poster, n, avg in rows]
+
+    def get_stats(self) -> Dict[str, Union[int, Dict]]:
+        with self._lock:
+            return {
+                'channels': len(self.tallies),
+                **self.stats,
+                'bucket': self.bucket.get_stats(),
+            }
@@ -0,0 +1,270 @@
+from datetime import datetime
+import random
+import string
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from sqlalchemy.sql import (
+    and_,
+    func,
+    not_,
+)
+
+from viktor.model import (
+    AcronymType,
+    ResponseCategory,
+    ResponseType,
+    TableAcronym,
+    TableEmoji,
+    TableResponse,
+    TableUwu,
+)
+
+if TYPE_CHECKING:
+    from viktor.db_eng import ViktorPSQLClient
+
+
+def sample_indexes(n: int, k: int, is_replace: bool = False) -> List[int]:
+    """Draws k random positions out of n. Without replacement, k is capped at n"""
+    if n == 0:
+        return []
+    if is_replace:
+        return [random.randrange(n) for _ in range(k)]
+    return random.sample(range(n), min(k, n))
+
+
+class ResponseBucket:
+    """The responses for a single type/category combo, kept in parallel lists"""
+
+    def __init__(self):
+        self.ids = []  # type: List[int]
+        self.texts = []  # type: List[str]
+        self.stages = []  # type: List[int]
+        self._stage_texts = None  # type: Optional[Dict[int, np.ndarray]]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, response_id: int, text: str, stage: int = 1):
+        self.ids.append(response_id)
+        self.texts.append(text)
+        self.stages.append(stage)
+        self._stage_texts = None
+
+    def get_stage_texts(self) -> Dict[int, np.ndarray]:
+        """The texts split out by stage into arrays, in stage order"""
+        stage_texts = self._stage_texts
+        if stage_texts is None:
+            grouped = {}  # type: Dict[int, List[str]]
+            for stage, text in zip(self.stages, self.texts):
+                grouped.setdefault(stage, []).append(text)
+            stage_texts = {stage: np.array(texts, dtype=object) for stage, texts in sorted(grouped.items())}
+            self._stage_texts = stage_texts
+        return stage_texts
+
+    def sample(self, k: int = 1, is_replace: bool = False) -> List[Tuple[int, str]]:
+        return [(self.ids[i], self.texts[i]) for i in sample_indexes(len(self), k, is_replace)]
+
+
+class ResponseCorpus:
+    """In-memory copy of the responses, uwu graphics and emoji names that get randomly drawn from.
+
+    Picking from these in Postgres meant an ORDER BY random() - a sort of the whole filtered table - for every
+    command. Here a draw is just a few random list positions. Everything's loaded on first use, new responses
+    can be appended as they're added and a full `reload` swaps in a fresh copy of the tables.
+    """
+
+    def __init__(self, eng: 'ViktorPSQLClient'):
+        self.eng = eng
+        self.responses = None  # type: Optional[Dict[Tuple[ResponseType, ResponseCategory], ResponseBucket]]
+        self.uwu_graphics = []  # type: List[str]
+        self.emoji_names = []  # type: List[str]
+        self.n_loads = 0
+        self.loaded_at = None  # type: Optional[float]
+        self.rng = np.random.default_rng()
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """Reads the tables in again, replacing what's currently held"""
+        responses = {}  # type: Dict[Tuple[ResponseType, ResponseCategory], ResponseBucket]
+        with self.eng.session_mgr() as session:
+            rows = session.query(
+                TableResponse.response_id,
+                TableResponse.type,
+                TableResponse.category,
+                TableResponse.stage,
+                TableResponse.text
+            ).filter(not_(TableResponse.is_deleted)).order_by(TableResponse.response_id).all()
+            uwu_graphics = [x.graphic for x in session.query(TableUwu.graphic).filter(not_(TableUwu.is_deleted)).all()]
+            emoji_names = [x.name for x in session.query(TableEmoji.name).filter(not_(TableEmoji.is_deleted)).all()]
+        for row in rows:
+            responses.setdefault((row.type, row.category), ResponseBucket()).add(row.response_id, row.text,
+                                                                                 stage=row.stage)
+        for bucket in responses.values():
+            bucket.get_stage_texts()
+        with self._lock:
+            self.responses = responses
+            self.uwu_graphics = uwu_graphics
+            self.emoji_names = emoji_names
+            self.n_loads += 1
+            self.loaded_at = time.monotonic()
+
+    def _get_responses(self) -> Dict[Tuple[ResponseType, ResponseCategory], ResponseBucket]:
+        if self.responses is None:
+            with self._lock:
+                is_loaded = self.responses is not None
+            if not is_loaded:
+                self.reload()
+        return self.responses
+
+    def add_response(self, response_id: int, resp_type: ResponseType, category: ResponseCategory, text: str):
+        """Appends a response that was just written to the table"""
+        responses = self._get_responses()
+        with self._lock:
+            responses.setdefault((resp_type, category), ResponseBucket()).add(response_id, text)
+
+    def sample(self, resp_type: ResponseType, category: ResponseCategory, k: int = 1,
+               is_replace: bool = False) -> List[Tuple[int, str]]:
+        """Draws k (response_id, text) pairs from the type/category combo. Empty if the combo doesn't exist"""
+        bucket = self._get_responses().get((resp_type, category))
+        if bucket is None:
+            return []
+        return bucket.sample(k=k, is_replace=is_replace)
+
+    def sample_stages(self, resp_type: ResponseType, category: ResponseCategory, k: int = 1) -> List[List[str]]:
+        """Draws up to k words from each stage of the type/category combo, without replacement.
+
+        Returns:
+            one list of words per draw, where the i-th list holds the i-th word drawn from every stage that
+                had at least i words to draw from
+        """
+        bucket = self._get_responses().get((resp_type, category))
+        if bucket is None:
+            return []
+        draws = [texts[self.rng.choice(len(texts), size=min(k, len(texts)), replace=False)]
+                 for texts in bucket.get_stage_texts().values()]
+        n_draws = max((len(x) for x in draws), default=0)
+        return [[x[i] for x in draws if i < len(x)] for i in range(n_draws)]
+
+    def sample_uwu_graphics(self, k: int = 1) -> List[str]:
+        self._get_responses()
+        graphics = self.uwu_graphics
+        return [graphics[i] for i in sample_indexes(len(graphics), k)]
+
+    def sample_emoji_names(self, k: int = 1) -> List[str]:
+        self._get_responses()
+        names = self.emoji_names
+        return [names[i] for i in sample_indexes(len(names), k)]
+
+    def get_stats(self) -> Dict[str, Union[int, float, Dict[str, int]]]:
+        """Sizes of each of the buckets that get drawn from"""
+        responses = self.responses or {}
+        return {
+            'loads': self.n_loads,
+            'age_s': round(time.monotonic() - self.loaded_at, 1) if self.loaded_at is not None else None,
+            'responses': {f'{t.name}/{c.name}': len(bucket) for (t, c), bucket in sorted(
+                responses.items(), key=lambda x: (x[0][0].name, x[0][1].name))},
+            'uwu_graphics': len(self.uwu_graphics),
+            'emoji_names': len(self.emoji_names),
+        }
+
+
+class AcronymIndex:
+    """The acronym words of each AcronymType, bucketed by first letter.
+
+    An index is built the first time its type is asked for. Since the acronym table is reloaded by the ETL
+    (a separate process), at most every `check_interval` seconds the row count, max id and latest update of
+    each type are compared against what each index was built from, and any index that no longer matches is dropped.
+
+    Args:
+        eng: the db client
+        check_interval: min number of seconds between checks of the acronym table for changes
+    """
+
+    def __init__(self, eng: 'ViktorPSQLClient', check_interval: float = 60.):
+        self.eng = eng
+        self.check_interval = check_interval
+        self.indexes = {}  # type: Dict[AcronymType, Dict[str, List[str]]]
+        self.fingerprints = {}  # type: Dict[AcronymType, Tuple[int, Optional[int], Optional[datetime]]]
+        self.last_checked_at = None  # type: Optional[float]
+        self.stats = {
+            'builds': 0,
+            'checks': 0,
+            'invalidations': 0,
+        }
+        self._lock = threading.Lock()
+
+    def _check_for_changes(self):
+        """Drops any index whose type has had rows added, changed or removed since it was built"""
+        now = time.monotonic()
+        if self.last_checked_at is not None and now - self.last_checked_at < self.check_interval:
+            return
+        self.last_checked_at = now
+        with self.eng.session_mgr() as session:
+            rows = session.query(
+                TableAcronym.type,
+                func.count(TableAcronym.acronym_id),
+                func.max(TableAcronym.acronym_id),
+                func.max(TableAcronym.update_date)
+            ).filter(not_(TableAcronym.is_deleted)).group_by(TableAcronym.type).all()
+        current = {acro_type: tuple(fingerprint) for acro_type, *fingerprint in rows}
+        with self._lock:
+            self.stats['checks'] += 1
+            for acro_type in list(self.indexes.keys()):
+                if current.get(acro_type, (0, None, None)) != self.fingerprints.get(acro_type):
+                    self.indexes.pop(acro_type)
+                    self.stats['invalidations'] += 1
+
+    def _build(self, acronym_type: AcronymType) -> Dict[str, List[str]]:
+        with self.eng.session_mgr() as session:
+            rows = session.query(TableAcronym.acronym_id, TableAcronym.text, TableAcronym.update_date).filter(and_(
+                TableAcronym.type == acronym_type,
+                not_(TableAcronym.is_deleted)
+            )).all()
+        word_dict = {k: [] for k in string.ascii_lowercase}
+        for row in rows:
+            word = row.text.replace('\n', '')
+            if len(word) > 1:
+                word_dict[word[0].lower()].append(word.lower())
+        with self._lock:
+            self.indexes[acronym_type] = word_dict
+            self.fingerprints[acronym_type] = (
+                len(rows),
+                max((x.acronym_id for x in rows), default=None),
+                max((x.update_date for x in rows if x.update_date is not None), default=None)
+            )
+            self.stats['builds'] += 1
+        return word_dict
+
+    def get_index(self, acronym_type: AcronymType) -> Dict[str, List[str]]:
+        """Returns the words of the type organized by first letter. All the lists are empty if the type has no words"""
+        self._check_for_changes()
+        word_dict = self.indexes.get(acronym_type)
+        if word_dict is None:
+            word_dict = self._build(acronym_type)
+        return word_dict
+
+    def invalidate(self, acronym_type: Optional[AcronymType] = None):
+        """Drops the index of the given type (or all of them), so it's rebuilt on next use"""
+        with self._lock:
+            if acronym_type is None:
+                self.stats['invalidations'] += len(self.indexes)
+                self.indexes.clear()
+            elif self.indexes.pop(acronym_type, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict[str, Union[int, Dict[str, int]]]:
+        with self._lock:
+            return {
+                'words': {k.name: sum(len(x) for x in v.values()) for k, v in self.indexes.items()},
+                **self.stats
+            }
@@ -0,0 +1,67 @@
+"""
+Extraction of translations and example sentences from EKI dictionary pages.
+
+Pages are parsed straight from the response bytes. Each dictionary entry (a 'tervikart' div) is found once, and
+its spans are read with relative XPaths compiled at import, so the cost grows with the size of the page rather
+than with the number of entries times the size of the page.
+"""
+import re
+import threading
+from typing import List
+
+from lxml import etree
+
+ENTRIES_XPATH = etree.XPath('//div[@class="tervikart"]')
+# Relative to an entry
+ET_SPANS_XPATH = etree.XPath('./*/span[@lang="et"]')
+EN_SPANS_XPATH = etree.XPath('./*/span[@lang="en"]')
+HEADWORD_SPANS_XPATH = etree.XPath('./*/span[@class="m leitud_id"]')
+EXAMPLE_SPANS_XPATH = etree.XPath('./*/span[@class="n"]')
+
+SENTENCE_END_REGEX = re.compile(r'[?.!]')
+
+# lxml parsers can't be shared between threads, so each thread gets its own
+_local = threading.local()
+
+
+def get_html_parser() -> etree.HTMLParser:
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = etree.HTMLParser(encoding='utf-8')
+    return parser
+
+
+def parse_html(content: bytes) -> etree.ElementBase:
+    """Parses the raw bytes of a page into an element tree that can be searched using xpath"""
+    return etree.fromstring(content, parser=get_html_parser())
+
+
+def get_texts(elems: List[etree.ElementBase]) -> List[str]:
+    return [''.join(x.itertext()) for x in elems]
+
+
+def extract_translations(root: etree.ElementBase, word: str, target: str = 'en') -> List[str]:
+    """Collects the translations from each entry whose headword (in the source language) is the word
+
+    Args:
+        root: the parsed page
+        word: the word looked up
+        target: the language translated into - 'en' or 'et'
+    """
+    source_xpath, target_xpath = (ET_SPANS_XPATH, EN_SPANS_XPATH) if target == 'en' else \
+        (EN_SPANS_XPATH, ET_SPANS_XPATH)
+    result = []
+    for entry in ENTRIES_XPATH(root):
+        if word in get_texts(source_xpath(entry)):
+            result += get_texts(target_xpath(entry))
+    return result
+
+
+def extract_examples(root: etree.ElementBase, word: str) -> List[str]:
+    """Splits the example text of the first entry for the word into sentences"""
+    for entry in ENTRIES_XPATH(root):
+        if word in get_texts(HEADWORD_SPANS_XPATH(entry)):
+            examples = SENTENCE_END_REGEX.split(''.join(get_texts(EXAMPLE_SPANS_XPATH(entry))))
+            # Strip of leading / tailing whitespace
+            return [x.strip() for x in examples if x.strip() != '']
+    return []
@@ -0,0 +1,158 @@
+import bisect
+import re
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from sqlalchemy.sql import not_
+
+from viktor.model import TableEmoji
+
+if TYPE_CHECKING:
+    from viktor.db_eng import ViktorPSQLClient
+
+# Characters that end the literal start of a regex
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]()|\\')
+REGEX_QUANTIFIERS = set('*+?{')
+
+
+def get_literal_prefix(pattern: str) -> str:
+    """The text every match of the pattern (anchored at the start, as with `re.match`) has to begin with.
+    Empty if that can't be worked out simply"""
+    if '|' in pattern:
+        # An alternation could make any part of the pattern optional
+        return ''
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+                # Escaped punctuation is just that character
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            break
+        if char in REGEX_SPECIAL_CHARS:
+            break
+        prefix.append(char)
+        i += 1
+    if i < len(pattern) and pattern[i] in REGEX_QUANTIFIERS and len(prefix) > 0:
+        # The last literal is quantified (e.g., 'ab*'), so it might not be there
+        prefix.pop()
+    return ''.join(prefix)
+
+
+class EmojiCatalog:
+    """Sorted list of the workspace's custom emoji names, kept in memory.
+
+    Seeded from the emoji table on first use (or emoji.list, if the table's empty) and kept current by the
+    emoji_changed event handler. Patterns that start with literal text only get matched against the slice of
+    names that share that prefix, found by binary search; anything else is matched against every name.
+
+    Args:
+        eng: the db client
+        fetch_names: fallback for getting the names from Slack, if the emoji table has none
+    """
+
+    def __init__(self, eng: 'ViktorPSQLClient', fetch_names: Callable[[], Iterable[str]] = None):
+        self.eng = eng
+        self.fetch_names = fetch_names
+        self.names = None  # type: Optional[List[str]]
+        self.seeded_from = None  # type: Optional[str]
+        self.stats = {
+            'lookups': 0,
+            'prefix_lookups': 0,
+            'names_scanned': 0,
+            'adds': 0,
+            'renames': 0,
+            'removes': 0,
+        }
+        self._lock = threading.Lock()
+
+    def _seed(self):
+        with self.eng.session_mgr() as session:
+            names = [x.name for x in session.query(TableEmoji.name).filter(not_(TableEmoji.is_deleted)).all()]
+        seeded_from = 'table'
+        if len(names) == 0 and self.fetch_names is not None:
+            names = list(self.fetch_names())
+            seeded_from = 'api'
+        with self._lock:
+            if self.names is None:
+                self.names = sorted(set(names))
+                self.seeded_from = seeded_from
+
+    def _get_names(self) -> List[str]:
+        if self.names is None:
+            self._seed()
+        return self.names
+
+    def reload(self):
+        """Drops the current names so they're seeded again on next use"""
+        with self._lock:
+            self.names = None
+
+    def _add(self, names: List[str], name: str):
+        i = bisect.bisect_left(names, name)
+        if i == len(names) or names[i] != name:
+            names.insert(i, name)
+
+    def _remove(self, names: List[str], name: str):
+        i = bisect.bisect_left(names, name)
+        if i < len(names) and names[i] == name:
+            del names[i]
+
+    def add(self, name: str):
+        names = self._get_names()
+        with self._lock:
+            self._add(names, name)
+            self.stats['adds'] += 1
+
+    def rename(self, old_name: str, new_name: str):
+        names = self._get_names()
+        with self._lock:
+            self._remove(names, old_name)
+            self._add(names, new_name)
+            self.stats['renames'] += 1
+
+    def remove(self, names_to_remove: List[str]):
+        names = self._get_names()
+        with self._lock:
+            for name in names_to_remove:
+                self._remove(names, name)
+            self.stats['removes'] += len(names_to_remove)
+
+    def match(self, pattern: Union[str, re.Pattern]) -> List[str]:
+        """The names matching the regex (from the start of the name, as with `re.match`), in sorted order"""
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        prefix = get_literal_prefix(pattern.pattern) if pattern.flags & re.IGNORECASE == 0 else ''
+        names = self._get_names()
+        with self._lock:
+            if prefix != '':
+                # Everything that starts with the prefix sorts between it and the prefix followed by the
+                #   largest possible character
+                start = bisect.bisect_left(names, prefix)
+                end = bisect.bisect_left(names, prefix + '\U0010ffff', lo=start)
+                candidates = names[start:end]
+                self.stats['prefix_lookups'] += 1
+            else:
+                candidates = list(names)
+            self.stats['lookups'] += 1
+            self.stats['names_scanned'] += len(candidates)
+        return [x for x in candidates if pattern.match(x)]
+
+    def get_stats(self) -> Dict[str, Union[int, str, None]]:
+        with self._lock:
+            return {
+                'names': len(self.names) if self.names is not None else 0,
+                'seeded_from': self.seeded_from,
+                **self.stats,
+            }
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+from loguru import logger
+
+
+class EventLane:
+    """A single bounded queue and the worker threads that drain it"""
+
+    def __init__(self, name: str, n_workers: int, max_depth: int, log: logger):
+        self.name = name
+        self.log = log
+        self.queue = queue.Queue(maxsize=max_depth)
+        self.max_depth = max_depth
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'overflowed': 0,
+            'max_depth_seen': 0,
+            'total_wait_ms': 0.,
+            'max_wait_ms': 0.,
+            'total_run_ms': 0.,
+            'max_run_ms': 0.,
+        }
+        self._stats_lock = threading.Lock()
+        self.workers = []  # type: List[threading.Thread]
+        for i in range(n_workers):
+            worker = threading.Thread(target=self._work, name=f'event-{name}-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _record(self, **increments):
+        with self._stats_lock:
+            for k, v in increments.items():
+                if k.startswith('max_'):
+                    self.stats[k] = max(self.stats[k], v)
+                else:
+                    self.stats[k] += v
+
+    def run_task(self, func: Callable, enqueued_at: float):
+        """Runs a single task, keeping track of how long it waited and how long it ran"""
+        started_at = time.perf_counter()
+        wait_ms = (started_at - enqueued_at) * 1000
+        is_failed = False
+        try:
+            func()
+        except Exception as e:
+            is_failed = True
+            self.log.exception(f'Task in lane "{self.name}" failed: {e}')
+        run_ms = (time.perf_counter() - started_at) * 1000
+        self._record(completed=0 if is_failed else 1, failed=1 if is_failed else 0, total_wait_ms=wait_ms,
+                     max_wait_ms=wait_ms, total_run_ms=run_ms, max_run_ms=run_ms)
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    # Sentinel - time to shut down
+                    return
+                func, enqueued_at = task
+                self.run_task(func, enqueued_at)
+            finally:
+                self.queue.task_done()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = self.stats.copy()
+        n_done = stats['completed'] + stats['failed']
+        return {
+            'workers': len(self.workers),
+            'depth': self.queue.qsize(),
+            'max_depth': self.max_depth,
+            'max_depth_seen': stats['max_depth_seen'],
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'failed': stats['failed'],
+            'overflowed': stats['overflowed'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / n_done, 2) if n_done > 0 else 0.,
+            'max_wait_ms': round(stats['max_wait_ms'], 2),
+            'avg_run_ms': round(stats['total_run_ms'] / n_done, 2) if n_done > 0 else 0.,
+            'max_run_ms': round(stats['max_run_ms'], 2),
+        }
+
+
+class EventWorkerPool:
+    """Runs event processing off of the request thread so Slack can be acknowledged immediately.
+
+    Each lane gets its own bounded queue and set of workers, so a flood of one kind of event (e.g., reactions)
+    can't starve the others. When a lane is full, the submitting thread waits up to `put_timeout` seconds
+    for room and, failing that, runs the task itself. That slows the intake down instead of dropping events.
+
+    Args:
+        lanes: map of lane name -> number of worker threads for that lane
+        max_depth: max number of tasks allowed to wait in a single lane
+        put_timeout: seconds to wait for room in a full lane before running the task on the calling thread
+        parent_log: the logger to bind to
+    """
+
+    def __init__(self, lanes: Dict[str, int], parent_log: logger, max_depth: int = 500,
+                 put_timeout: float = 1.):
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        self.put_timeout = put_timeout
+        self.is_accepting = True
+        self.lanes = {}  # type: Dict[str, EventLane]
+        for name, n_workers in lanes.items():
+            self.lanes[name] = EventLane(name=name, n_workers=n_workers, max_depth=max_depth, log=self.log)
+
+    def submit(self, lane: str, func: Callable) -> bool:
+        """Queues up a task in the given lane.
+
+        Returns:
+            True if the task was queued, False if it had to be run on the calling thread instead
+        """
+        event_lane = self.lanes.get(lane)
+        if event_lane is None or not self.is_accepting:
+            # Nowhere to put it - handle it synchronously like before
+            func()
+            return False
+        event_lane._record(submitted=1)
+        try:
+            event_lane.queue.put((func, time.perf_counter()), timeout=self.put_timeout)
+        except queue.Full:
+            self.log.warning(f'Lane "{lane}" is full ({event_lane.max_depth} tasks). Running task inline.')
+            event_lane._record(overflowed=1)
+            event_lane.run_task(func, enqueued_at=time.perf_counter())
+            return False
+        event_lane._record(max_depth_seen=event_lane.queue.qsize())
+        return True
+
+    def shutdown(self, timeout: float = 10.) -> int:
+        """Stops accepting new tasks and lets the workers finish what's already queued
+
+        Returns:
+            the number of tasks that were still waiting when the timeout ran out
+        """
+        self.is_accepting = False
+        deadline = time.monotonic() + timeout
+        for name, lane in self.lanes.items():
+            self.log.debug(f'Draining lane "{name}" ({lane.queue.qsize()} tasks waiting)...')
+            for _ in lane.workers:
+                try:
+                    lane.queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+                except queue.Full:
+                    break
+        for lane in self.lanes.values():
+            for worker in lane.workers:
+                worker.join(timeout=max(deadline - time.monotonic(), 0))
+        remaining = sum(lane.queue.qsize() for lane in self.lanes.values())
+        if remaining > 0:
+            self.log.warning(f'Worker pool shut down with {remaining} tasks left unprocessed.')
+        return remaining
+
+    def get_stats(self, lane: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Depth, throughput and latency counters for each lane"""
+        if lane is not None:
+            return {lane: self.lanes[lane].get_stats()}
+        return {name: event_lane.get_stats() for name, event_lane in self.lanes.items()}
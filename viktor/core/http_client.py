@@ -0,0 +1,181 @@
+"""
+Shared HTTP client for calls to third-party sites.
+
+All outbound requests go through one `requests.Session`, so connections to a host are pooled and kept alive
+between calls. Every request gets a connect & read timeout unless it sets its own. Each host has a circuit
+breaker: after `failure_threshold` failures in a row (errors, timeouts or 5xx responses), requests to it fail
+fast with `CircuitOpenError` for `reset_timeout` seconds, after which a single trial request is let through.
+"""
+import threading
+import time
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for a connection, and for the response to start coming back
+DEFAULT_TIMEOUT = (3.05, 10.)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of making a request to a host whose circuit breaker is open"""
+    pass
+
+
+class CircuitBreaker:
+    """Tracks the consecutive failures of calls to a single host
+
+    Args:
+        failure_threshold: number of failures in a row that opens the circuit
+        reset_timeout: seconds the circuit stays open before a trial call is let through
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.n_failures = 0
+        self.opened_at = None  # type: Optional[float]
+        self.is_trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may be made. Once the reset timeout's passed, only one trial call is allowed at a time"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.is_trial_running:
+                self.is_trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.n_failures = 0
+            self.opened_at = None
+            self.is_trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.n_failures += 1
+            if self.is_trial_running or self.n_failures >= self.failure_threshold:
+                # Failed trial calls restart the timeout
+                self.opened_at = time.monotonic()
+            self.is_trial_running = False
+
+
+class HttpClient:
+    """Pooled HTTP client with default timeouts, per-host circuit breakers and per-host metrics
+
+    Args:
+        timeout: the default (connect, read) timeout in seconds
+        pool_maxsize: max number of connections kept open per host
+        failure_threshold: number of failures in a row that opens a host's circuit
+        reset_timeout: seconds a host's circuit stays open
+    """
+
+    def __init__(self, timeout: Tuple[float, float] = DEFAULT_TIMEOUT, pool_maxsize: int = 10,
+                 failure_threshold: int = 5, reset_timeout: float = 30.):
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breakers = {}  # type: Dict[str, CircuitBreaker]
+        self.stats = {}  # type: Dict[str, Dict[str, Union[int, float]]]
+        self._lock = threading.Lock()
+
+    def _get_breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(failure_threshold=self.failure_threshold,
+                                                               reset_timeout=self.reset_timeout)
+            return breaker
+
+    def _record(self, host: str, stat: str, latency: float = None):
+        with self._lock:
+            host_stats = self.stats.setdefault(host, {
+                'requests': 0,
+                'errors': 0,
+                'rejected': 0,
+                'total_s': 0.,
+                'max_s': 0.,
+            })
+            host_stats[stat] += 1
+            if latency is not None:
+                host_stats['total_s'] += latency
+                host_stats['max_s'] = max(host_stats['max_s'], latency)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Makes a request through the shared session
+
+        Raises:
+            CircuitOpenError: if the host's had too many failures recently
+            requests.RequestException: if the request itself fails (incl. timing out)
+        """
+        host = urlparse(url).netloc
+        breaker = self._get_breaker(host)
+        if not breaker.allow():
+            self._record(host, 'rejected')
+            raise CircuitOpenError(f'Too many recent failures calling {host} - skipping request')
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except BaseException:
+            # Whatever went wrong, the failure's recorded so a trial call can't leave the circuit stuck open
+            breaker.record_failure()
+            self._record(host, 'errors', latency=time.perf_counter() - start)
+            raise
+        if resp.status_code >= 500:
+            breaker.record_failure()
+            self._record(host, 'errors', latency=time.perf_counter() - start)
+        else:
+            breaker.record_success()
+            self._record(host, 'requests', latency=time.perf_counter() - start)
+        return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Union[int, float, str]]]:
+        with self._lock:
+            stats = {host: dict(x) for host, x in self.stats.items()}
+            states = {host: x.state for host, x in self.breakers.items()}
+        for host, host_stats in stats.items():
+            n_timed = host_stats['requests'] + host_stats['errors']
+            host_stats['avg_ms'] = round(host_stats.pop('total_s') / n_timed * 1000, 1) if n_timed > 0 else 0.
+            host_stats['max_ms'] = round(host_stats.pop('max_s') * 1000, 1)
+            host_stats['circuit'] = states.get(host, 'closed')
+        return stats
+
+
+_client = None  # type: Optional[HttpClient]
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Returns the client shared by everything making outbound requests, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from io import StringIO
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
 import re
+import threading
 from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
     Optional,
     Tuple,
     Union,
@@ -11,13 +19,20 @@ import urllib.parse as parse
 
 from lxml import etree
 import numpy as np
-import requests
 from slacktools.block_kit.base import BlocksType
 from slacktools.block_kit.blocks import (
     MarkdownSectionBlock,
     PlainTextHeaderBlock,
 )
 
+from viktor.core.cache import PersistentLookupCache
+from viktor.core.eki_parser import (
+    extract_examples,
+    extract_translations,
+    parse_html,
+)
+from viktor.core.http_client import get_http_client
+
 
 class Linguistics:
     """Language methods"""
@@ -29,14 +44,61 @@ class Linguistics:
     EKI_EKSS = f'{EKI_BASE}/ekss/index.cgi'
     FIL_BASE = 'https://www.filosoft.ee'
 
+    # Max number of lookups running at once across all commands
+    LOOKUP_WORKERS = 8
+    _executor = None  # type: Optional[ThreadPoolExecutor]
+    _executor_lock = threading.Lock()
+
+    # Parsed results of the lookups above, by source & word. Lookups aren't cached until this is set
+    lookup_cache = None  # type: Optional[PersistentLookupCache]
+
+    @classmethod
+    def set_lookup_cache(cls, cache: PersistentLookupCache):
+        cls.lookup_cache = cache
+
+    @classmethod
+    def _cached_lookup(cls, source: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Returns the result of the lookup from the cache, if there is one, calling `loader` on a miss.
+        Loaders return None when nothing was found, so that gets cached too"""
+        if cls.lookup_cache is None:
+            return loader()
+        return cls.lookup_cache.get_or_load(source, key, loader)
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """The pool shared by all lookups, created on first use"""
+        with Linguistics._executor_lock:
+            if Linguistics._executor is None:
+                Linguistics._executor = ThreadPoolExecutor(max_workers=cls.LOOKUP_WORKERS,
+                                                           thread_name_prefix='linguistics')
+            return Linguistics._executor
+
+    @classmethod
+    def _lookup_lemmas(cls, words: List[str], lookup: Callable[[str], Any]) -> List[Tuple[str, Optional[str], Any]]:
+        """Runs the lookup on the lemma of each word.
+
+        Lemmas are looked up at the same time as the lookup is run on the words as given, on the guess that most
+        words are already in their root form. Only words whose lemma turns out to be different need a second
+        round trip. All waiting is done here, so the pool's workers never wait on each other.
+
+        Returns:
+            (word, lemma, lookup result) for each word. Lemma & result are None if the lemma wasn't found
+        """
+        executor = cls._get_executor()
+        lemma_futures = [executor.submit(cls.get_root, x) for x in words]
+        lookup_futures = {x: executor.submit(lookup, x) for x in dict.fromkeys(words)}  # type: Dict[str, Future]
+        lemmas = [x.result() for x in lemma_futures]
+        for lemma in lemmas:
+            if lemma is not None and lemma not in lookup_futures:
+                lookup_futures[lemma] = executor.submit(lookup, lemma)
+        return [(word, lemma, lookup_futures[lemma].result() if lemma is not None else None)
+                for word, lemma in zip(words, lemmas)]
+
     @staticmethod
     def _prep_for_xpath(url: str) -> etree.ElementBase:
         """Takes in a url and returns a tree that can be searched using xpath"""
-        page = requests.get(url)
-        html = page.content.decode('utf-8')
-        parser = etree.HTMLParser()
-        tree = etree.parse(StringIO(html), parser=parser)
-        return tree
+        page = get_http_client().get(url)
+        return parse_html(page.content)
 
     @classmethod
     def get_etymology(cls, message: str, pattern: str) -> Union[str, BlocksType]:
@@ -65,16 +127,19 @@ class Linguistics:
             _text = extract_text(res, './div/section')
             return _title, _text
 
+        def load_entries() -> Optional[List[Tuple[str, str]]]:
+            url = f'{cls.ETY_SEARCH}?q={parse.quote(word)}'
+            content = cls._prep_for_xpath(url)
+            results = content.xpath('//div[contains(@class, "word--C9UPa")]')[:3]
+            return [get_title_and_desc(x) for x in results] or None
+
         word = re.sub(pattern, '', message).strip()
 
-        url = f'{cls.ETY_SEARCH}?q={parse.quote(word)}'
-        content = cls._prep_for_xpath(url)
-        results = content.xpath('//div[contains(@class, "word--C9UPa")]')[:3]
+        entries = cls._cached_lookup('etymology', word, load_entries)
         output = []
-        if len(results) > 0:
+        if entries is not None:
             output.append(PlainTextHeaderBlock(f'Etymology of `{word}`'))
-            for result in results:
-                title, text = get_title_and_desc(result)
+            for title, text in entries:
                 output.append(MarkdownSectionBlock(f'*`{title}`*\n{text}'))
 
         if len(output) > 0:
@@ -85,84 +150,96 @@ class Linguistics:
     @classmethod
     def prep_message_for_translation(cls, message: str, match_pattern: str) -> Optional[str]:
         """Takes in the raw message and prepares it for lookup"""
-        # Format should be like `et <word>` or `en <word>`
-        word = re.sub(match_pattern, '', message).strip()
+        # Format should be like `et <word> [<word> ...]` or `en <word> [<word> ...]`
+        words = re.sub(match_pattern, '', message).strip().split()
         target = message[:2]
+        if len(words) == 0:
+            return 'Translation of what, exactly?'
 
-        processed_word = cls.get_root(word) if target == 'en' else word
+        def lookup(word: str) -> Optional[List[str]]:
+            return cls._lookup_translation(word, target)
 
-        if processed_word is not None:
-            return cls._get_translation(processed_word, target)
-        else:
-            return f'Translation not found for `{word}`.'
+        if target != 'en':
+            # English words are looked up as they are
+            results = cls._get_executor().map(lookup, words)
+            return '\n'.join(cls._format_translation(word, result) for word, result in zip(words, results))
+
+        responses = []
+        for word, lemma, result in cls._lookup_lemmas(words, lookup):
+            if lemma is not None:
+                responses.append(cls._format_translation(lemma, result))
+            else:
+                responses.append(f'Translation not found for `{word}`.')
+        return '\n'.join(responses)
 
     @classmethod
     def _get_translation(cls, word: str, target: str = 'en') -> str:
         """Returns the English translation of the Estonian word"""
-        # Find the English translation of the word using EKI
-        eki_url = f'{cls.EKI_IES}?Q={parse.quote(word)}&F=V&C06={target}'
-        content = cls._prep_for_xpath(eki_url)
-
-        results = content.xpath('//div[@class="tervikart"]')
-        result = []
-        for i in range(0, len(results)):
-            et_result = content.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@lang="et"]')
-            en_result = content.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@lang="en"]')
-            # Process text in elements
-            et_result = [''.join(x.itertext()) for x in et_result]
-            en_result = [''.join(x.itertext()) for x in en_result]
-            if target == 'en':
-                if word in et_result:
-                    result += en_result
-            else:
-                if word in en_result:
-                    result += et_result
+        return cls._format_translation(word, cls._lookup_translation(word, target))
 
-        if len(result) > 0:
-            # Make all entries lowercase and remove dupes
-            result = list(set(map(str.lower, result)))
+    @classmethod
+    def _lookup_translation(cls, word: str, target: str = 'en') -> Optional[List[str]]:
+        return cls._cached_lookup(f'translation_{target}', word, lambda: cls._load_translation(word, target))
+
+    @staticmethod
+    def _format_translation(word: str, result: Optional[List[str]]) -> str:
+        if result is not None:
             return f"`{word}`: {', '.join(result)}"
         else:
             return f'No results found for `{word}` :frowning:'
 
+    @classmethod
+    def _load_translation(cls, word: str, target: str = 'en') -> Optional[List[str]]:
+        """Scrapes the translations of the word from EKI"""
+        # Find the English translation of the word using EKI
+        eki_url = f'{cls.EKI_IES}?Q={parse.quote(word)}&F=V&C06={target}'
+        result = extract_translations(cls._prep_for_xpath(eki_url), word, target)
+        if len(result) > 0:
+            # Make all entries lowercase and remove dupes
+            return list(set(map(str.lower, result)))
+        return None
+
     @classmethod
     def prep_message_for_examples(cls, message: str, match_pattern: str) -> Optional[str]:
         """Takes in the raw message and prepares it for lookup"""
-        # Format should be like `et <word>` or `en <word>`
-        word = re.sub(match_pattern, '', message).strip()
-        processed_word = cls.get_root(word)
+        # Format should be like `ekss <word> [<word> ...]`
+        words = re.sub(match_pattern, '', message).strip().split()
+        if len(words) == 0:
+            return 'Examples of what, exactly?'
 
-        if processed_word is not None:
-            return cls._get_examples(processed_word, max_n=5)
-        else:
-            return f'No examples found for `{word}`.'
+        responses = []
+        for word, lemma, exp_list in cls._lookup_lemmas(words, cls._lookup_examples):
+            if lemma is not None:
+                responses.append(cls._format_examples(lemma, exp_list, max_n=5))
+            else:
+                responses.append(f'No examples found for `{word}`.')
+        return '\n'.join(responses)
 
     @classmethod
     def _get_examples(cls, word: str, max_n: int = 5) -> str:
         """Returns some example sentences of the Estonian word"""
-        # Find the English translation of the word using EKI
+        return cls._format_examples(word, cls._lookup_examples(word), max_n=max_n)
+
+    @classmethod
+    def _lookup_examples(cls, word: str) -> Optional[List[str]]:
+        return cls._cached_lookup('examples', word, lambda: cls._load_examples(word))
+
+    @staticmethod
+    def _format_examples(word: str, exp_list: Optional[List[str]], max_n: int = 5) -> str:
+        if exp_list is None:
+            return f'No example sentences found for `{word}`'
+        # Sample after the cache, so repeat requests still get a different set
+        if len(exp_list) > max_n:
+            exp_list = [exp_list[x] for x in np.random.choice(len(exp_list), max_n, False).tolist()]
+        examples = '\n'.join([f'`{x}`' for x in exp_list])
+        return f'Examples for `{word}`:\n{examples}'
+
+    @classmethod
+    def _load_examples(cls, word: str) -> Optional[List[str]]:
+        """Scrapes all the example sentences of the word from EKI"""
+        # Find the example sentences of the word using EKI
         ekss_url = f'{cls.EKI_EKSS}?Q={parse.quote(word)}&F=M'
-        content = cls._prep_for_xpath(ekss_url)
-
-        results = content.xpath('//div[@class="tervikart"]')
-        exp_list = []
-        for i in range(0, len(results)):
-            result = content.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@class="m leitud_id"]')
-            examples = content.xpath(f'(//div[@class="tervikart"])[{i + 1}]/*/span[@class="n"]')
-            # Process text in elements
-            result = [''.join(x.itertext()) for x in result]
-            examples = [''.join(x.itertext()) for x in examples]
-            if word in result:
-                re.split(r'[?.!]', ''.join(examples))
-                exp_list += re.split(r'[?.!]', ''.join(examples))
-                # Strip of leading / tailing whitespace
-                exp_list = [x.strip() for x in exp_list if x.strip() != '']
-                if len(exp_list) > max_n:
-                    exp_list = [exp_list[x] for x in np.random.choice(len(exp_list), max_n, False).tolist()]
-                examples = '\n'.join([f'`{x}`' for x in exp_list])
-                return f'Examples for `{word}`:\n{examples}'
-
-        return f'No example sentences found for `{word}`'
+        return extract_examples(cls._prep_for_xpath(ekss_url), word) or None
 
     @classmethod
     def prep_message_for_root(cls, message: str, match_pattern: str) -> Optional[str]:
@@ -178,12 +255,17 @@ class Linguistics:
         else:
             return f'Lemmatization not found for `{word}`.'
 
-    @staticmethod
-    def get_root(word: str) -> Optional[str]:
+    @classmethod
+    def get_root(cls, word: str) -> Optional[str]:
         """Retrieves the root word (nom. sing.) from Lemmatiseerija"""
+        return cls._cached_lookup('lemma', word, lambda: cls._load_root(word))
+
+    @staticmethod
+    def _load_root(word: str) -> Optional[str]:
+        """Looks up the root word with Lemmatiseerija"""
         # First, look up the word's root with the lemmatiseerija
         lemma_url = f'https://www.filosoft.ee/lemma_et/lemma.cgi?word={parse.quote(word)}'
-        content = requests.get(lemma_url).content
+        content = get_http_client().get(lemma_url).content
         content = str(content, 'utf-8')
         # Use regex to find the word/s
         lemma_regex = re.compile(r'<strong>.*na\slemma[d]?\son:</strong><br>(\w+)<br>')
@@ -3,7 +3,6 @@ from random import (
     randint,
 )
 import re
-import string
 from typing import (
     Dict,
     List,
@@ -12,24 +11,19 @@ from typing import (
     Union,
 )
 
-import requests
 from slacktools.block_kit.base import BlocksType
 from slacktools.block_kit.blocks import (
     MarkdownSectionBlock,
     PlainTextHeaderBlock,
 )
 from slacktools.slack_input_parser import SlackInputParser
-from sqlalchemy.sql import (
-    and_,
-    func,
-)
 
+from viktor.core.http_client import get_http_client
 from viktor.db_eng import ViktorPSQLClient
 from viktor.model import (
     AcronymType,
     ResponseCategory,
     ResponseType,
-    TableAcronym,
     TableResponse,
 )
 
@@ -101,14 +95,11 @@ class PhraseBuilders:
     def _get_random_response(self, resp_type: ResponseType, category: ResponseCategory) -> str:
         """Retrieves a random response from the provided type/category combo. If no combo exists,
             will instead return a string saying that the pairing was not found"""
-        with self.eng.session_mgr() as session:
-            resp = session.query(TableResponse.text).filter(and_(
-                TableResponse.type == resp_type,
-                TableResponse.category == category
-            )).order_by(func.random()).limit(1).one_or_none()
-            if resp is None:
-                return f'Cannot find combo in table: {resp_type.name} + {category.name}'
-            return resp.text
+        resp = self.eng.corpus.sample(resp_type, category, k=1)
+        if len(resp) == 0:
+            return f'Cannot find combo in table: {resp_type.name} + {category.name}'
+        _, text = resp[0]
+        return text
 
     def sh_response(self) -> str:
         return self._get_random_response(ResponseType.GENERAL, category=ResponseCategory.STAKEHOLDER)
@@ -133,21 +124,11 @@ class PhraseBuilders:
         # Number of guesses to make
         n_times = SlackInputParser.get_flag_from_command(message, flags=['n'], default='3')
         n_times = int(n_times) if n_times.isnumeric() else 3
-        # Select the acronym list to use, verify that we have some words in that group
-        with self.eng.session_mgr() as session:
-            words = [x.text for x in session.query(TableAcronym).filter(TableAcronym.type == acronym_group).all()]
-
-        if len(words) == 0:
+        # Select the acronym words to use (organized by first letter), verify that we have some words in that group
+        word_dict = self.eng.acronym_index.get_index(acronym_group)
+        if not any(word_dict.values()):
             return f'Unable to find an acronym group for {acronym_group_str}'
 
-        # Put the words into a dictionary, classified by first letter
-        a2z = string.ascii_lowercase
-        word_dict = {k: [] for k in a2z}
-        for word in words:
-            word = word.replace('\n', '')
-            if len(word) > 1:
-                word_dict[word[0].lower()].append(word.lower())
-
         # Build out the real acryonym meaning
         guesses = []
         for guess in range(n_times):
@@ -184,31 +165,10 @@ class PhraseBuilders:
         resp_type = getattr(ResponseType, cmd.upper(), ResponseType.COMPLIMENT)
         category = getattr(ResponseCategory, category_str.upper(), ResponseCategory.STANDARD)
 
-        with self.eng.session_mgr() as session:
-            subq = session.query(
-                TableResponse.text,
-                func.row_number().over(partition_by=TableResponse.stage, order_by=func.random()).label('row_no')
-            ).filter(and_(
-                TableResponse.type == resp_type,
-                TableResponse.category == category
-            )).subquery()
-            words = session.query(subq).filter(and_(
-                subq.c.row_no <= n_times
-            )).all()
-            session.expunge_all()
-
-        if len(words) == 0:
+        # Draw n words from each stage, then group the i-th draw of every stage together into the i-th phrase
+        word_lists = self.eng.corpus.sample_stages(resp_type, category, k=n_times)  # type: List[List[str]]
+        if len(word_lists) == 0:
             return f'Unable to find a(n) {cmd} group for {category_str}'
-        # Organize the words by stage
-        # Build a dictionary of the query results, organized by stage
-        word_dict = {}  # type: Dict[int, List[str]]
-        for word in words:
-            if word.row_no in word_dict.keys():
-                word_dict[word.row_no].append(word.text)
-            else:
-                word_dict[word.row_no] = [word.text]
-        # Use the word dict to randomly select words from each stage
-        word_lists = list(word_dict.values())  # type: List[List[str]]
 
         # Build the phrases
         if cmd == 'insult':
@@ -283,29 +243,23 @@ class PhraseBuilders:
 
     @staticmethod
     def get_evil_insult() -> Optional[str]:
-        resp = requests.get('https://evilinsult.com/generate_insult.php?lang=en&type=json')
+        resp = get_http_client().get('https://evilinsult.com/generate_insult.php?lang=en&type=json')
         if resp.status_code == 200:
             return resp.json().get('insult')
 
     def facts(self, category: ResponseCategory = ResponseCategory.STANDARD) -> Union[str, BlocksType]:
         """Gives the user a random fact at their request"""
-        # Extract all related words from db
-        with self.eng.session_mgr() as session:
-            randfact = session.query(TableResponse).filter(and_(
-                TableResponse.type == ResponseType.FACT,
-                TableResponse.category == category
-            )).order_by(func.random()).limit(1).one_or_none()
-            if randfact is None:
-                return 'Couldn\'t find a fact for that category?'
-            session.expunge(randfact)
-
-        rf_id = randfact.response_id
+        randfact = self.eng.corpus.sample(ResponseType.FACT, category, k=1)
+        if len(randfact) == 0:
+            return 'Couldn\'t find a fact for that category?'
+
+        rf_id, rf_text = randfact[0]
 
         fact_header = f'{"Official" if category == ResponseCategory.STANDARD else "Conspiracy"} fact #{rf_id}'
 
         return [
             PlainTextHeaderBlock(fact_header),
-            MarkdownSectionBlock(randfact.text)
+            MarkdownSectionBlock(rf_text)
         ]
 
     def conspiracy_fact(self) -> Union[str, List[Dict]]:
@@ -313,7 +267,7 @@ class PhraseBuilders:
 
     @staticmethod
     def dadjoke():
-        resp = requests.get('https://icanhazdadjoke.com/',  headers={'Accept': 'application/json'})
+        resp = get_http_client().get('https://icanhazdadjoke.com/', headers={'Accept': 'application/json'})
         if resp.status_code == 200:
             result = resp.json()
             return result.get("joke")
@@ -1,5 +1,12 @@
 from datetime import datetime
-from typing import Union
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from zoneinfo import ZoneInfo
 
 from loguru import logger
@@ -8,7 +15,14 @@ from slacktools.api.events.pin import (
     PinRemoved,
 )
 from slacktools.api.web.pins import Pin
-from sqlalchemy.engine.row import Row
+from sqlalchemy import (
+    VARCHAR,
+    literal,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import (
     func,
     or_,
@@ -21,60 +35,111 @@ from viktor.model import (
     TableSlackUser,
 )
 
+UNKNOWN_BOT_HASH = 'BUNKNOWN'
 
-def collect_pins(pin_obj: Union[PinAdded, PinRemoved, Pin], psql_client: ViktorPSQLClient, log: logger,
-                 is_event: bool) -> TableQuote:
-    """Attempts to load pinned message into the quotes db"""
-    us_ct = ZoneInfo('US/Central')
-    if is_event:
-        pin_obj: Union[PinAdded, PinRemoved]
-        pin_item = pin_obj.item.message
-        pin_ts = pin_obj.event_ts
-        author_name = pin_item.username
-        channel_id = pin_obj.channel_id
-    else:
-        pin_obj: Pin
-        pin_item = pin_obj.message
-        pin_ts = pin_obj.created
-        author_name = None
-        channel_id = pin_obj.channel
-    try:
-        author_uid = pin_item.user
-    except AttributeError:
-        # Try getting bot id
-        author_uid = pin_item.bot_id
 
-    with psql_client.session_mgr() as session:
-        author = session.query(TableSlackUser).filter(or_(
-            TableSlackUser.slack_user_hash == author_uid,
-            TableSlackUser.slack_bot_hash == author_uid
-        )).one_or_none()
-
-        if author is None and author_uid.startswith('B') and author_name is not None:
-            # Probably a bot thing. Check if the user hash begins with 'b'.
-            #   If so, try to write that id to the db so next time it goes through
-            author = session.query(TableSlackUser).filter(
-                func.lower(TableSlackUser.real_name) == author_name.lower()
-            ).one_or_none()
-        if author is None:
-            # If author is still none, use the unknown user
-            author = session.query(TableSlackUser).filter(
-                TableSlackUser.slack_bot_hash == 'BUNKNOWN'
-            ).one_or_none()
-        session.expunge(author)
+class PinRef:
+    """The parts of a pin (from either an event or the pins api) that get written to the quotes table"""
 
-    with psql_client.session_mgr() as session:
-        pinner = session.query(TableSlackUser).filter(
-            TableSlackUser.slack_user_hash == pin_obj.created_by
-        ).one_or_none()
-        if pinner is None:
-            pinner = session.query(TableSlackUser).filter(
-                TableSlackUser.slack_bot_hash == 'BUNKNOWN'
-            ).one_or_none()
-        session.expunge(pinner)
-    log.debug('Adding pinned message to table...')
+    def __init__(self, pin_obj: Union[PinAdded, PinRemoved, Pin], is_event: bool):
+        if is_event:
+            pin_obj: Union[PinAdded, PinRemoved]
+            self.item = pin_obj.item.message
+            self.pin_ts = pin_obj.event_ts
+            self.author_name = self.item.username
+            self.channel_id = pin_obj.channel_id
+        else:
+            pin_obj: Pin
+            self.item = pin_obj.message
+            self.pin_ts = pin_obj.created
+            self.author_name = None
+            self.channel_id = pin_obj.channel
+        try:
+            self.author_uid = self.item.user
+        except AttributeError:
+            # Try getting bot id
+            self.author_uid = self.item.bot_id
+        self.pinner_uid = pin_obj.created_by
+
+    @property
+    def is_bot_author(self) -> bool:
+        """Whether the author might only be found by name - a bot id with a username attached"""
+        return self.author_uid is not None and self.author_uid.startswith('B') and self.author_name is not None
+
+
+class PinKeyLookup:
+    """User and channel keys for a set of pins, resolved the same way for each pin:
+
+     - author: by user hash or bot hash, then (for bots with a username) by real name, then the unknown user
+     - pinner: by user hash, then the unknown user
+     - channel: by channel hash
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, int, Optional[str], Optional[str], Optional[str]]]):
+        self.user_hashes = {}  # type: Dict[str, int]
+        self.bot_hashes = {}  # type: Dict[str, int]
+        self.real_names = {}  # type: Dict[str, int]
+        self.channel_hashes = {}  # type: Dict[str, int]
+        for kind, key, slack_hash, bot_hash, real_name in rows:
+            if kind == 'channel':
+                self.channel_hashes[slack_hash] = key
+                continue
+            self.user_hashes[slack_hash] = key
+            if bot_hash is not None:
+                self.bot_hashes.setdefault(bot_hash, key)
+            if real_name is not None:
+                self.real_names.setdefault(real_name, key)
+        self.unknown_user_key = self.bot_hashes.get(UNKNOWN_BOT_HASH)
+
+    @classmethod
+    def load(cls, session: Session, pin_refs: List[PinRef]) -> 'PinKeyLookup':
+        """Fetches every user and channel the pins refer to in a single query"""
+        user_hashes = {x.author_uid for x in pin_refs if x.author_uid is not None} | \
+            {x.pinner_uid for x in pin_refs if x.pinner_uid is not None}
+        bot_hashes = {x.author_uid for x in pin_refs if x.author_uid is not None} | {UNKNOWN_BOT_HASH}
+        real_names = {x.author_name.lower() for x in pin_refs if x.is_bot_author}
+        channel_hashes = {x.channel_id for x in pin_refs if x.channel_id is not None}
 
-    text = pin_item.text
+        user_filters = [
+            TableSlackUser.slack_user_hash.in_(user_hashes),
+            TableSlackUser.slack_bot_hash.in_(bot_hashes),
+        ]
+        if len(real_names) > 0:
+            user_filters.append(func.lower(TableSlackUser.real_name).in_(real_names))
+        users = select(
+            literal('user', VARCHAR).label('kind'),
+            TableSlackUser.user_id.label('key'),
+            TableSlackUser.slack_user_hash.label('slack_hash'),
+            TableSlackUser.slack_bot_hash.label('bot_hash'),
+            func.lower(TableSlackUser.real_name).label('real_name'),
+        ).where(or_(*user_filters))
+        channels = select(
+            literal('channel', VARCHAR),
+            TableSlackChannel.channel_id,
+            TableSlackChannel.slack_channel_hash,
+            null().cast(VARCHAR),
+            null().cast(VARCHAR),
+        ).where(TableSlackChannel.slack_channel_hash.in_(channel_hashes))
+        return cls(session.execute(union_all(users, channels)).all())
+
+    def get_author_key(self, pin_ref: PinRef) -> Optional[int]:
+        key = self.user_hashes.get(pin_ref.author_uid, self.bot_hashes.get(pin_ref.author_uid))
+        if key is None and pin_ref.is_bot_author:
+            # Probably a bot thing - see if there's a user with the same name
+            key = self.real_names.get(pin_ref.author_name.lower())
+        return key if key is not None else self.unknown_user_key
+
+    def get_pinner_key(self, pin_ref: PinRef) -> Optional[int]:
+        return self.user_hashes.get(pin_ref.pinner_uid, self.unknown_user_key)
+
+    def get_channel_key(self, pin_ref: PinRef) -> Optional[int]:
+        return self.channel_hashes.get(pin_ref.channel_id)
+
+
+def build_quote(pin_ref: PinRef, key_lookup: PinKeyLookup) -> TableQuote:
+    """Turns a pin into a quote row, given the keys of the users & channels it refers to"""
+    us_ct = ZoneInfo('US/Central')
+    pin_item = pin_ref.item
 
     # Try getting file info
     file_urls_list = []
@@ -96,22 +161,34 @@ def collect_pins(pin_obj: Union[PinAdded, PinRemoved, Pin], psql_client: ViktorP
         if img_url is not None:
             img_urls_list.append(img_url)
 
-    log.debug(f'Passing text: "{text[:10]}"')
-    with psql_client.session_mgr() as session:
-        channel_key = session.query(TableSlackChannel.channel_id).filter(
-            TableSlackChannel.slack_channel_hash == channel_id
-        ).one_or_none()
-        if isinstance(channel_key, Row):
-            # Convert to id
-            channel_key = next(iter(channel_key), None)
     return TableQuote(
-        text=text,
-        author_user_key=author.user_id,
-        channel_key=channel_key,
-        pinner_user_key=pinner.user_id if pinner is not None else None,
+        text=pin_item.text,
+        author_user_key=key_lookup.get_author_key(pin_ref),
+        channel_key=key_lookup.get_channel_key(pin_ref),
+        pinner_user_key=key_lookup.get_pinner_key(pin_ref),
         link=pin_item.permalink,
         image_urls=img_urls_list,
         file_urls=file_urls_list,
         message_timestamp=datetime.fromtimestamp(float(pin_item.ts), us_ct),
-        pin_timestamp=datetime.fromtimestamp(float(pin_ts), us_ct)
+        pin_timestamp=datetime.fromtimestamp(float(pin_ref.pin_ts), us_ct)
     )
+
+
+def collect_pins_batch(pin_objs: List[Union[PinAdded, PinRemoved, Pin]], psql_client: ViktorPSQLClient,
+                       log: logger, is_event: bool) -> List[TableQuote]:
+    """Builds quote rows for a list of pins, looking up all of their users & channels in one go"""
+    if len(pin_objs) == 0:
+        return []
+    pin_refs = [PinRef(x, is_event=is_event) for x in pin_objs]
+    with psql_client.session_mgr() as session:
+        key_lookup = PinKeyLookup.load(session, pin_refs)
+    log.debug(f'Resolved {len(key_lookup.user_hashes)} users and {len(key_lookup.channel_hashes)} channels '
+              f'for {len(pin_refs)} pins')
+    return [build_quote(x, key_lookup) for x in pin_refs]
+
+
+def collect_pins(pin_obj: Union[PinAdded, PinRemoved, Pin], psql_client: ViktorPSQLClient, log: logger,
+                 is_event: bool) -> TableQuote:
+    """Attempts to load pinned message into the quotes db"""
+    log.debug('Adding pinned message to table...')
+    return collect_pins_batch([pin_obj], psql_client=psql_client, log=log, is_event=is_event)[0]
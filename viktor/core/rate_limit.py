@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import (
+    Dict,
+    Optional,
+    Union,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing calls to a rate-limited API.
+
+    Tokens refill continuously at `rate` per second, up to `capacity`. Each call takes a token, waiting for one
+    to come available if the bucket's empty. When the API says to back off (e.g., a 429 with Retry-After),
+    `pause` holds every caller until the given time has passed.
+
+    Args:
+        rate: tokens added per second
+        capacity: max number of tokens held, i.e., the size of a burst
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.
+        self.stats = {
+            'acquired': 0,
+            'waits': 0,
+            'waited_s': 0.,
+            'pauses': 0,
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls: float, capacity: float = 1.) -> 'TokenBucket':
+        """Makes a bucket for an API limit given in calls/minute (e.g., Slack's method tiers)"""
+        return cls(rate=calls / 60., capacity=capacity)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> float:
+        """Takes a token if one's available
+
+        Returns:
+            0 if a token was taken, otherwise the number of seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.stats['acquired'] += 1
+                return 0.
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until a token is taken. Returns False if that didn't happen within the timeout"""
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if timeout is not None:
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            with self._lock:
+                self.stats['waits'] += 1
+                self.stats['waited_s'] += wait
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Holds off all callers for the next `seconds` seconds and drains the bucket"""
+        with self._lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.
+            self.updated_at = self.paused_until
+            self.stats['pauses'] += 1
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            return {
+                'rate_per_min': round(self.rate * 60, 2),
+                'tokens': round(self.tokens, 2),
+                **self.stats,
+                'waited_s': round(self.stats['waited_s'], 2),
+            }
@@ -0,0 +1,196 @@
+"""
+Pacing of outbound Slack Web API calls.
+
+Slack limits each Web API method per workspace by tier (e.g., Tier 2 is ~20 calls/min, Tier 3 ~50), and
+chat.postMessage to about one message a second per channel. Every call made through the scheduler first takes a
+token from the bucket of its method (or method & channel), so a burst of activity queues up instead of running
+into 429s. When a 429 does come back, the method's bucket is paused for the Retry-After period and the call is
+retried. Identical read-only calls that are already in flight are coalesced - later callers wait on the first
+one's response rather than making their own.
+"""
+from concurrent.futures import Future
+import json
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from viktor.core.rate_limit import TokenBucket
+
+# Calls per minute & burst size of each of Slack's rate limit tiers
+TIER_LIMITS = {
+    1: (1, 1),
+    2: (20, 3),
+    3: (50, 5),
+    4: (100, 10),
+    # Special case: about one message a second, per channel
+    'post': (60, 3),
+}
+# The tier of each method used. Methods not listed here are passed straight through to the client
+METHOD_TIERS = {
+    'chat.postMessage': 'post',
+    'chat.postEphemeral': 'post',
+    'chat.update': 3,
+    'chat.delete': 3,
+    'conversations.history': 3,
+    'conversations.info': 3,
+    'conversations.join': 3,
+    'conversations.list': 2,
+    'conversations.open': 3,
+    'conversations.replies': 3,
+    'emoji.list': 2,
+    'files.upload': 2,
+    'pins.list': 2,
+    'reactions.add': 3,
+    'reactions.get': 3,
+    'reactions.remove': 2,
+    'users.info': 4,
+    'users.list': 2,
+    'users.profile.get': 4,
+    'views.open': 4,
+}
+# Methods with a bucket for each channel rather than one for the whole workspace
+PER_CHANNEL_METHODS = {'chat.postMessage', 'chat.postEphemeral'}
+# Read-only methods whose identical in-flight calls can share a response. Writes are never coalesced
+COALESCED_METHODS = {
+    'conversations.info',
+    'conversations.list',
+    'emoji.list',
+    'reactions.get',
+    'users.info',
+    'users.list',
+    'users.profile.get',
+}
+
+
+def get_method_name(attr: str) -> str:
+    """Converts a WebClient attribute (e.g., 'reactions_add') to its api method name ('reactions.add')"""
+    return attr.replace('_', '.')
+
+
+class SlackScheduler:
+    """Paces Slack Web API calls by their method's rate limit tier
+
+    Args:
+        client: the Slack web client to make the calls with
+        parent_log: the logger to bind to
+        max_retries: number of times a call is retried after being rate-limited
+    """
+
+    def __init__(self, client: WebClient, parent_log: logger, max_retries: int = 3):
+        self.client = client
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        self.max_retries = max_retries
+        self.buckets = {}  # type: Dict[Tuple[str, Optional[str]], TokenBucket]
+        self.in_flight = {}  # type: Dict[str, Future]
+        self.stats = {}  # type: Dict[str, Dict[str, Union[int, float]]]
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, method: str, channel: Optional[str]) -> TokenBucket:
+        key = (method, channel if method in PER_CHANNEL_METHODS else None)
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                calls_per_min, burst = TIER_LIMITS[METHOD_TIERS[method]]
+                bucket = self.buckets[key] = TokenBucket.per_minute(calls_per_min, capacity=burst)
+            return bucket
+
+    def _count(self, method: str, stat: str, n: Union[int, float] = 1):
+        with self._lock:
+            method_stats = self.stats.setdefault(method, {
+                'calls': 0,
+                'coalesced': 0,
+                'throttled': 0,
+                'errors': 0,
+                'queue_wait_s': 0.,
+            })
+            method_stats[stat] += n
+
+    def _call(self, method: str, func: Callable[..., Any], **kwargs) -> Any:
+        """Makes the call once a token's available, waiting out any Retry-After it gets back"""
+        bucket = self._get_bucket(method, kwargs.get('channel'))
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            bucket.acquire()
+            self._count(method, 'queue_wait_s', time.perf_counter() - start)
+            self._count(method, 'calls')
+            try:
+                return func(**kwargs)
+            except SlackApiError as err:
+                if err.response.status_code != 429 or attempt == self.max_retries:
+                    self._count(method, 'errors')
+                    raise
+                retry_after = float(err.response.headers.get('Retry-After', 1))
+                self.log.warning(f'Rate limited on {method} - waiting {retry_after}s')
+                self._count(method, 'throttled')
+                bucket.pause(retry_after)
+
+    def call(self, method: str, func: Callable[..., Any], **kwargs) -> Any:
+        """Schedules a call to the api method
+
+        Args:
+            method: the api method name (e.g., 'reactions.add')
+            func: the client method that makes the call
+        """
+        if method not in COALESCED_METHODS:
+            return self._call(method, func, **kwargs)
+
+        key = f'{method}:{json.dumps(kwargs, sort_keys=True, default=str)}'
+        with self._lock:
+            future = self.in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self.in_flight[key] = Future()
+        if not is_owner:
+            self._count(method, 'coalesced')
+            return future.result()
+        try:
+            resp = self._call(method, func, **kwargs)
+        except Exception as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(resp)
+            return resp
+        finally:
+            with self._lock:
+                del self.in_flight[key]
+
+    def get_stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        with self._lock:
+            return {method: {**x, 'queue_wait_s': round(x['queue_wait_s'], 2)} for method, x in self.stats.items()}
+
+
+class ScheduledClient:
+    """Stands in for a WebClient, sending calls to any method with a known tier through the scheduler.
+    Everything else is taken from the wrapped client as-is.
+
+    Args:
+        scheduler: the scheduler holding the client to wrap
+    """
+
+    def __init__(self, scheduler: SlackScheduler):
+        self.scheduler = scheduler
+        self.wrapped = scheduler.client
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self.wrapped, attr)
+        method = get_method_name(attr)
+        if method not in METHOD_TIERS or not callable(value):
+            return value
+
+        def scheduled_call(**kwargs) -> Any:
+            return self.scheduler.call(method, value, **kwargs)
+
+        scheduled_call.__name__ = attr
+        return scheduled_call
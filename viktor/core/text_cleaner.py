@@ -1,11 +1,8 @@
+from io import BytesIO
 from typing import (
     List,
     Union,
 )
-from urllib.request import (
-    Request,
-    urlopen,
-)
 
 from lxml import etree
 from lxml.etree import (
@@ -13,6 +10,8 @@ from lxml.etree import (
     _ElementTree,
 )
 
+from viktor.core.http_client import get_http_client
+
 
 class XPathExtractor:
     """Builds an HTML tree and allows element selection based on XPath"""
@@ -21,13 +20,12 @@ class XPathExtractor:
 
     @staticmethod
     def _get_tree(url: str) -> _ElementTree:
-        req = Request(url, headers={'User-Agent': 'Magic Browser'})
-        resp = urlopen(req)
-        if resp.code != 200:
-            raise ConnectionError(f'Unexpected response to request: {resp.code}')
+        resp = get_http_client().get(url, headers={'User-Agent': 'Magic Browser'})
+        if resp.status_code != 200:
+            raise ConnectionError(f'Unexpected response to request: {resp.status_code}')
 
         htmlparser = etree.HTMLParser()
-        return etree.parse(resp, htmlparser)
+        return etree.parse(BytesIO(resp.content), htmlparser)
 
     @staticmethod
     def get_inner_html(elem: _Element) -> str:
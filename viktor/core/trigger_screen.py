@@ -0,0 +1,41 @@
+import threading
+from typing import (
+    Dict,
+    List,
+)
+
+
+class TriggerScreen:
+    """Screens incoming messages for a trigger, so those without one never reach SlackBotBase's message parsing.
+
+    The check is never stricter than SlackBotBase's own: anything starting with a trigger gets through (e.g.,
+    'v!help', 'viktor, help', '<@U123>: help'), ignoring case & leading whitespace. Matching the command itself
+    is left to SlackBotBase.
+
+    Args:
+        triggers: the prefixes that mark a message as meant for the bot (e.g., 'viktor', 'v!')
+    """
+
+    def __init__(self, triggers: List[str]):
+        self.triggers = tuple(x.lower() for x in triggers)
+        self.stats = {
+            'messages': 0,
+            'untriggered': 0,
+            'triggered': 0,
+        }
+        self._lock = threading.Lock()
+
+    def is_triggered(self, text: str) -> bool:
+        return text.lstrip().lower().startswith(self.triggers)
+
+    def screen(self, text: str) -> bool:
+        """Checks whether the raw message text starts with a trigger, keeping count of both outcomes"""
+        is_triggered = self.is_triggered(text)
+        with self._lock:
+            self.stats['messages'] += 1
+            self.stats['triggered' if is_triggered else 'untriggered'] += 1
+        return is_triggered
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
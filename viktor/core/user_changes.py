@@ -13,7 +13,11 @@ from slacktools.block_kit.blocks import (
     MarkdownContextBlock,
     MarkdownSectionBlock,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import (
+    Session,
+    aliased,
+)
 
 from viktor.db_eng import ViktorPSQLClient
 from viktor.model import (
@@ -58,41 +62,70 @@ def extract_user_change(eng: ViktorPSQLClient, user_info_dict: Dict[str, Union[s
             elif slack_attr != table_attr:
                 log.debug(f'Found attr "{slack_attr_name}" was different than what\'s in the table.')
                 setattr(user_obj, table_attr_name, slack_attr)
+    eng.invalidate_user(uid)
+
 
+def diff_user_profile(user: TableSlackUser, last_changelog: TableSlackUserChangeLog,
+                      attrs: List[str]) -> Optional[Dict]:
+    """Compares the user's current profile against their most recent changelog entry
 
-def process_user_changes(session: Session, user: TableSlackUser, log: logger) -> Optional[Dict]:
-    """Processes the profile changes for a single user"""
-    # List all attributes we want to monitor - Slack + OKR roles
-    log.debug(f'Working on user: {user.display_name}.')
-    most_recent_changelog = session.query(TableSlackUserChangeLog).filter(
-        TableSlackUserChangeLog.user_key == user.user_id
-    ).order_by(TableSlackUserChangeLog.created_date.desc()).limit(1).one_or_none()
-    if most_recent_changelog is None:
-        log.debug('Recording details to changelog - no past changelog entry.')
-        attr_dict = {v: getattr(user, v) for v in ALL_IMPORTANT_ATTRS}
-        session.add(TableSlackUserChangeLog(user_key=user.user_id, **attr_dict))
-    else:
-        log.debug('Comparing user detail to most recent changelog entry')
-        change_dict = {
-            'user_hashname': f'{user.display_name}|{user.slack_user_hash}'
-        }
-        for attr in ALL_IMPORTANT_ATTRS:
-            last_chglog = most_recent_changelog.__dict__.get(attr)
-            cur_user = user.__dict__.get(attr)
-            if last_chglog != cur_user:
-                change_dict[attr] = {
-                    'old': last_chglog,
-                    'new': cur_user
-                }
-        if len(change_dict) > 1:
-            log.debug(f'Changes detected for {user.display_name}({user.user_id})')
-            # Update the changelog
-            attr_dict = {k: user.__dict__.get(k) for k in ALL_IMPORTANT_ATTRS}
-            session.add(TableSlackUserChangeLog(user_key=user.user_id, **attr_dict))
-            return change_dict
+    Returns:
+        the old & new value of each attribute that changed, or None if nothing did
+    """
+    change_dict = {
+        'user_hashname': f'{user.display_name}|{user.slack_user_hash}'
+    }
+    for attr in attrs:
+        last_chglog = last_changelog.__dict__.get(attr)
+        cur_user = user.__dict__.get(attr)
+        if last_chglog != cur_user:
+            change_dict[attr] = {
+                'old': last_chglog,
+                'new': cur_user
+            }
+    if len(change_dict) > 1:
+        return change_dict
     return None
 
 
+def collect_profile_changes(session: Session, attrs: List[str], log: logger) -> List[Dict]:
+    """Compares every user's profile against their most recent changelog entry, logging a new entry
+    for each user that's new or has changed.
+
+    Each user is read together with their latest changelog entry (via DISTINCT ON) in a single query and
+    all the new entries are written with a single INSERT.
+
+    Returns:
+        the change dicts of users whose profiles changed
+    """
+    latest_changelogs = session.query(TableSlackUserChangeLog).distinct(TableSlackUserChangeLog.user_key).order_by(
+        TableSlackUserChangeLog.user_key,
+        TableSlackUserChangeLog.created_date.desc(),
+        TableSlackUserChangeLog.user_change_id.desc()
+    ).subquery()
+    latest_changelog = aliased(TableSlackUserChangeLog, latest_changelogs)
+    rows = session.query(TableSlackUser, latest_changelog).\
+        outerjoin(latest_changelog, latest_changelog.user_key == TableSlackUser.user_id).all()
+
+    updated_users = []
+    new_changelogs = []
+    for user, last_changelog in rows:
+        if last_changelog is None:
+            # Record the user details without comparison - this is the first instance encountering this user
+            log.debug(f'Recording details of {user.display_name} to changelog - no past changelog entry.')
+        else:
+            change_dict = diff_user_profile(user=user, last_changelog=last_changelog, attrs=attrs)
+            if change_dict is None:
+                continue
+            log.debug(f'{len(change_dict) - 1} changes detected for {user.display_name}(uid:{user.user_id})')
+            updated_users.append(change_dict)
+        new_changelogs.append({'user_key': user.user_id, **{k: user.__dict__.get(k) for k in attrs}})
+    if len(new_changelogs) > 0:
+        log.debug(f'Adding {len(new_changelogs)} entries to the changelog.')
+        session.execute(insert(TableSlackUserChangeLog), new_changelogs)
+    return updated_users
+
+
 def build_profile_diff(blocks: BlocksType, updated_user_dict: Dict) -> BlocksType:
     """Builds a diff of profile changes for rendering via Block Kit"""
     for attr in ALL_IMPORTANT_ATTRS:
@@ -111,13 +144,8 @@ def build_profile_diff(blocks: BlocksType, updated_user_dict: Dict) -> BlocksTyp
 
 def process_updated_profiles(eng: ViktorPSQLClient, st: SlackBotBase, log: logger):
     """Handles the periodic scanning of differences between the profile changelog and the user's current profile"""
-    updated_users = []
     with eng.session_mgr() as session:
-        users = session.query(TableSlackUser).all()
-        for user in users:
-            change_dict = process_user_changes(session=session, user=user, log=log)
-            if change_dict is not None:
-                updated_users.append(change_dict)
+        updated_users = collect_profile_changes(session=session, attrs=ALL_IMPORTANT_ATTRS, log=log)
     log.debug(f'Found {len(updated_users)} users with recent changes.')
     if len(updated_users) > 0:
         for updated_user in updated_users:
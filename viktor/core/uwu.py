@@ -1,11 +1,13 @@
 import random
 import re
-from typing import Tuple
-
-from sqlalchemy.sql import func
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 
 from viktor.db_eng import ViktorPSQLClient
-from viktor.model import TableUwu
 
 TEXT_KEYS = ['text', 'fallback', 'pretext', 'title', 'footer']
 
@@ -26,6 +28,90 @@ def recursive_uwu(key, val, replace_func):
     return val
 
 
+class UwuEngine:
+    """Turns text into uwu, with everything that can be built ahead of time built once.
+
+    The whole message goes through a single `re.sub` whose callback converts one word at a time, and all the
+    character clusters are replaced in one pass of a combined regex.
+
+    Args:
+        char_cluster_map: regex -> replacement of the character clusters to convert within a word
+        word_map: whole words to swap out, in lowercase
+        repeater_map: owo/uwu -> fragments that trigger repeating it
+        stutter: chance of stutter per word
+        owo_repeater: chance of owo repeating per word
+    """
+    COMMAND_REGEX = re.compile(r'^[Uu][Ww][Uu]')
+    # Everything between spaces (the same as splitting on ' ')
+    WORD_REGEX = re.compile(r'[^ ]+')
+    WORD_CHAR_REGEX = re.compile(r'\w')
+    R_TO_W = str.maketrans('rRlL', 'wWwW')
+
+    def __init__(self, char_cluster_map: Dict[str, str], word_map: Dict[str, str],
+                 repeater_map: Dict[str, List[str]], stutter: float = 0.05, owo_repeater: float = 0.05):
+        # Each cluster gets a named group, so the one matched tells which replacement to use
+        self.cluster_regex = re.compile('|'.join(f'(?P<c{i}>{x})' for i, x in enumerate(char_cluster_map.keys())))
+        self.cluster_replacements = {f'c{i}': x for i, x in enumerate(char_cluster_map.values())}
+        self.word_map = word_map
+        self.repeater_map = repeater_map
+        self.stutter = stutter
+        self.owo_repeater = owo_repeater
+
+    def match_word_and_preserve_case(self, word: str) -> str:
+        new_lower_word = self.word_map.get(word.lower())
+        if new_lower_word is None:
+            return word
+        # Determine case
+        if word.islower():
+            return new_lower_word
+        elif word.istitle():
+            return new_lower_word.title()
+        elif word.isupper():
+            return new_lower_word.upper()
+        # Otherwise just return lowercased
+        return new_lower_word
+
+    def _replace_cluster(self, match: re.Match) -> str:
+        return self.cluster_replacements[match.lastgroup]
+
+    def convert_word(self, word: str) -> str:
+        if word.startswith('<') or word.startswith('&lt;') or word.endswith('>'):
+            # Bypass link gen
+            if '|' in word:
+                link_split = word.split('|')
+                link_split[1] = link_split[1].translate(self.R_TO_W)
+                word = '|'.join(link_split[:2])
+            return word
+        word = word.translate(self.R_TO_W)
+
+        # Convert known words
+        word = self.match_word_and_preserve_case(word)
+
+        # Convert character clusters
+        word = self.cluster_regex.sub(self._replace_cluster, word)
+
+        # Stutter
+        if len(word) > 1 and self.WORD_CHAR_REGEX.match(word[0]) and random.random() <= self.stutter:
+            for i in range(random.randint(1, 4)):
+                word = f'{word[0]}-{word}'
+
+        # OWO Repeater
+        if len(word) > 4 and random.random() <= self.owo_repeater:
+            for uwu_type, repeat_list in self.repeater_map.items():
+                for frag in repeat_list:
+                    if frag in word:
+                        word = word.replace(uwu_type[0], uwu_type)
+        return word
+
+    def _convert_word_match(self, match: re.Match) -> str:
+        return self.convert_word(match.group())
+
+    def convert(self, message: str) -> str:
+        """Converts the message (less any leading uwu command), without prefix or suffix"""
+        converted = self.COMMAND_REGEX.sub('', message).strip()
+        return self.WORD_REGEX.sub(self._convert_word_match, converted)
+
+
 class UWU:
 
     STUTTER = 0.05              # Chance of stutter per word
@@ -52,72 +138,30 @@ class UWU:
         'owo': ['ow', 'bo', 'do', 'on']
     }
 
+    _uwu_engine = None  # type: Optional[UwuEngine]
+
     def __init__(self, eng: ViktorPSQLClient):
         self.eng = eng
 
+    @classmethod
+    def get_uwu_engine(cls) -> UwuEngine:
+        """The engine built from the maps above, made on first use"""
+        if cls._uwu_engine is None:
+            cls._uwu_engine = UwuEngine(char_cluster_map=cls.char_cluster_map, word_map=cls.word_map,
+                                        repeater_map=cls.repeater_map, stutter=cls.STUTTER,
+                                        owo_repeater=cls.OWO_REPEATER)
+        return cls._uwu_engine
+
     def get_prefix_and_suffix(self) -> Tuple[str, str]:
-        with self.eng.session_mgr() as session:
-            chars = [x.graphic for x in session.query(TableUwu.graphic).order_by(func.random()).limit(2).all()]
-            prefix, suffix = [x.replace('`', ' ') for x in chars]
-            return prefix, suffix
+        prefix, suffix = [x.replace('`', ' ') for x in self.eng.corpus.sample_uwu_graphics(k=2)]
+        return prefix, suffix
 
     @classmethod
     def match_word_and_preserve_case(cls, word: str) -> str:
-        lower_word = word.lower()
-        if lower_word in cls.word_map.keys():
-            new_lower_word = cls.word_map[lower_word]
-
-            # Determine case
-            if word.islower():
-                return new_lower_word
-            elif word.istitle():
-                return new_lower_word.title()
-            elif word.isupper():
-                return new_lower_word.upper()
-            # Otherwise just return lowercased
-            return new_lower_word
-        return word
+        return cls.get_uwu_engine().match_word_and_preserve_case(word)
 
     def convert_to_uwu(self, message: str) -> str:
-        # Remove command, if any
-        converted = re.sub(r'^[Uu][Ww][Uu]', '', message).strip()
-
-        # split message into words now
-        conv_splits = converted.split(' ')
-        words = []
-        for word in conv_splits:
-            if word.startswith('<') or word.startswith('&lt;') or word.endswith('>'):
-                # Bypass link gen
-                if '|' in word:
-                    link_split = word.split('|')
-                    link_name = link_split[1]
-                    link_name = link_name.translate(str.maketrans('rRlL', 'wWwW'))
-                    word = '|'.join([link_split[0], link_name])
-                words.append(word)
-                continue
-            word = word.translate(str.maketrans('rRlL', 'wWwW'))
-
-            # Convert known words
-            word = self.match_word_and_preserve_case(word)
-
-            # Convert character clusters
-            for pattern, replacement in self.char_cluster_map.items():
-                word = re.sub(pattern=pattern, repl=replacement, string=word)
-
-            # Stutter
-            if len(word) > 1 and re.match(r'\w', word[0]) and random.random() <= self.STUTTER:
-                for i in range(random.randint(1, 4)):
-                    word = f'{word[0]}-{word}'
-
-            # OWO Repeater
-            if len(word) > 4 and random.random() <= self.OWO_REPEATER:
-                for uwu_type, repeat_list in self.repeater_map.items():
-                    for frag in repeat_list:
-                        if frag in word:
-                            word = word.replace(uwu_type[0], uwu_type)
-
-            words.append(word)
-        converted = ' '.join(words)
+        converted = self.get_uwu_engine().convert(message)
 
         # Select extra feats (prefix/suffix/commentary)
         prefix, suffix = self.get_prefix_and_suffix()
@@ -0,0 +1,135 @@
+import threading
+import time
+from typing import (
+    Dict,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy import (
+    VARCHAR,
+    Integer,
+    column,
+    update,
+    values,
+)
+
+from viktor.db_eng import ViktorPSQLClient
+from viktor.model import TableEmoji
+
+
+class ReactionCountAggregator:
+    """Collects emoji reaction counts in memory and writes them out periodically as one bulk UPDATE.
+
+    A flush happens every `flush_interval` seconds or as soon as `max_pending` reactions have been collected,
+    whichever comes first. Counts for the same emoji are coalesced into a single row of the UPDATE.
+
+    Args:
+        eng: the db client
+        parent_log: the logger to bind to
+        flush_interval: max number of seconds between flushes
+        max_pending: number of collected reactions that triggers an early flush
+    """
+
+    def __init__(self, eng: ViktorPSQLClient, parent_log: logger, flush_interval: float = 30.,
+                 max_pending: int = 200):
+        self.eng = eng
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        self.flush_interval = float(flush_interval)
+        self.max_pending = int(max_pending)
+        self.pending = {}  # type: Dict[str, int]
+        self.n_pending = 0
+        self.stats = {
+            'flushes': 0,
+            'failed_flushes': 0,
+            'reactions_flushed': 0,
+            'rows_flushed': 0,
+            'last_flush_reactions': 0,
+            'last_flush_rows': 0,
+            'last_flush_ms': 0.,
+        }
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._is_running = True
+        self._flusher = threading.Thread(target=self._run, name='reaction-count-flusher', daemon=True)
+        self._flusher.start()
+
+    def add(self, emoji_name: str, n: int = 1):
+        """Counts a reaction to be written on the next flush"""
+        with self._lock:
+            self.pending[emoji_name] = self.pending.get(emoji_name, 0) + n
+            self.n_pending += n
+            is_full = self.n_pending >= self.max_pending
+        if is_full:
+            self._wakeup.set()
+
+    def _run(self):
+        while self._is_running:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            if not self._is_running:
+                break
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes all collected counts to the emoji table in a single statement
+
+        Returns:
+            the number of rows that were updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, n_reactions = self.pending, self.n_pending
+                self.pending, self.n_pending = {}, 0
+            if len(counts) == 0:
+                return 0
+
+            start = time.perf_counter()
+            reaction_counts = values(
+                column('name', VARCHAR),
+                column('n_reactions', Integer),
+                name='reaction_counts'
+            ).data(list(counts.items()))
+            try:
+                with self.eng.session_mgr() as session:
+                    session.execute(
+                        update(TableEmoji).
+                        where(TableEmoji.name == reaction_counts.c.name).
+                        values(reaction_count=TableEmoji.reaction_count + reaction_counts.c.n_reactions)
+                    )
+            except Exception as e:
+                # Put the counts back so they're included in the next attempt
+                self.log.error(f'Failed to flush {len(counts)} reaction counts: {e}')
+                with self._lock:
+                    for name, n in counts.items():
+                        self.pending[name] = self.pending.get(name, 0) + n
+                    self.n_pending += n_reactions
+                self.stats['failed_flushes'] += 1
+                return 0
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.log.debug(f'Flushed {n_reactions} reactions coalesced into {len(counts)} rows '
+                           f'({elapsed_ms:.1f}ms)')
+            self.stats['flushes'] += 1
+            self.stats['reactions_flushed'] += n_reactions
+            self.stats['rows_flushed'] += len(counts)
+            self.stats['last_flush_reactions'] = n_reactions
+            self.stats['last_flush_rows'] = len(counts)
+            self.stats['last_flush_ms'] = round(elapsed_ms, 2)
+            return len(counts)
+
+    def shutdown(self):
+        """Stops the periodic flushing and writes out whatever is left"""
+        self._is_running = False
+        self._wakeup.set()
+        self._flusher.join(timeout=self.flush_interval)
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            n_pending = self.n_pending
+        stats = self.stats.copy()
+        stats['pending_reactions'] = n_pending
+        stats['coalesced_per_flush'] = round(stats['reactions_flushed'] / stats['flushes'], 2) \
+            if stats['flushes'] > 0 else 0.
+        return stats
@@ -1,18 +1,32 @@
+import threading
+import time
+from types import MappingProxyType
 from typing import (
+    Any,
     Dict,
     List,
+    Mapping,
     Optional,
+    Type,
     Union,
 )
 
 from loguru import logger
 from slacktools.db_engine import PSQLClient
+from sqlalchemy.orm import make_transient_to_detached
 from sqlalchemy.sql import (
     and_,
     not_,
+    or_,
 )
 
+from viktor.core.cache import TTLCache
+from viktor.core.corpus import (
+    AcronymIndex,
+    ResponseCorpus,
+)
 from viktor.model import (
+    Base,
     BotSettingType,
     ErrorType,
     TableBotSetting,
@@ -26,20 +40,82 @@ from viktor.model import (
 class ViktorPSQLClient(PSQLClient):
     """Creates Postgres connection engine"""
 
-    def __init__(self, props: Dict, parent_log: logger, **kwargs):
+    def __init__(self, props: Dict, parent_log: logger, cache_ttl: float = 300., cache_max_size: int = 2000,
+                 **kwargs):
         _ = kwargs
         super().__init__(props=props, parent_log=parent_log)
+        # Read-through caches for lookups by slack hash. These hold column values rather than ORM objects,
+        #   so every caller still gets its own detached instance to work with.
+        self.user_cache = TTLCache(max_size=cache_max_size, ttl=cache_ttl)
+        self.channel_cache = TTLCache(max_size=cache_max_size, ttl=cache_ttl)
+        # Immutable snapshot of all the bot settings. Swapped out wholesale whenever it's refreshed.
+        self._bot_settings = None  # type: Optional[Mapping[BotSettingType, Union[int, bool]]]
+        self._bot_settings_refreshed_at = None  # type: Optional[float]
+        self._bot_settings_refreshes = 0
+        self._settings_poller = None  # type: Optional[threading.Thread]
+        self._stop_settings_poller = threading.Event()
+        # Responses, uwu graphics & emoji names held in memory for random draws
+        self.corpus = ResponseCorpus(eng=self)
+        self.acronym_index = AcronymIndex(eng=self)
 
-    def get_bot_setting(self, setting: BotSettingType) -> Optional[Union[int, bool]]:
-        """Attempts to return a given bot setting"""
+    @staticmethod
+    def _to_column_dict(obj: Optional[Base]) -> Optional[Dict[str, Any]]:
+        if obj is None:
+            return None
+        return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+    @staticmethod
+    def _from_column_dict(tbl: Type[Base], col_dict: Optional[Dict[str, Any]]) -> Optional[Base]:
+        """Builds a detached instance, as if it had been queried and then expunged"""
+        if col_dict is None:
+            return None
+        obj = tbl.__mapper__.class_manager.new_instance()
+        for k, v in col_dict.items():
+            setattr(obj, k, v)
+        make_transient_to_detached(obj)
+        return obj
+
+    def invalidate_user(self, user_hash: str):
+        """Drops the cached lookup for a user. Call this after writing to their row."""
+        self.user_cache.invalidate(user_hash)
+
+    def invalidate_channel(self, channel_hash: str):
+        """Drops the cached lookup for a channel. Call this after writing to its row."""
+        self.channel_cache.invalidate(channel_hash)
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        refreshed_at = self._bot_settings_refreshed_at
+        return {
+            'users': self.user_cache.get_stats(),
+            'channels': self.channel_cache.get_stats(),
+            'bot_settings': {
+                'refreshes': self._bot_settings_refreshes,
+                'age_s': round(time.monotonic() - refreshed_at, 1) if refreshed_at is not None else None,
+            },
+        }
+
+    def refresh_bot_settings(self) -> Mapping[BotSettingType, Union[int, bool]]:
+        """Loads all bot settings into a new read-only snapshot"""
+        settings = {}
         with self.session_mgr() as session:
-            result = session.query(TableBotSetting).filter(TableBotSetting.setting_type == setting).one_or_none()
-            if result is None:
-                return result
-            if setting.name.startswith('IS_'):
-                # Boolean
-                return result.setting_int == 1
-            return result.setting_int
+            result: TableBotSetting
+            for result in session.query(TableBotSetting).all():
+                if result.setting_type.name.startswith('IS_'):
+                    # Boolean
+                    settings[result.setting_type] = result.setting_int == 1
+                else:
+                    settings[result.setting_type] = result.setting_int
+        self._bot_settings = MappingProxyType(settings)
+        self._bot_settings_refreshed_at = time.monotonic()
+        self._bot_settings_refreshes += 1
+        return self._bot_settings
+
+    def get_bot_setting(self, setting: BotSettingType) -> Optional[Union[int, bool]]:
+        """Attempts to return a given bot setting. After the first call, this reads from the in-memory snapshot"""
+        settings = self._bot_settings
+        if settings is None:
+            settings = self.refresh_bot_settings()
+        return settings.get(setting)
 
     def set_bot_setting(self, setting: BotSettingType, setting_val: Union[int, bool]):
         """Attempts to set a given setting"""
@@ -47,6 +123,26 @@ class ViktorPSQLClient(PSQLClient):
             session.query(TableBotSetting).filter(TableBotSetting.setting_type == setting).update(
                 {TableBotSetting.setting_int: setting_val}
             )
+        self.refresh_bot_settings()
+
+    def start_settings_poller(self, interval: float):
+        """Refreshes the bot settings snapshot every `interval` seconds, so that changes made by
+        other processes are picked up"""
+        if self._settings_poller is not None:
+            return
+
+        def _poll():
+            while not self._stop_settings_poller.wait(timeout=interval):
+                try:
+                    self.refresh_bot_settings()
+                except Exception as e:
+                    self.log.error(f'Failed to refresh bot settings: {e}')
+
+        self._settings_poller = threading.Thread(target=_poll, name='bot-settings-poller', daemon=True)
+        self._settings_poller.start()
+
+    def stop_settings_poller(self):
+        self._stop_settings_poller.set()
 
     def get_reaction_emojis(self) -> List[str]:
         with self.session_mgr() as session:
@@ -56,6 +152,21 @@ class ViktorPSQLClient(PSQLClient):
             )).all()
             return [x.name for x in emoji_objs]
 
+    def rename_emoji(self, old_name: str, new_name: str):
+        """Renames an emoji's row. Slack emoji names are unique, so any row already holding the new name is stale
+        (e.g., left behind by a removed emoji) and gets cleared out first, in the same transaction"""
+        if old_name == new_name:
+            return
+        with self.session_mgr() as session:
+            session.query(TableEmoji).filter(TableEmoji.name == new_name).delete(synchronize_session=False)
+            n_renamed = session.query(TableEmoji).filter(TableEmoji.name == old_name).update({
+                TableEmoji.name: new_name,
+                TableEmoji.is_deleted: False
+            }, synchronize_session=False)
+            if n_renamed == 0:
+                # The emoji was never recorded under its old name
+                session.add(TableEmoji(name=new_name))
+
     def get_all_users(self) -> Dict[str, TableSlackUser]:
         with self.session_mgr() as session:
             users = session.query(TableSlackUser).all()
@@ -72,23 +183,51 @@ class ViktorPSQLClient(PSQLClient):
             session.query(TableSlackUser).filter(TableSlackUser.slack_user_hash == uid).update({
                 TableSlackUser.is_admin: True
             })
+        self.invalidate_user(uid)
 
     def get_user_from_hash(self, user_hash: str) -> Optional[TableSlackUser]:
         """Takes in a slack user hash, outputs the expunged object, if any"""
+        def _load() -> Optional[Dict[str, Any]]:
+            with self.session_mgr() as session:
+                user = session.query(TableSlackUser).filter(
+                    TableSlackUser.slack_user_hash == user_hash).one_or_none()
+                return self._to_column_dict(user)
+
+        return self._from_column_dict(TableSlackUser, self.user_cache.get_or_load(user_hash, _load))
+
+    def get_display_names(self, slack_hashes: List[str]) -> Dict[str, str]:
+        """Maps user (or bot) hashes to the display name of their user, in a single query.
+        Hashes without a user are left out"""
+        if len(slack_hashes) == 0:
+            return {}
         with self.session_mgr() as session:
-            user = session.query(TableSlackUser).filter(TableSlackUser.slack_user_hash == user_hash).one_or_none()
-            if user is not None:
-                session.expunge(user)
-        return user
+            rows = session.query(
+                TableSlackUser.slack_user_hash,
+                TableSlackUser.slack_bot_hash,
+                TableSlackUser.display_name,
+                TableSlackUser.real_name
+            ).filter(or_(
+                TableSlackUser.slack_user_hash.in_(slack_hashes),
+                TableSlackUser.slack_bot_hash.in_(slack_hashes)
+            )).all()
+        names = {}
+        for user_hash, bot_hash, display_name, real_name in rows:
+            name = display_name if display_name not in [None, ''] else real_name
+            names[user_hash] = name
+            if bot_hash is not None:
+                names[bot_hash] = name
+        wanted = set(slack_hashes)
+        return {k: v for k, v in names.items() if k in wanted}
 
     def get_channel_from_hash(self, channel_hash: str) -> Optional[TableSlackChannel]:
         """Takes in a slack user hash, outputs the expunged object, if any"""
-        with self.session_mgr() as session:
-            channel = session.query(TableSlackChannel).\
-                filter(TableSlackChannel.slack_channel_hash == channel_hash).one_or_none()
-            if channel is not None:
-                session.expunge(channel)
-        return channel
+        def _load() -> Optional[Dict[str, Any]]:
+            with self.session_mgr() as session:
+                channel = session.query(TableSlackChannel).\
+                    filter(TableSlackChannel.slack_channel_hash == channel_hash).one_or_none()
+                return self._to_column_dict(channel)
+
+        return self._from_column_dict(TableSlackChannel, self.channel_cache.get_or_load(channel_hash, _load))
 
     def log_viktor_error_to_db(self, e: Exception, error_type: ErrorType, user_key: int = None,
                                channel_key: int = None):
@@ -0,0 +1,136 @@
+"""
+Bulk loading of rows via COPY, for ETL refreshes.
+
+Going through the ORM, every row is its own INSERT with the new id fetched back. COPY streams all the rows
+to Postgres in one command per chunk instead. Rows are plain dicts of column name -> value; any column that's
+not in a row gets the column's (scalar) default, and columns with only a server default are left to the db.
+"""
+from datetime import (
+    date,
+    datetime,
+)
+import enum
+import io
+from itertools import chain
+import math
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+from viktor.model import Base
+
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+COPY_NULL = '\\N'
+
+
+def to_copy_value(value: Any) -> str:
+    """Renders a value as a field in COPY's text format"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return COPY_NULL
+    if isinstance(value, enum.Enum):
+        # Enum columns store the member's name
+        value = value.name
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (list, tuple)):
+        items = ('NULL' if x is None else '"{}"'.format(str(x).replace('\\', '\\\\').replace('"', '\\"'))
+                 for x in value)
+        value = '{' + ','.join(items) + '}'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def get_copy_columns(table: Table, names: Iterable[str]) -> Dict[str, Any]:
+    """The columns to COPY into, mapped to the value used when a row doesn't have one.
+
+    That's every one of the named columns, plus any column with a scalar default
+    """
+    names = set(names)
+    columns = {}
+    for col in table.columns:
+        default = col.default.arg if col.default is not None and col.default.is_scalar else None
+        if col.key in names or default is not None:
+            columns[col.key] = default
+    unknown = names - set(columns.keys())
+    if len(unknown) > 0:
+        raise ValueError(f'Columns not in {table.name}: {", ".join(sorted(unknown))}')
+    return columns
+
+
+def copy_rows(engine: Engine, table: Union[Table, Base], rows: Iterable[Dict[str, Any]], log: logger,
+              columns: List[str] = None, chunk_size: int = 10000) -> Dict[str, Union[str, int, float]]:
+    """COPYs the rows into the table, chunk_size rows at a time, in a single transaction
+
+    Args:
+        engine: the engine of the db to load into
+        table: the table (or model) to load
+        rows: dicts of column -> value
+        log: logger
+        columns: the columns to load (along with any columns that have defaults). If not set, the columns of
+            the first row are used
+        chunk_size: the max number of rows held in memory and sent per COPY
+
+    Returns:
+        the number of rows loaded, how long it took and the rows/sec
+    """
+    if not isinstance(table, Table):
+        table = table.__table__
+    start = time.perf_counter()
+    rows = iter(rows)
+    first_row = next(rows, None)
+    n_rows = 0
+    if first_row is not None:
+        columns = get_copy_columns(table, first_row.keys() if columns is None else columns)
+        preparer = engine.dialect.identifier_preparer
+        copy_sql = f'COPY {preparer.format_table(table)} ' \
+                   f'({", ".join(preparer.quote(table.columns[x].name) for x in columns.keys())}) FROM STDIN'
+
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                buffer = io.StringIO()
+                n_buffered = 0
+                for row in chain([first_row], rows):
+                    buffer.write('\t'.join(to_copy_value(row.get(k, v)) for k, v in columns.items()))
+                    buffer.write('\n')
+                    n_buffered += 1
+                    if n_buffered == chunk_size:
+                        buffer.seek(0)
+                        cursor.copy_expert(copy_sql, buffer)
+                        n_rows += n_buffered
+                        buffer = io.StringIO()
+                        n_buffered = 0
+                if n_buffered > 0:
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
+                    n_rows += n_buffered
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    elapsed = time.perf_counter() - start
+    stats = {
+        'table': table.name,
+        'rows': n_rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(n_rows / elapsed) if elapsed > 0 else 0,
+    }
+    log.debug(f'Loaded {n_rows} rows into {table.name} in {stats["seconds"]}s ({stats["rows_per_sec"]} rows/sec)')
+    return stats
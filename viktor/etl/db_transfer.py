@@ -3,6 +3,7 @@ from slacktools.db_engine import PSQLClient
 from slacktools.secretstore import SecretStore
 
 from viktor.etl.etl_gs import ETL
+from viktor.etl.table_copier import TableCopier
 from viktor.model import (
     TableAcronym,
     TableBotSetting,
@@ -17,24 +18,14 @@ from viktor.model import (
     TableSlackUserChangeLog,
     TableUwu,
 )
+from viktor.settings import Development
 
 TARGET_DB = 'DEV'
 SOURCE_DB = 'PROD'
+CHECKPOINT_PATH = Development.LOG_DIR.joinpath('db_transfer_checkpoint.json')
 
-log = get_logger('db_transfer')
-
-credstore = SecretStore('secretprops-davaiops.kdbx')
-# Load target and source dbs
-tgt_props = credstore.get_entry(f'davaidb-{TARGET_DB.lower()}').custom_properties
-tgt_db = PSQLClient(tgt_props, parent_log=log)
-src_props = credstore.get_entry(f'davaidb-{SOURCE_DB.lower()}').custom_properties
-src_db = PSQLClient(src_props, parent_log=log)
-
-# Instantiate the process to recreate the schema and, if needed, drop all existing tables
-etl = ETL(tables=ETL.ALL_TABLES, env=TARGET_DB.lower(), drop_all=True, incl_services=False)
-
-# Begin transferring data between databases
-tables = [
+# Parents before the tables with foreign keys to them
+TABLES = [
     TableAcronym,
     TableBotSetting,
     TableEmoji,
@@ -48,14 +39,26 @@ tables = [
     TableSlackUserChangeLog,
     TableUwu
 ]
-with src_db.session_mgr() as src_session, tgt_db.session_mgr() as tgt_session:
-    for tbl in tables:
-        log.debug(f'Working on table {tbl.__tablename__}')
-        vals = src_session.query(tbl).all()
-        log.debug(f'Pulled {len(vals)} items... Expunging from source session.')
-        src_session.expunge_all()
-        log.debug('Beginning merge of rows into target session...')
-        for i, row in enumerate(vals):
-            if i % 500 == 0:
-                log.debug(f'Working on {i} of {len(vals)} ({i / len(vals):.1%})...')
-            tgt_session.merge(row)
+
+
+if __name__ == '__main__':
+    log = get_logger('db_transfer')
+
+    credstore = SecretStore('secretprops-davaiops.kdbx')
+    # Load target and source dbs
+    tgt_props = credstore.get_entry(f'davaidb-{TARGET_DB.lower()}').custom_properties
+    tgt_db = PSQLClient(tgt_props, parent_log=log)
+    src_props = credstore.get_entry(f'davaidb-{SOURCE_DB.lower()}').custom_properties
+    src_db = PSQLClient(src_props, parent_log=log)
+
+    copier = TableCopier(src_engine=src_db.engine, tgt_engine=tgt_db.engine, parent_log=log,
+                         checkpoint_path=CHECKPOINT_PATH)
+    if not copier.checkpoint.is_started:
+        # Fresh transfer - recreate the schema, dropping all existing tables.
+        #   When resuming, the tables (and what's been copied into them so far) are left alone
+        etl = ETL(env=TARGET_DB.lower(), incl_services=False)
+        etl.handle_table_drops(tables=ETL.ALL_TABLES, create_only=False)
+        etl.handle_migrations()
+
+    # Begin transferring data between databases
+    copier.run(TABLES)
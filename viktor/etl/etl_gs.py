@@ -1,21 +1,33 @@
 import re
-import time
 from typing import (
+    Any,
     Dict,
+    Iterable,
     List,
+    Union,
 )
 
 from pukr import get_logger
-from slack_sdk.errors import SlackApiError
 from slacktools import (
     SecretStore,
     SlackTools,
 )
-from slacktools.api.web.pins import Pin
 from slacktools.gsheet import GSheetAgent
+from sqlalchemy.sql import (
+    ClauseElement,
+    and_,
+    not_,
+)
 
-from viktor.core.pin_collector import collect_pins
+from viktor.core.rate_limit import TokenBucket
 from viktor.db_eng import ViktorPSQLClient
+from viktor.etl.bulk_loader import copy_rows
+from viktor.etl.incremental import IncrementalSync
+from viktor.etl.migrations import (
+    apply_migrations,
+    check_index_usage,
+)
+from viktor.etl.pin_harvester import PinHarvester
 from viktor.model import (
     AcronymType,
     Base,
@@ -30,9 +42,11 @@ from viktor.model import (
     TablePotentialEmoji,
     TableQuote,
     TableResponse,
+    TableSchemaMigration,
     TableSlackChannel,
     TableSlackUser,
     TableSlackUserChangeLog,
+    TableSyncState,
     TableUwu,
 )
 from viktor.settings import (
@@ -52,9 +66,11 @@ class ETL:
         TablePotentialEmoji,
         TableQuote,
         TableResponse,
+        TableSchemaMigration,
         TableSlackChannel,
         TableSlackUser,
         TableSlackUserChangeLog,
+        TableSyncState,
         TableUwu
     ]
 
@@ -65,6 +81,11 @@ class ETL:
     CAH_CHANNEL = 'CMPV3K8AE'
     # Prevent automated activity from occurring in these channels
     DENY_LIST_CHANNELS = [IMPO_CHANNEL, CAH_CHANNEL]
+    # pins.list is a Tier 2 method (20+ calls/min)
+    PINS_LIST_CALLS_PER_MIN = 20
+    PINS_LIST_BURST = 3
+    PIN_HARVEST_WORKERS = 4
+    PIN_CHECKPOINT_PATH = Development.LOG_DIR.joinpath('pin_harvest_checkpoint.json')
 
     def __init__(self, env: str = 'dev', drop_all: bool = True, incl_services: bool = True):
         self.log = get_logger()
@@ -79,6 +100,9 @@ class ETL:
         self.log.debug('Opening up the database...')
 
         self.psql_client = ViktorPSQLClient(props=props, parent_log=self.log)
+        self.load_stats = []  # type: List[Dict[str, Union[str, int, float]]]
+        self.syncer = IncrementalSync(psql_client=self.psql_client, parent_log=self.log)
+        self.sync_stats = []  # type: List[Dict[str, Union[str, int, bool]]]
 
         if incl_services:
             self.log.debug('Authenticating credentials for services...')
@@ -102,6 +126,61 @@ class ETL:
         self.log.debug(f'Creating {len(tbl_objs)} listed tables...')
         Base.metadata.create_all(self.psql_client.engine, tables=tbl_objs)
 
+    def handle_migrations(self, target_version: int = None) -> List[int]:
+        """Brings the schema up to date by applying any migrations that haven't been applied yet"""
+        return apply_migrations(engine=self.psql_client.engine, log=self.log, target_version=target_version)
+
+    def check_index_usage(self) -> Dict[str, List[str]]:
+        """Confirms (via EXPLAIN) that each of the hot-path queries has an index to use"""
+        return check_index_usage(engine=self.psql_client.engine, log=self.log)
+
+    def bulk_load(self, table: Base, rows: Iterable[Dict[str, Any]], columns: List[str] = None):
+        """COPYs the rows into the table, keeping track of the load rate"""
+        self.load_stats.append(copy_rows(engine=self.psql_client.engine, table=table, rows=rows, log=self.log,
+                                         columns=columns))
+
+    def load(self, source: str, table: Base, rows: List[Dict[str, Any]], key_cols: List[str],
+             update_cols: List[str] = None, scope: ClauseElement = None, is_incremental: bool = False):
+        """Loads a source's rows into its table.
+
+        Args:
+            source: name of the source, for keeping track of its content between incremental syncs
+            table: the table to load into
+            rows: the rows of the source
+            key_cols: the columns that identify a row of the source
+            update_cols: the columns that can change for an existing row
+            scope: narrows the table down to the rows that came from this source
+            is_incremental: if True, only the differences between the source and the table are applied.
+                Otherwise the rows are COPYd in whole (the table is expected to have just been recreated)
+        """
+        if is_incremental:
+            self.sync_stats.append(self.syncer.sync(source=source, table=table, rows=rows, key_cols=key_cols,
+                                                    update_cols=update_cols, scope=scope))
+        else:
+            self.bulk_load(table, rows)
+
+    def log_load_stats(self):
+        """Summarizes the bulk loads and syncs made so far"""
+        for stats in self.load_stats:
+            self.log.info(f'{stats["table"]:<20} {stats["rows"]:>8} rows {stats["seconds"]:>8.2f}s '
+                          f'{stats["rows_per_sec"]:>10} rows/sec')
+        for stats in self.sync_stats:
+            if stats['is_skipped']:
+                self.log.info(f'{stats["source"]:<20} unchanged')
+                continue
+            self.log.info(f'{stats["source"]:<20} +{stats["inserted"]} ~{stats["updated"]} '
+                          f'^{stats["revived"]} -{stats["deleted"]}')
+
+    def sync_all(self):
+        """Incrementally syncs every source with the tables - a routine refresh that leaves the tables in place"""
+        self.etl_acronyms(is_incremental=True)
+        self.etl_emojis(is_incremental=True)
+        self.etl_okr_users(is_incremental=True)
+        self.etl_okr_perks(is_incremental=True)
+        self.etl_responses(is_incremental=True)
+        self.etl_slack_channels(is_incremental=True)
+        self.log_load_stats()
+
     def etl_bot_settings(self):
         self.log.debug('Working on settings...')
         bot_settings = []
@@ -113,7 +192,7 @@ class ETL:
             self.log.debug(f'Adding {len(bot_settings)} bot settings.')
             session.add_all(bot_settings)
 
-    def etl_acronyms(self):
+    def etl_acronyms(self, is_incremental: bool = False):
         self.log.debug('Working on acronyms...')
         df = self.gsr.get_sheet('acronyms')
         col_mapping = {
@@ -122,35 +201,32 @@ class ETL:
             'i': AcronymType.WORK,
             'urban': AcronymType.URBAN
         }
-        acro_objs = []
+        acro_rows = []
         for col in df.columns.tolist():
             self.log.debug(f'Building list for {col}...')
             word_list = df.loc[df[col].notnull(), col].unique().tolist()
-            acro_objs += [TableAcronym(acro_type=col_mapping[col], text=x) for x in word_list]
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(acro_objs)} acronym entries...')
-            session.add_all(acro_objs)
+            acro_rows += [{'type': col_mapping[col], 'text': x} for x in word_list]
+        self.log.debug(f'Adding {len(acro_rows)} acronym entries...')
+        self.load('sheet:acronyms', TableAcronym, acro_rows, key_cols=['type', 'text'],
+                  is_incremental=is_incremental)
 
-    def etl_emojis(self):
+    def etl_emojis(self, is_incremental: bool = False):
         """ETL for emojis"""
         self.log.debug('Working on emojis...')
         emojis = list(self.st.get_emojis().keys())
         regex = re.compile('.*[0-9][-_][0-9].*')
-        matches = list(filter(regex.match, emojis))
-        items = []
-        for emoji in emojis:
-            items.append(TableEmoji(name=emoji, is_react_denylisted=emoji in matches))
-        self.log.debug(f'Adding {len(items)} to table..')
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(items)} emoji entries...')
-            session.add_all(items)
+        matches = set(filter(regex.match, emojis))
+        self.log.debug(f'Adding {len(emojis)} emoji entries...')
+        # The denylist flag is only set on insert - it's managed from the bot after that
+        self.load('slack:emojis', TableEmoji, [{'name': x, 'is_react_denylisted': x in matches} for x in emojis],
+                  key_cols=['name'], is_incremental=is_incremental)
 
-    def etl_okr_users(self):
+    def etl_okr_users(self, is_incremental: bool = False):
         # Users
         self.log.debug('Working on OKR users...')
         users = self.st.get_channel_members(channel=self.GENERAL_CHANNEL, humans_only=False)
         roles = self.gsr.get_sheet('okr_roles')
-        usr_tbls = []
+        usr_rows = []
         for user in users:
             display_name = user.profile.display_name
             real_name = user.real_name
@@ -159,9 +235,14 @@ class ETL:
             role_row = roles.loc[roles['user'] == uid, :]
             params = dict(
                 slack_user_hash=uid,
+                slack_bot_hash=None,
                 real_name=real_name,
                 display_name=display_name,
-                avatar_link=user.profile.image_32
+                avatar_link=user.profile.image_32,
+                role_title=None,
+                role_desc=None,
+                level=0,
+                ltits=0
             )
             if not role_row.empty:
                 params.update({
@@ -170,62 +251,65 @@ class ETL:
                     'level': role_row['level'].values[0],
                     'ltits': role_row['ltits'].values[0]
                 })
-            usr_tbls.append(
-                TableSlackUser(**params)
-            )
+            usr_rows.append(params)
         # Add slackbot
-        usr_tbls.append(TableSlackUser(slack_user_hash='USLACKBOT', real_name='slackbot', display_name='slackboi'))
-        usr_tbls.append(TableSlackUser(slack_user_hash='UUNKNOWN', slack_bot_hash='BUNKNOWN', real_name='abot',
-                                       display_name='a-bot'))
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(usr_tbls)} user details to table...')
-            session.add_all(usr_tbls)
+        bot_defaults = dict(slack_bot_hash=None, avatar_link=None, role_title=None, role_desc=None, level=0, ltits=0)
+        usr_rows.append({**bot_defaults, **dict(slack_user_hash='USLACKBOT', real_name='slackbot',
+                                                display_name='slackboi')})
+        usr_rows.append({**bot_defaults, **dict(slack_user_hash='UUNKNOWN', slack_bot_hash='BUNKNOWN',
+                                                real_name='abot', display_name='a-bot')})
+        self.log.debug(f'Adding {len(usr_rows)} user details to table...')
+        # Bot hashes get filled in as bots are seen, and roles, levels & ltits get changed from the bot,
+        #   so they're only set on insert
+        self.load('slack:users', TableSlackUser, usr_rows, key_cols=['slack_user_hash'],
+                  update_cols=['real_name', 'display_name', 'avatar_link'], is_incremental=is_incremental)
 
-    def etl_okr_perks(self):
+    def etl_okr_perks(self, is_incremental: bool = False):
         # Perks
         self.log.debug('Working on OKR perks...')
         perks = self.gsr.get_sheet('okr_perks')
-        perk_rows = []
-        for i, row in perks.iterrows():
-            perk_rows.append(TablePerk(level=row['level'], desc=row['perk']))
-
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(perk_rows)} rows to table...')
-            session.add_all(perk_rows)
+        perk_rows = perks[['level', 'perk']].rename(columns={'perk': 'desc'}).to_dict('records')
+        self.log.debug(f'Adding {len(perk_rows)} rows to table...')
+        self.load('sheet:okr_perks', TablePerk, perk_rows, key_cols=['level', 'desc'],
+                  is_incremental=is_incremental)
 
-    def _parse_df(self, sheet_name: str, tbl_name: str, col_mapping: Dict = None):
+    def _parse_df(self, sheet_name: str, tbl_name: str, col_mapping: Dict = None, is_incremental: bool = False):
         """Parses a dataframe into a series of unique word lists"""
         df = self.gsr.get_sheet(sheet_name=sheet_name)
+        response_types = {
+            'responses': ResponseType.GENERAL,
+            'insults': ResponseType.INSULT,
+            'compliments': ResponseType.COMPLIMENT,
+            'phrases': ResponseType.PHRASE,
+            'facts': ResponseType.FACT,
+        }
         finished_rows = []
         for col in df.columns.tolist():
             self.log.debug(f'Reading in {col} word list...')
             word_list = df.loc[(~df[col].isnull()) & (df[col] != ''), col].tolist()
             # Add to table
-            if tbl_name == 'responses':
-                finished_rows += [TableResponse(response_type=ResponseType.GENERAL, category=col_mapping[col],
-                                                text=x) for x in word_list]
-            elif tbl_name == 'insults':
-                insult, stage = col.split('_')
-                finished_rows += [TableResponse(response_type=ResponseType.INSULT, category=col_mapping[insult],
-                                                stage=stage, text=x) for x in word_list]
-            elif tbl_name == 'compliments':
-                cmp, stage = col.split('_')
-                finished_rows += [TableResponse(response_type=ResponseType.COMPLIMENT, category=col_mapping[cmp],
-                                                stage=stage, text=x) for x in word_list]
-            elif tbl_name == 'phrases':
-                phrs, stage = col.split('_')
-                finished_rows += [TableResponse(response_type=ResponseType.PHRASE, category=col_mapping[phrs],
-                                                stage=stage, text=x) for x in word_list]
-            elif tbl_name == 'facts':
-                finished_rows += [TableResponse(response_type=ResponseType.FACT, category=col_mapping[col],
-                                                text=x) for x in word_list]
+            if tbl_name in ['responses', 'facts']:
+                finished_rows += [{'type': response_types[tbl_name], 'category': col_mapping[col], 'stage': 1,
+                                   'text': x} for x in word_list]
+            elif tbl_name in response_types:
+                cat, stage = col.split('_')
+                finished_rows += [{'type': response_types[tbl_name], 'category': col_mapping[cat],
+                                   'stage': int(stage), 'text': x} for x in word_list]
             elif tbl_name == 'uwu_graphics':
-                finished_rows += [TableUwu(graphic_txt=x) for x in word_list]
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(finished_rows)} items to session...')
-            session.add_all(finished_rows)
+                finished_rows += [{'graphic': x} for x in word_list]
+        self.log.debug(f'Adding {len(finished_rows)} items to table...')
+        if tbl_name == 'uwu_graphics':
+            self.load(f'sheet:{sheet_name}', TableUwu, finished_rows, key_cols=['graphic'],
+                      is_incremental=is_incremental)
+        else:
+            # The response table holds several sheets - each only covers its own response type.
+            #   Responses added from the bot aren't in any sheet, so they're left alone
+            self.load(f'sheet:{sheet_name}', TableResponse, finished_rows,
+                      key_cols=['type', 'category', 'stage', 'text'],
+                      scope=and_(TableResponse.type == response_types[tbl_name], not_(TableResponse.is_user_added)),
+                      is_incremental=is_incremental)
 
-    def etl_responses(self):
+    def etl_responses(self, is_incremental: bool = False):
         # Responses
         self.log.debug('Working on responses...')
         col_mapping = {
@@ -234,7 +318,7 @@ class ETL:
             'sarcastic': ResponseCategory.SARCASTIC,
             'jackhandey': ResponseCategory.JACKHANDEY
         }
-        self._parse_df('responses', tbl_name='responses', col_mapping=col_mapping)
+        self._parse_df('responses', tbl_name='responses', col_mapping=col_mapping, is_incremental=is_incremental)
 
         # Insults
         self.log.debug('Working on insults...')
@@ -242,7 +326,7 @@ class ETL:
             'standard': ResponseCategory.STANDARD,
             'i': ResponseCategory.WORK
         }
-        self._parse_df('insults', tbl_name='insults', col_mapping=col_mapping)
+        self._parse_df('insults', tbl_name='insults', col_mapping=col_mapping, is_incremental=is_incremental)
 
         # Compliments
         self.log.debug('Working on compliments...')
@@ -250,7 +334,7 @@ class ETL:
             'std': ResponseCategory.STANDARD,
             'indeed': ResponseCategory.WORK
         }
-        self._parse_df('compliments', tbl_name='compliments', col_mapping=col_mapping)
+        self._parse_df('compliments', tbl_name='compliments', col_mapping=col_mapping, is_incremental=is_incremental)
 
         # Phrases
         self.log.debug('Working on phrases...')
@@ -258,7 +342,7 @@ class ETL:
             'south': ResponseCategory.STANDARD,
             'bs': ResponseCategory.WORK
         }
-        self._parse_df('phrases', tbl_name='phrases', col_mapping=col_mapping)
+        self._parse_df('phrases', tbl_name='phrases', col_mapping=col_mapping, is_incremental=is_incremental)
 
         # Facts
         col_mapping = {
@@ -266,14 +350,14 @@ class ETL:
             'conspiracy_facts': ResponseCategory.FOILHAT
         }
         self.log.debug('Working on facts...')
-        self._parse_df('facts', tbl_name='facts', col_mapping=col_mapping)
+        self._parse_df('facts', tbl_name='facts', col_mapping=col_mapping, is_incremental=is_incremental)
 
         # UWU
         self.log.debug('Working on uwu_graphics...')
-        self._parse_df('uwu_graphics', tbl_name='uwu_graphics')
+        self._parse_df('uwu_graphics', tbl_name='uwu_graphics', is_incremental=is_incremental)
         self.log.debug('Completed response ETL')
 
-    def etl_slack_channels(self):
+    def etl_slack_channels(self, is_incremental: bool = False):
         """Adds slack channels"""
         channels = []
         channels_resp = self.st.bot.conversations_list(limit=1000, types='public_channel,private_channel')
@@ -283,60 +367,43 @@ class ETL:
             if not ch['is_channel'] or ch_name.startswith('shitpost'):
                 continue
             self.log.debug(f'Adding {ch_name}')
-            channels.append(TableSlackChannel(slack_channel_hash=ch_id, channel_name=ch_name,
-                                              is_allow_bot_react=ch_id not in self.DENY_LIST_CHANNELS,
-                                              is_allow_bot_response=ch_id not in self.DENY_LIST_CHANNELS,
-                                              is_archived=ch['is_archived'],
-                                              is_private=ch['is_private']))
-        with self.psql_client.session_mgr() as session:
-            self.log.debug(f'Adding {len(channels)} channels...')
-            session.add_all(channels)
+            channels.append(dict(slack_channel_hash=ch_id, channel_name=ch_name,
+                                 is_allow_bot_react=ch_id not in self.DENY_LIST_CHANNELS,
+                                 is_allow_bot_response=ch_id not in self.DENY_LIST_CHANNELS,
+                                 is_archived=ch['is_archived'],
+                                 is_private=ch['is_private']))
+        self.log.debug(f'Adding {len(channels)} channels...')
+        # The bot permission flags are only set on insert - they're managed from the bot after that
+        self.load('slack:channels', TableSlackChannel, channels, key_cols=['slack_channel_hash'],
+                  update_cols=['channel_name', 'is_archived', 'is_private'], is_incremental=is_incremental)
 
-    def etl_quotes(self):
-        # Users
+    def etl_quotes(self, is_resume: bool = True):
+        """Collects the pins of every channel into the quotes table
+
+        Args:
+            is_resume: if True, channels finished in an earlier run that didn't complete are skipped
+        """
         self.log.debug('Working on quotes...')
         # First we get all the channels
         channels = []
         channels_resp = self.st.bot.conversations_list(limit=1000, types='public_channel,private_channel')
         for ch in channels_resp.get('channels'):
-            self.log.debug(f'Adding {ch["name"]}')
-            channels.append({'id': ch['id'], 'name': ch['name'], 'is_archived': ch['is_archived']})
-        # Then we iterate through the channels and collect the pins
-        total_objs = 0
-        for i, chan in enumerate(channels):
-            tbl_objs = []
-            self.log.debug(f'Working on channel {i}/{len(channels)}')
-            c_name = chan['name']
-            if c_name.startswith('shitpost'):
+            if ch['name'].startswith('shitpost'):
                 continue
-            c_id = chan['id']
-            c_is_archived = chan['is_archived']
-            self.log.debug(f'Getting pins for channel: {c_name} ({c_id})')
-            try:
-                pins_resp = self.st.bot.pins_list(channel=c_id)
-            except SlackApiError as err:
-                # Check if the error is associated with not being in the channel
-                resp = err.response.get('error')
-                if resp == 'not_in_channel' and not c_is_archived:
-                    # Try to join the channel
-                    self.log.warning(f'Joining channel {c_name} real quick...')
-                    self.st.bot.conversations_join(channel=c_id)
-                    time.sleep(1)
-                    pins_resp = self.st.bot.pins_list(channel=c_id)
-                else:
-                    self.log.error(f'Received error response: {resp}')
-                    pins_resp = {'items': []}
-            pins = pins_resp.get('items')
-            for pin in pins:
-                pin_obj = Pin(pin)
-                tbl_objs.append(collect_pins(pin_obj, psql_client=self.psql_client, log=self.log, is_event=False))
-            # Wait so we don't exceed call limits
-            self.log.debug('Cooling off')
-            time.sleep(5)
-            with self.psql_client.session_mgr() as session:
-                session.add_all(tbl_objs)
-                total_objs += len(tbl_objs)
-        self.log.debug(f'Added {total_objs} pins')
+            channels.append({'id': ch['id'], 'name': ch['name'], 'is_archived': ch['is_archived']})
+        # Then we work through the channels and collect the pins
+        harvester = PinHarvester(
+            client=self.st.bot,
+            psql_client=self.psql_client,
+            parent_log=self.log,
+            bucket=TokenBucket.per_minute(self.PINS_LIST_CALLS_PER_MIN, capacity=self.PINS_LIST_BURST),
+            checkpoint_path=self.PIN_CHECKPOINT_PATH,
+            n_workers=self.PIN_HARVEST_WORKERS
+        )
+        if not is_resume:
+            harvester.checkpoint.clear()
+        stats = harvester.run(channels)
+        self.log.debug(f'Added {stats["pins"]} pins ({stats["failed_channels"]} channels failed)')
 
 
 if __name__ == '__main__':
@@ -344,6 +411,8 @@ if __name__ == '__main__':
 
     # etl = ETL(env='dev')
     # etl.handle_table_drops(tables=ETL.ALL_TABLES, create_only=False)
+    # etl.handle_migrations()
+    # etl.check_index_usage()
     # etl.etl_acronyms()
     # etl.etl_emojis()
     # etl.etl_okr_perks()
@@ -352,3 +421,5 @@ if __name__ == '__main__':
     # etl.etl_quotes()
     # etl.etl_responses()
     # etl.etl_bot_settings()
+    # etl.log_load_stats()
+    # etl.sync_all()
@@ -0,0 +1,193 @@
+"""
+Incremental (diff-based) syncing of ETL sources into their tables.
+
+A source (a sheet, or a list pulled from Slack) is hashed as a whole first. If the hash matches the one stored
+in sync_state from the last sync, nothing is touched. Otherwise its rows are matched against the table by a
+natural key and only the differences are applied: new rows are inserted, changed rows updated, rows that
+dropped out of the source soft-deleted and rows that came back revived - all in one transaction, so the
+table stays usable throughout.
+"""
+from datetime import (
+    date,
+    datetime,
+)
+import enum
+import hashlib
+import json
+import math
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy import (
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ClauseElement
+
+from viktor.db_eng import ViktorPSQLClient
+from viktor.model import (
+    Base,
+    TableSyncState,
+)
+
+
+def canonical_value(value: Any) -> Any:
+    """Puts a value in a form that compares (and serializes) the same whether it came from the db or a source"""
+    if isinstance(value, enum.Enum):
+        return value.name
+    if hasattr(value, 'item'):
+        # numpy scalars, as they come out of a DataFrame
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def hash_rows(rows: List[Dict[str, Any]]) -> str:
+    """A hash of the rows' content that doesn't depend on their order"""
+    serialized = sorted(json.dumps({k: canonical_value(v) for k, v in row.items()}, sort_keys=True, default=str)
+                        for row in rows)
+    return hashlib.sha256('\n'.join(serialized).encode('utf-8')).hexdigest()
+
+
+def diff_rows(existing: List[Dict[str, Any]], incoming: List[Dict[str, Any]], pk_col: str, key_cols: List[str],
+              update_cols: List[str]) -> Tuple[List[Dict], List[Dict], List[int], int]:
+    """Matches the incoming rows to the existing ones by their key columns
+
+    Args:
+        existing: the rows currently in the table - their primary key, key cols, update cols and is_deleted
+        incoming: the rows from the source. If more than one has the same key, the last one wins
+        pk_col: the name of the primary key column
+        key_cols: the columns that identify a row
+        update_cols: the columns to bring in line with the source for rows that already exist
+
+    Returns:
+        the rows to insert, the updates to make (by primary key), the primary keys to soft-delete and
+            how many of the updates are revivals of soft-deleted rows
+    """
+    def get_key(row: Dict[str, Any]) -> Tuple:
+        return tuple(canonical_value(row[k]) for k in key_cols)
+
+    incoming_by_key = {get_key(x): x for x in incoming}
+    matched = {}  # type: Dict[Tuple, Dict[str, Any]]
+    deletes = []
+    for row in existing:
+        key = get_key(row)
+        if key in incoming_by_key and key not in matched:
+            matched[key] = row
+        elif not row['is_deleted']:
+            # Either gone from the source or a duplicate of a row that's already matched
+            deletes.append(row[pk_col])
+
+    inserts = []
+    updates = []
+    n_revived = 0
+    for key, row in incoming_by_key.items():
+        current = matched.get(key)
+        if current is None:
+            inserts.append(row)
+            continue
+        is_changed = any(canonical_value(current[k]) != canonical_value(row.get(k)) for k in update_cols)
+        if current['is_deleted'] or is_changed:
+            updates.append({pk_col: current[pk_col], 'is_deleted': False, **{k: row.get(k) for k in update_cols}})
+            n_revived += 1 if current['is_deleted'] else 0
+    return inserts, updates, deletes, n_revived
+
+
+class IncrementalSync:
+    """Applies ETL sources to their tables by diff, skipping sources that haven't changed since the last sync
+
+    Args:
+        psql_client: the db client
+        parent_log: the logger to bind to
+    """
+
+    def __init__(self, psql_client: ViktorPSQLClient, parent_log: logger):
+        self.psql_client = psql_client
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+
+    @staticmethod
+    def _load_existing(session: Session, table: Base, key_cols: List[str], update_cols: List[str],
+                       scope: Optional[ClauseElement]) -> List[Dict[str, Any]]:
+        pk_col = table.__table__.primary_key.columns.values()[0]
+        cols = [pk_col] + [table.__table__.c[x] for x in dict.fromkeys(key_cols + update_cols)]
+        query = select(*cols, table.is_deleted.is_(True).label('is_deleted')).order_by(pk_col)
+        if scope is not None:
+            query = query.where(scope)
+        return [dict(x._mapping) for x in session.execute(query).all()]
+
+    def sync(self, source: str, table: Base, rows: List[Dict[str, Any]], key_cols: List[str],
+             update_cols: List[str] = None, scope: ClauseElement = None,
+             is_force: bool = False) -> Dict[str, Union[str, int, bool]]:
+        """Brings the table in line with the source
+
+        Args:
+            source: the name the source's hash is kept under (e.g., 'sheet:insults')
+            table: the model of the table the source is loaded into
+            rows: the source's rows, as dicts of column -> value. All need to have the same columns
+            key_cols: the columns that identify a row
+            update_cols: the columns that may change for an existing row. Anything else is only set on insert
+            scope: limits the existing rows looked at, if the table holds more than this source
+            is_force: if True, the diff is done even if the source's hash hasn't changed
+        """
+        update_cols = update_cols or []
+        content_hash = hash_rows(rows)
+        stats = {
+            'source': source,
+            'rows': len(rows),
+            'is_skipped': False,
+            'inserted': 0,
+            'updated': 0,
+            'revived': 0,
+            'deleted': 0,
+        }
+        pk_col = table.__table__.primary_key.columns.values()[0].key
+        with self.psql_client.session_mgr() as session:
+            state = session.get(TableSyncState, source)
+            if not is_force and state is not None and state.content_hash == content_hash:
+                self.log.debug(f'{source} is unchanged since {state.synced_at} - skipping')
+                stats['is_skipped'] = True
+                return stats
+
+            existing = self._load_existing(session, table, key_cols, update_cols, scope)
+            inserts, updates, deletes, n_revived = diff_rows(existing, rows, pk_col=pk_col, key_cols=key_cols,
+                                                             update_cols=update_cols)
+            if len(inserts) > 0:
+                session.execute(insert(table), inserts)
+            if len(updates) > 0:
+                session.execute(update(table), updates)
+            if len(deletes) > 0:
+                session.execute(
+                    update(table).where(getattr(table, pk_col).in_(deletes)).values(is_deleted=True).
+                    execution_options(synchronize_session=False)
+                )
+            session.execute(
+                pg_insert(TableSyncState).values(source=source, content_hash=content_hash, row_count=len(rows),
+                                                 synced_at=datetime.now()).
+                on_conflict_do_update(index_elements=[TableSyncState.source], set_={
+                    TableSyncState.content_hash: content_hash,
+                    TableSyncState.row_count: len(rows),
+                    TableSyncState.synced_at: datetime.now(),
+                })
+            )
+        stats.update({
+            'inserted': len(inserts),
+            'updated': len(updates) - n_revived,
+            'revived': n_revived,
+            'deleted': len(deletes),
+        })
+        self.log.debug(f'Synced {source}: {stats["inserted"]} inserted, {stats["updated"]} updated, '
+                       f'{stats["revived"]} revived, {stats["deleted"]} deleted')
+        return stats
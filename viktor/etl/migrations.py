@@ -0,0 +1,278 @@
+"""
+Versioned schema migrations for the viktor schema.
+
+Each migration gets applied once, in version order, and is recorded in the schema_migration table.
+Migrations are plain SQL, frozen at the time they're written - the models keep changing, but what a
+migration did shouldn't. Tables created from scratch by ETL.handle_table_drops already come with everything
+defined in the models, so migrations are written to be safe to run against those as well
+(e.g., CREATE INDEX IF NOT EXISTS).
+"""
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy import (
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.engine import (
+    Connection,
+    Engine,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import (
+    ClauseElement,
+    Executable,
+    and_,
+    not_,
+    or_,
+    text,
+)
+
+from viktor.model import (
+    ResponseCategory,
+    ResponseType,
+    TableEmoji,
+    TablePotentialEmoji,
+    TableQuote,
+    TableResponse,
+    TableSchemaMigration,
+    TableSlackChannel,
+    TableSlackUser,
+    TableSlackUserChangeLog,
+)
+
+
+class Migration:
+    """A single step in the schema's history
+
+    Args:
+        version: the schema version this brings the db up to
+        name: short description of the change
+        statements: the SQL to run, in order
+    """
+
+    def __init__(self, version: int, name: str, statements: List[str]):
+        self.version = version
+        self.name = name
+        self.statements = statements
+
+    def upgrade(self, conn: Connection):
+        """Applies the change, given a connection with an open transaction"""
+        for statement in self.statements:
+            conn.execute(text(statement))
+
+    def __repr__(self) -> str:
+        return f'<Migration(version={self.version}, name={self.name})>'
+
+
+MIGRATIONS = [
+    Migration(1, 'Add indexes for hot-path lookups', [
+        'CREATE INDEX IF NOT EXISTS ix_emoji_name ON viktor.emoji (name)',
+        'CREATE INDEX IF NOT EXISTS ix_emoji_active_name ON viktor.emoji (name) WHERE NOT is_deleted',
+        'CREATE INDEX IF NOT EXISTS ix_emoji_created_date ON viktor.emoji (created_date)',
+        'CREATE INDEX IF NOT EXISTS ix_potential_emoji_data_emoji_id ON viktor.potential_emoji (data_emoji_id)',
+        'CREATE INDEX IF NOT EXISTS ix_potential_emoji_created_date ON viktor.potential_emoji (created_date)',
+        'CREATE INDEX IF NOT EXISTS ix_quote_message_timestamp_link ON viktor.quote (message_timestamp, link)',
+        'CREATE INDEX IF NOT EXISTS ix_response_type_category_stage ON viktor.response (type, category, stage)',
+        'CREATE INDEX IF NOT EXISTS ix_slack_user_slack_bot_hash ON viktor.slack_user (slack_bot_hash)',
+        'CREATE INDEX IF NOT EXISTS ix_slack_user_change_log_user_key_created_date '
+        'ON viktor.slack_user_change_log (user_key, created_date DESC, user_change_id DESC)',
+    ]),
+    Migration(2, 'Unique emoji names & pins', [
+        # Fold the reaction counts of duplicate emojis into a single row - the oldest one that's not deleted
+        """
+        WITH ranked AS (
+            SELECT emoji_id
+                , FIRST_VALUE(emoji_id) OVER (
+                    PARTITION BY name ORDER BY COALESCE(is_deleted, FALSE), emoji_id
+                ) AS keep_id
+                , SUM(reaction_count) OVER (PARTITION BY name) AS total_reactions
+            FROM viktor.emoji
+        )
+        UPDATE viktor.emoji e
+        SET reaction_count = r.total_reactions
+        FROM ranked r
+        WHERE e.emoji_id = r.emoji_id
+            AND r.emoji_id = r.keep_id
+            AND e.reaction_count IS DISTINCT FROM r.total_reactions
+        """,
+        """
+        DELETE FROM viktor.emoji e
+        USING (
+            SELECT emoji_id
+                , FIRST_VALUE(emoji_id) OVER (
+                    PARTITION BY name ORDER BY COALESCE(is_deleted, FALSE), emoji_id
+                ) AS keep_id
+            FROM viktor.emoji
+        ) r
+        WHERE e.emoji_id = r.emoji_id
+            AND r.emoji_id <> r.keep_id
+        """,
+        'DROP INDEX IF EXISTS viktor.ix_emoji_name',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_emoji_name ON viktor.emoji (name)',
+        # Same for pins of the same message
+        """
+        DELETE FROM viktor.quote q
+        USING (
+            SELECT quote_id
+                , ROW_NUMBER() OVER (
+                    PARTITION BY message_timestamp, link ORDER BY COALESCE(is_deleted, FALSE), quote_id
+                ) AS row_no
+            FROM viktor.quote
+        ) r
+        WHERE q.quote_id = r.quote_id
+            AND r.row_no > 1
+        """,
+        'DROP INDEX IF EXISTS viktor.ix_quote_message_timestamp_link',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_quote_message_timestamp_link '
+        'ON viktor.quote (message_timestamp, link)',
+    ]),
+    Migration(3, 'Add sync state for incremental ETL', [
+        """
+        CREATE TABLE IF NOT EXISTS viktor.sync_state (
+            source VARCHAR(100) PRIMARY KEY,
+            content_hash VARCHAR(64) NOT NULL,
+            row_count INTEGER NOT NULL,
+            synced_at TIMESTAMP NOT NULL,
+            created_date TIMESTAMP DEFAULT now(),
+            update_date TIMESTAMP DEFAULT now(),
+            is_deleted BOOLEAN
+        )
+        """,
+    ]),
+    Migration(4, 'Flag responses added from the bot', [
+        'ALTER TABLE viktor.response ADD COLUMN IF NOT EXISTS is_user_added BOOLEAN NOT NULL DEFAULT FALSE',
+    ]),
+]
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(select(func.max(TableSchemaMigration.version))).scalar() or 0
+
+
+def apply_migrations(engine: Engine, log: logger, target_version: Optional[int] = None) -> List[int]:
+    """Applies, in order, every migration newer than the db's current schema version.
+    Each migration runs in its own transaction.
+
+    Args:
+        engine: the engine of the db to migrate
+        log: logger
+        target_version: if set, migrations past this version are left unapplied
+
+    Returns:
+        the versions that were applied
+    """
+    TableSchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        current_version = get_schema_version(conn)
+    log.debug(f'Schema is at version {current_version}.')
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda x: x.version):
+        if migration.version <= current_version:
+            continue
+        if target_version is not None and migration.version > target_version:
+            break
+        log.debug(f'Applying migration {migration.version}: {migration.name}...')
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(insert(TableSchemaMigration).values(version=migration.version, name=migration.name))
+        applied.append(migration.version)
+    log.debug(f'Applied {len(applied)} migrations.')
+    return applied
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) for a select statement"""
+    inherit_cache = False
+
+    def __init__(self, statement: ClauseElement):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def _compile_explain(element: Explain, compiler, **kwargs) -> str:
+    return f'EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kwargs)}'
+
+
+def build_hot_queries() -> Dict[str, ClauseElement]:
+    """The lookups that run on every event or cron run, by where they're found"""
+    hour_ago = datetime.now() - timedelta(hours=1)
+    latest_changelogs = select(TableSlackUserChangeLog).distinct(TableSlackUserChangeLog.user_key).order_by(
+        TableSlackUserChangeLog.user_key,
+        TableSlackUserChangeLog.created_date.desc(),
+        TableSlackUserChangeLog.user_change_id.desc()
+    )
+    return {
+        'db_eng.get_user_from_hash': select(TableSlackUser).where(TableSlackUser.slack_user_hash == 'U0'),
+        'db_eng.get_channel_from_hash': select(TableSlackChannel).where(
+            TableSlackChannel.slack_channel_hash == 'C0'),
+        'db_eng.get_reaction_emojis': select(TableEmoji.name).where(and_(
+            not_(TableEmoji.is_react_denylisted),
+            not_(TableEmoji.is_deleted)
+        )),
+        'events.emoji_changed': select(TableEmoji).where(TableEmoji.name == 'party'),
+        'events.pin_added': select(TableQuote).where(and_(
+            TableQuote.message_timestamp == hour_ago,
+            TableQuote.link == 'https://example.com'
+        )),
+        'pin_collector.author': select(TableSlackUser).where(or_(
+            TableSlackUser.slack_user_hash == 'B0',
+            TableSlackUser.slack_bot_hash == 'B0'
+        )),
+        'crons.new_emojis': select(TableEmoji).where(TableEmoji.created_date >= hour_ago),
+        'crons.new_potential_emojis': select(TablePotentialEmoji).where(
+            TablePotentialEmoji.created_date >= hour_ago),
+        'user_changes.collect_profile_changes': latest_changelogs,
+        'corpus.responses': select(TableResponse.text).where(and_(
+            TableResponse.type == ResponseType.INSULT,
+            TableResponse.category == ResponseCategory.STANDARD
+        )),
+    }
+
+
+def find_index_scans(plan: Union[Dict[str, Any], List]) -> List[str]:
+    """Walks an EXPLAIN (FORMAT JSON) plan, collecting the names of the indexes it scans"""
+    if isinstance(plan, list):
+        return [x for item in plan for x in find_index_scans(item)]
+    indexes = []
+    if 'Plan' in plan:
+        indexes += find_index_scans(plan['Plan'])
+    if 'Index Name' in plan:
+        indexes.append(plan['Index Name'])
+    for subplan in plan.get('Plans', []):
+        indexes += find_index_scans(subplan)
+    return indexes
+
+
+def check_index_usage(engine: Engine, log: logger) -> Dict[str, List[str]]:
+    """EXPLAINs each of the hot queries and reports which indexes it would use.
+
+    Sequential scans are switched off for the check - otherwise the planner will (rightly) prefer them
+    for small tables, which says nothing about whether a usable index exists.
+
+    Returns:
+        map of query -> indexes scanned. An empty list means the query has no index to work with
+    """
+    results = {}
+    with engine.connect() as conn:
+        conn.execute(text('SET LOCAL enable_seqscan = off'))
+        for name, query in build_hot_queries().items():
+            plan = conn.execute(Explain(query)).scalar()
+            results[name] = find_index_scans(plan)
+            if len(results[name]) == 0:
+                log.warning(f'Query "{name}" doesn\'t use an index!')
+            else:
+                log.debug(f'Query "{name}" uses: {", ".join(results[name])}')
+        conn.rollback()
+    return results
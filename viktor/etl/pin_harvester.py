@@ -0,0 +1,193 @@
+"""
+Concurrent harvesting of channel pins into the quotes table.
+
+Channels are worked through by a small pool of threads, with every Slack call paced by a shared token bucket.
+Each channel's pins are written as soon as they come in, and once a channel's done its id is recorded in a
+checkpoint file - a rerun after a failure picks up with the channels that weren't finished.
+"""
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    as_completed,
+)
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from loguru import logger
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slacktools.api.web.pins import Pin
+from sqlalchemy.dialects.postgresql import insert
+
+from viktor.core.pin_collector import collect_pins_batch
+from viktor.core.rate_limit import TokenBucket
+from viktor.db_eng import ViktorPSQLClient
+from viktor.model import TableQuote
+
+# The columns set when building a quote from a pin. Everything else is left to its default.
+QUOTE_COLUMNS = [
+    'text',
+    'author_user_key',
+    'channel_key',
+    'pinner_user_key',
+    'is_quotable',
+    'image_urls',
+    'file_urls',
+    'link',
+    'message_timestamp',
+    'pin_timestamp',
+]
+
+
+class HarvestCheckpoint:
+    """The ids of the channels that have been fully harvested, kept in a json file"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.completed = set()  # type: Set[str]
+        if self.path.exists():
+            self.completed = set(json.loads(self.path.read_text()).get('completed', []))
+        self._lock = threading.Lock()
+
+    def mark_completed(self, channel_id: str):
+        with self._lock:
+            self.completed.add(channel_id)
+            # Write to a temp file & swap it in so a crash mid-write doesn't lose the checkpoint
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps({'completed': sorted(self.completed)}))
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.completed = set()
+            self.path.unlink(missing_ok=True)
+
+
+class PinHarvester:
+    """Collects the pins of many channels in parallel, without going over Slack's rate limits
+
+    Args:
+        client: the Slack web client
+        psql_client: the db client
+        parent_log: the logger to bind to
+        bucket: paces the calls made to the api
+        checkpoint_path: where to keep track of the channels already harvested
+        n_workers: number of channels worked on at once
+        max_retries: number of times a call is retried after being rate-limited
+    """
+
+    def __init__(self, client: WebClient, psql_client: ViktorPSQLClient, parent_log: logger,
+                 bucket: TokenBucket, checkpoint_path: pathlib.Path, n_workers: int = 4, max_retries: int = 5):
+        self.client = client
+        self.psql_client = psql_client
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        self.bucket = bucket
+        self.checkpoint = HarvestCheckpoint(checkpoint_path)
+        self.n_workers = n_workers
+        self.max_retries = max_retries
+        self.stats = {
+            'channels': 0,
+            'skipped_channels': 0,
+            'failed_channels': 0,
+            'pins': 0,
+            'rate_limited': 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def _call(self, method: Callable[..., Any], **kwargs) -> Any:
+        """Makes a paced api call, waiting out any Retry-After it gets back"""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return method(**kwargs)
+            except SlackApiError as err:
+                if err.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float(err.response.headers.get('Retry-After', 1))
+                self.log.warning(f'Rate limited on {method.__name__} - waiting {retry_after}s')
+                self._count('rate_limited')
+                self.bucket.pause(retry_after)
+
+    def get_pins(self, channel: Dict) -> List[Dict]:
+        """Lists a channel's pins, joining the channel first if need be"""
+        try:
+            return self._call(self.client.pins_list, channel=channel['id']).get('items', [])
+        except SlackApiError as err:
+            # Check if the error is associated with not being in the channel
+            resp = err.response.get('error')
+            if resp == 'not_in_channel' and not channel['is_archived']:
+                self.log.warning(f'Joining channel {channel["name"]} real quick...')
+                self._call(self.client.conversations_join, channel=channel['id'])
+                return self._call(self.client.pins_list, channel=channel['id']).get('items', [])
+            raise
+
+    def store_pins(self, pins: List[Dict]) -> int:
+        """Writes the pins to the quotes table, skipping any that are already there"""
+        if len(pins) == 0:
+            return 0
+        tbl_objs = collect_pins_batch([Pin(x) for x in pins], psql_client=self.psql_client, log=self.log,
+                                      is_event=False)
+        with self.psql_client.session_mgr() as session:
+            session.execute(
+                insert(TableQuote).on_conflict_do_nothing(
+                    index_elements=[TableQuote.message_timestamp, TableQuote.link]),
+                [{k: getattr(x, k) for k in QUOTE_COLUMNS} for x in tbl_objs]
+            )
+        return len(tbl_objs)
+
+    def harvest_channel(self, channel: Dict) -> Optional[int]:
+        """Collects and stores the pins of a single channel
+
+        Returns:
+            the number of pins found, or None if the channel failed
+        """
+        try:
+            n_pins = self.store_pins(self.get_pins(channel))
+        except SlackApiError as err:
+            self.log.error(f'Received error response for {channel["name"]}: {err.response.get("error")}')
+            self._count('failed_channels')
+            return None
+        except Exception as err:
+            self.log.error(f'Failed to harvest {channel["name"]}: {err}')
+            self._count('failed_channels')
+            return None
+        self.checkpoint.mark_completed(channel['id'])
+        self._count('channels')
+        self._count('pins', n_pins)
+        self.log.debug(f'Stored {n_pins} pins from {channel["name"]}')
+        return n_pins
+
+    def run(self, channels: List[Dict]) -> Dict[str, int]:
+        """Harvests every channel not yet in the checkpoint. The checkpoint's cleared once nothing fails
+
+        Args:
+            channels: dicts with the 'id', 'name' and 'is_archived' of each channel
+        """
+        todo = [x for x in channels if x['id'] not in self.checkpoint.completed]
+        self._count('skipped_channels', len(channels) - len(todo))
+        self.log.debug(f'Harvesting pins from {len(todo)} channels ({len(channels) - len(todo)} already done)...')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.n_workers, thread_name_prefix='pin-harvester') as executor:
+            futures = [executor.submit(self.harvest_channel, x) for x in todo]
+            for i, _ in enumerate(as_completed(futures), start=1):
+                if i % 25 == 0:
+                    self.log.debug(f'Finished {i}/{len(todo)} channels')
+        if self.stats['failed_channels'] == 0:
+            self.checkpoint.clear()
+        self.log.debug(f'Harvested {self.stats["pins"]} pins from {self.stats["channels"]} channels in '
+                       f'{time.perf_counter() - start:.1f}s')
+        return dict(self.stats)
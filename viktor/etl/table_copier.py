@@ -0,0 +1,156 @@
+"""
+Streaming copy of tables from one database to another.
+
+Rows are read from the source in primary key order through a server-side cursor and written to the target in
+fixed-size batches, each batch a single multi-row INSERT committed on its own. After each batch the last
+primary key copied is written to a checkpoint file, so a transfer that fails partway through resumes right
+after the last batch that made it. Primary keys are copied as-is, so once a table's done its sequence is
+moved past the highest key.
+"""
+import json
+import os
+import pathlib
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from loguru import logger
+from sqlalchemy import (
+    Integer,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+
+from viktor.model import Base
+
+
+class CopyCheckpoint:
+    """Progress of a transfer - per table, the last primary key copied and whether it's done - in a json file"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.tables = {}  # type: Dict[str, Dict[str, Any]]
+        if self.path.exists():
+            self.tables = json.loads(self.path.read_text()).get('tables', {})
+
+    @property
+    def is_started(self) -> bool:
+        return len(self.tables) > 0
+
+    def get_last_pk(self, table_name: str) -> Optional[Any]:
+        return self.tables.get(table_name, {}).get('last_pk')
+
+    def is_done(self, table_name: str) -> bool:
+        return self.tables.get(table_name, {}).get('is_done', False)
+
+    def update(self, table_name: str, last_pk: Any = None, is_done: bool = False):
+        entry = self.tables.setdefault(table_name, {'last_pk': None, 'is_done': False})
+        if last_pk is not None:
+            entry['last_pk'] = last_pk
+        entry['is_done'] = is_done
+        # Write to a temp file & swap it in so a crash mid-write doesn't lose the checkpoint
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'tables': self.tables}, default=str))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.tables = {}
+        self.path.unlink(missing_ok=True)
+
+
+class TableCopier:
+    """Copies tables between two databases with the same schema
+
+    Args:
+        src_engine: the engine of the db to copy from
+        tgt_engine: the engine of the db to copy to
+        parent_log: the logger to bind to
+        checkpoint_path: where to keep track of the transfer's progress
+        batch_size: the number of rows read & written at a time
+    """
+
+    def __init__(self, src_engine: Engine, tgt_engine: Engine, parent_log: logger, checkpoint_path: pathlib.Path,
+                 batch_size: int = 5000):
+        self.src_engine = src_engine
+        self.tgt_engine = tgt_engine
+        self.log = parent_log.bind(child_name=self.__class__.__name__)
+        self.checkpoint = CopyCheckpoint(checkpoint_path)
+        self.batch_size = batch_size
+
+    @staticmethod
+    def build_sequence_reset(table: Base) -> Optional[str]:
+        """SQL that moves the table's id sequence past the largest id in the table, if it has one"""
+        pk_col = table.__table__.primary_key.columns.values()[0]
+        if not isinstance(pk_col.type, Integer) or pk_col.autoincrement is False:
+            return None
+        tbl_name = f'{table.__table_args__.get("schema")}.{table.__tablename__}'
+        return f"SELECT setval(pg_get_serial_sequence('{tbl_name}', '{pk_col.name}'), " \
+               f"COALESCE(MAX({pk_col.name}), 1), MAX({pk_col.name}) IS NOT NULL) FROM {tbl_name}"
+
+    def copy_table(self, table: Base) -> int:
+        """Copies the rows of a single table that aren't already covered by the checkpoint
+
+        Returns:
+            the number of rows copied
+        """
+        tbl = table.__table__
+        pk_col = tbl.primary_key.columns.values()[0]
+        last_pk = self.checkpoint.get_last_pk(tbl.name)
+        query = select(tbl).order_by(pk_col)
+        count_query = select(func.count()).select_from(tbl)
+        if last_pk is not None:
+            self.log.debug(f'Resuming {tbl.name} after {pk_col.name} {last_pk}')
+            query = query.where(pk_col > last_pk)
+            count_query = count_query.where(pk_col > last_pk)
+        # Rows already there (e.g., from a batch whose checkpoint didn't get written) are skipped
+        insert_stmt = insert(tbl).on_conflict_do_nothing(index_elements=[pk_col])
+
+        start = time.perf_counter()
+        n_copied = 0
+        with self.src_engine.connect() as src_conn:
+            n_total = src_conn.execute(count_query).scalar()
+            self.log.debug(f'Copying {n_total} rows of {tbl.name}...')
+            result = src_conn.execution_options(stream_results=True, yield_per=self.batch_size).execute(query)
+            for batch in result.mappings().partitions():
+                rows = [dict(x) for x in batch]
+                with self.tgt_engine.begin() as tgt_conn:
+                    tgt_conn.execute(insert_stmt, rows)
+                n_copied += len(rows)
+                self.checkpoint.update(tbl.name, last_pk=rows[-1][pk_col.key])
+                elapsed = time.perf_counter() - start
+                self.log.debug(f'{tbl.name}: {n_copied}/{n_total} ({n_copied / max(n_total, 1):.1%}), '
+                               f'{n_copied / elapsed:.0f} rows/sec')
+
+        reset_sql = self.build_sequence_reset(table)
+        if reset_sql is not None:
+            with self.tgt_engine.begin() as tgt_conn:
+                tgt_conn.execute(text(reset_sql))
+        self.checkpoint.update(tbl.name, is_done=True)
+        self.log.debug(f'Finished {tbl.name}: {n_copied} rows in {time.perf_counter() - start:.1f}s')
+        return n_copied
+
+    def run(self, tables: List[Base]) -> Dict[str, int]:
+        """Copies the tables in order - parents before the tables with foreign keys to them.
+        Tables finished in an earlier (failed) run are skipped, and the checkpoint's cleared once all are done.
+
+        Returns:
+            map of table -> rows copied
+        """
+        copied = {}
+        for i, table in enumerate(tables, start=1):
+            tbl_name = table.__tablename__
+            if self.checkpoint.is_done(tbl_name):
+                self.log.debug(f'Table {i}/{len(tables)} {tbl_name} was already copied - skipping')
+                continue
+            self.log.debug(f'Working on table {i}/{len(tables)} {tbl_name}')
+            copied[tbl_name] = self.copy_table(table)
+        self.checkpoint.clear()
+        self.log.debug(f'Transfer complete: {sum(copied.values())} rows over {len(copied)} tables')
+        return copied
@@ -12,6 +12,7 @@ from .error import (
     ErrorType,
     TableError,
 )
+from .migration import TableSchemaMigration
 from .okr import (
     TablePerk,
     TableQuote,
@@ -25,6 +26,7 @@ from .setting import (
     BotSettingType,
     TableBotSetting,
 )
+from .sync import TableSyncState
 from .user import (
     TableSlackUser,
     TableSlackUserChangeLog,
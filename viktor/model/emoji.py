@@ -5,8 +5,10 @@ from sqlalchemy import (
     VARCHAR,
     Boolean,
     Column,
+    Index,
     Integer,
 )
+from sqlalchemy.sql import not_
 
 # local imports
 from viktor.model.base import Base
@@ -45,3 +47,12 @@ class TablePotentialEmoji(Base):
 
     def __repr__(self) -> str:
         return f'<TablePotentialEmoji(name={self.name}, uploaded={self.upload_timestamp})>'
+
+
+# Lookups by name (reaction counts, emoji rename/removal, name checks). Also the conflict target for upserts.
+Index('uq_emoji_name', TableEmoji.name, unique=True)
+# Names of emojis that are still around (random picks, reaction candidates)
+Index('ix_emoji_active_name', TableEmoji.name, postgresql_where=not_(TableEmoji.is_deleted))
+Index('ix_emoji_created_date', TableEmoji.created_date)
+Index('ix_potential_emoji_data_emoji_id', TablePotentialEmoji.data_emoji_id)
+Index('ix_potential_emoji_created_date', TablePotentialEmoji.created_date)
@@ -0,0 +1,22 @@
+from sqlalchemy import (
+    VARCHAR,
+    Column,
+    Integer,
+)
+
+# local imports
+from viktor.model.base import Base
+
+
+class TableSchemaMigration(Base):
+    """schema_migration table - records which schema migrations have been applied"""
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(VARCHAR(255), nullable=False)
+
+    def __init__(self, version: int, name: str):
+        self.version = version
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f'<TableSchemaMigration(version={self.version}, name={self.name})>'
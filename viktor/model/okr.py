@@ -11,6 +11,7 @@ from sqlalchemy import (
     Boolean,
     Column,
     ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.dialects.postgresql import ARRAY
@@ -85,3 +86,7 @@ class TableQuote(Base):
     def __repr__(self) -> str:
         return f'<TableQuote(is_quotable={self.is_quotable}, text={self.text[:10]}, ' \
                f'message_ts={self.message_timestamp}, pin_ts={self.pin_timestamp})>'
+
+
+# Pin dedupe / removal. Also the conflict target for upserts.
+Index('uq_quote_message_timestamp_link', TableQuote.message_timestamp, TableQuote.link, unique=True)
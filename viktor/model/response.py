@@ -2,8 +2,10 @@ import enum
 
 from sqlalchemy import (
     TEXT,
+    Boolean,
     Column,
     Enum,
+    Index,
     Integer,
 )
 
@@ -37,13 +39,20 @@ class TableResponse(Base):
     category = Column(Enum(ResponseCategory), nullable=False)
     stage = Column(Integer, default=1, nullable=False)
     text = Column(TEXT, nullable=False)
+    # Added from the bot (e.g., new ifacts) rather than loaded from a sheet
+    is_user_added = Column(Boolean, default=False, nullable=False)
 
-    def __init__(self, response_type: ResponseType, category: ResponseCategory, text: str, stage: int = 1):
+    def __init__(self, response_type: ResponseType, category: ResponseCategory, text: str, stage: int = 1,
+                 is_user_added: bool = False):
         self.type = response_type
         self.category = category
         self.stage = stage
         self.text = text
+        self.is_user_added = is_user_added
 
     def __repr__(self) -> str:
         return f'<TableResponse(type={self.type.name}, category={self.category.name}, stage={self.stage},' \
                f' text={self.text[:10]})>'
+
+
+Index('ix_response_type_category_stage', TableResponse.type, TableResponse.category, TableResponse.stage)
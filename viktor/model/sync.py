@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    TIMESTAMP,
+    VARCHAR,
+    Column,
+    Integer,
+)
+
+# local imports
+from viktor.model.base import Base
+
+
+class TableSyncState(Base):
+    """sync_state table - the content hash of each ETL source as of its last incremental sync"""
+
+    source = Column(VARCHAR(100), primary_key=True)
+    content_hash = Column(VARCHAR(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    synced_at = Column(TIMESTAMP, nullable=False)
+
+    def __init__(self, source: str, content_hash: str, row_count: int, synced_at: datetime):
+        self.source = source
+        self.content_hash = content_hash
+        self.row_count = row_count
+        self.synced_at = synced_at
+
+    def __repr__(self) -> str:
+        return f'<TableSyncState(source={self.source}, rows={self.row_count}, synced_at={self.synced_at})>'
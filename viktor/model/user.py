@@ -5,6 +5,7 @@ from sqlalchemy import (
     Column,
     Float,
     ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.orm import relationship
@@ -100,3 +101,9 @@ class TableSlackUserChangeLog(Base):
     def __repr__(self) -> str:
         return f'<TableSlackUserChangeLog(name={self.real_name}, display_name={self.display_name}, ' \
                f'status={self.status_title[:20]})>'
+
+
+Index('ix_slack_user_slack_bot_hash', TableSlackUser.slack_bot_hash)
+# Latest changelog entry per user
+Index('ix_slack_user_change_log_user_key_created_date', TableSlackUserChangeLog.user_key,
+      TableSlackUserChangeLog.created_date.desc(), TableSlackUserChangeLog.user_change_id.desc())
@@ -8,10 +8,10 @@ from flask import (
     make_response,
     request,
 )
-import requests
 from slack_bolt import App
 from slack_bolt.adapter.flask import SlackRequestHandler
 
+from viktor.core.http_client import get_http_client
 from viktor.routes.helpers import get_app_bot
 from viktor.settings import (
     Development,
@@ -75,8 +75,8 @@ def handle_action(ack):
     if response_url is not None:
         # Update original message
         if 'shortcut' not in action.get('type'):
-            _ = requests.post(event_data['response_url'], json=update_dict,
-                              headers={'Content-Type': 'application/json'})
+            _ = get_http_client().post(event_data['response_url'], json=update_dict,
+                                       headers={'Content-Type': 'application/json'})
 
     # Send HTTP 200 response with an empty body so Slack knows we're done
     return make_response('', 200)
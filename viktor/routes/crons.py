@@ -22,12 +22,13 @@ from slacktools.block_kit.blocks import (
 )
 from slacktools.block_kit.elements.formatters import TextFormatter
 
-from viktor.core.user_changes import build_profile_diff
+from viktor.core.user_changes import (
+    build_profile_diff,
+    collect_profile_changes,
+)
 from viktor.model import (
     TableEmoji,
     TablePotentialEmoji,
-    TableSlackUser,
-    TableSlackUserChangeLog,
 )
 from viktor.routes.helpers import (
     get_app_bot,
@@ -116,38 +117,8 @@ def handle_cron_profile_update():
         'role_desc',
         'avatar_link'
     ]
-    updated_users = []
     with get_viktor_eng().session_mgr() as session:
-        users = session.query(TableSlackUser).all()
-
-        user: TableSlackUser
-        for user in users:
-            most_recent_changelog = session.query(TableSlackUserChangeLog).filter(
-                TableSlackUserChangeLog.user_key == user.user_id
-            ).order_by(TableSlackUserChangeLog.created_date.desc()).limit(1).one_or_none()
-            if most_recent_changelog is None:
-                # Record the user details without comparison - this is the first instance encountering this user
-                logg.debug('Recording user details to changelog - no past changelog entry')
-                attr_dict = {k: user.__dict__.get(k) for k in attrs}
-                session.add(TableSlackUserChangeLog(user_key=user.user_id, **attr_dict))
-            else:
-                # Begin comparing to find what's new
-                change_dict = {'user_hashname': f'{user.display_name}|{user.slack_user_hash}'}
-                for attr in attrs:
-                    last_chglog = most_recent_changelog.__dict__.get(attr)
-                    cur_user = user.__dict__.get(attr)
-                    if last_chglog != cur_user:
-                        change_dict[attr] = {
-                            'old': last_chglog,
-                            'new': cur_user
-                        }
-                if len(change_dict) > 1:
-                    logg.debug(f'{len(change_dict)} changes detected for '
-                               f'{user.display_name}(uid:{user.user_id})')
-                    # Update the changelog
-                    attr_dict = {k: user.__dict__.get(k) for k in attrs}
-                    session.add(TableSlackUserChangeLog(user_key=user.user_id, **attr_dict))
-                    updated_users.append(change_dict)
+        updated_users = collect_profile_changes(session=session, attrs=attrs, log=logg)
     # Now work on splitting the new/old info into a message
     for updated_user in updated_users:
         blocks = [
@@ -1,10 +1,11 @@
-from datetime import datetime
 import os
-from typing import TYPE_CHECKING
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+)
 
 from flask import (
     Blueprint,
-    make_response,
     request,
 )
 import numpy as np
@@ -31,11 +32,13 @@ from slacktools.api.events.reaction import (
     ReactionRemoved,
 )
 from slacktools.api.web.conversations import Message
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql import and_
 
 from viktor.core.pin_collector import collect_pins
 from viktor.core.user_changes import extract_user_change
 from viktor.model import (
+    BotSettingType,
     TableEmoji,
     TableQuote,
     TableSlackChannel,
@@ -44,6 +47,7 @@ from viktor.routes.helpers import (
     get_app_bot,
     get_app_logger,
     get_viktor_eng,
+    submit_event,
 )
 from viktor.settings import (
     Development,
@@ -79,7 +83,10 @@ def handle_event():
 @bolt_app.event('message')
 def scan_message(ack):
     ack()
-    event_data = request.json
+    submit_event('messages', _process_message, event_dict=request.json)
+
+
+def _process_message(event_data: Dict):
     get_app_bot().process_event(event_data)
 
 
@@ -88,11 +95,13 @@ def scan_message(ack):
 @bolt_app.event('channel_rename')
 @bolt_app.event('channel_created')
 def handle_channel_actions():
-    event_data = request.json
+    submit_event('general', _process_channel_action, event_dict=request.json['event'])
+
+
+def _process_channel_action(event_dict: Dict):
     logg = get_app_logger()
     eng = get_viktor_eng()
 
-    event_dict = event_data['event']
     event_type = event_dict['type']
     logg.debug(f'Handling channel event: {event_type}')
     match event_type:
@@ -100,10 +109,16 @@ def handle_channel_actions():
             channel_obj = ChannelCreated(event_dict)
             # Add channel to db
             with eng.session_mgr() as session:
-                session.add(TableSlackChannel(
-                    slack_channel_hash=channel_obj.channel.id,
-                    channel_name=channel_obj.channel.name
-                ))
+                session.execute(
+                    insert(TableSlackChannel).values(
+                        slack_channel_hash=channel_obj.channel.id,
+                        channel_name=channel_obj.channel.name
+                    ).on_conflict_do_update(
+                        index_elements=[TableSlackChannel.slack_channel_hash],
+                        set_={TableSlackChannel.channel_name: channel_obj.channel.name}
+                    )
+                )
+            eng.invalidate_channel(channel_obj.channel.id)
             # Join channel
             get_app_bot().st.bot.conversations_join(channel=channel_obj.channel.id)
             # Announce in channel
@@ -121,6 +136,7 @@ def handle_channel_actions():
                     update({
                         TableSlackChannel.is_archived: True
                     })
+            eng.invalidate_channel(channel_obj.channel)
         case 'channel_unarchive':
             # Mark as archived
             channel_obj = ChannelUnarchive(event_dict)
@@ -130,7 +146,8 @@ def handle_channel_actions():
                     update({
                         TableSlackChannel.is_archived: False
                     })
-                # Join channel
+            eng.invalidate_channel(channel_obj.channel)
+            # Join channel
             get_app_bot().st.bot.conversations_join(channel=channel_obj.channel)
             # Announce in channel
             get_app_bot().st.send_message(
@@ -142,12 +159,13 @@ def handle_channel_actions():
             channel_obj = ChannelRename(event_dict)
             with eng.session_mgr() as session:
                 session.query(TableSlackChannel). \
-                    filter(TableSlackChannel.slack_channel_hash == channel_obj.channel). \
+                    filter(TableSlackChannel.slack_channel_hash == channel_obj.channel.id). \
                     update({
                         TableSlackChannel.channel_name: channel_obj.channel.name
                     })
+            eng.invalidate_channel(channel_obj.channel.id)
             get_app_bot().st.send_message(
-                channel=channel_obj.channel,
+                channel=channel_obj.channel.id,
                 message='Hewwo! Confirming that this rename is recorded in our scrolls'
             )
 
@@ -155,12 +173,14 @@ def handle_channel_actions():
 @bolt_app.event('reaction_removed')
 @bolt_app.event('reaction_added')
 def reaction():
-    event_data = request.json
+    submit_event('reactions', _process_reaction, event_dict=request.json['event'])
+
+
+def _process_reaction(event_dict: Dict):
     logg = get_app_logger()
     eng = get_viktor_eng()
     static_bot = get_app_bot()
 
-    event_dict = event_data['event']
     event_type = event_dict['type']
     if event_type == 'reaction_added':
         event_obj = ReactionAdded(event_dict)
@@ -174,35 +194,31 @@ def reaction():
     # This is the timestamp of the message
     msg_ts = event_obj.item.ts
     channel = event_obj.item.channel
-    current_hour = f'{datetime.now():%F %H}'
-    unique_event_key = f'{channel}|{event_obj.user}|{event_type}|{msg_ts}|{current_hour}'
-    if unique_event_key in get_app_bot().state_store['react-events']:
+    # Keys are bucketed by the current hour, so the same reaction is handled again once the hour rolls over
+    unique_event_key = f'{channel}|{event_obj.user}|{event_type}|{msg_ts}'
+    if not get_app_bot().state_store['react-events'].check_and_add(unique_event_key):
         # Event's already been processed
         logg.debug(f'Bypassing react due to preexisting event key: {unique_event_key}')
-        return make_response('', 200)
-    else:
-        # Store new react event first
-        logg.debug(f'Registering react in {channel}: {unique_event_key}')
-        get_app_bot().state_store['react-events'].add(unique_event_key)
+        return
+    logg.debug(f'Registered react in {channel}: {unique_event_key}')
 
     channel_obj = eng.get_channel_from_hash(channel_hash=channel)
 
     if event_type == 'reaction_added':
-        # Log a used react
-        with eng.session_mgr() as session:
-            logg.debug('Counting react in db...')
-            session.query(TableEmoji).filter(TableEmoji.name == event_obj.reaction).update({
-                'reaction_count': TableEmoji.reaction_count + 1
-            })
-            logg.debug('Determining if channel allows bot reactions')
-            if channel_obj is not None and not channel_obj.is_allow_bot_react:
-                logg.debug('Channel is denylisted for bot reactions. Do nothing...')
-                # Channel doesn't allow reactions
-                return make_response('', 200)
-            if event_obj.user in [static_bot.bot_id, static_bot.user_id]:
-                logg.debug('Bypassing bot react...')
-                # Don't allow this infinite loop
-                return make_response('', 200)
+        # Log a used react. This gets written to the db with the next batch of counts
+        static_bot.reaction_counter.add(event_obj.reaction)
+        if eng.get_bot_setting(BotSettingType.IS_ALLOW_GLOBAL_REACTION) is False:
+            logg.debug('Bot reactions are disabled globally. Do nothing...')
+            return
+        logg.debug('Determining if channel allows bot reactions')
+        if channel_obj is not None and not channel_obj.is_allow_bot_react:
+            logg.debug('Channel is denylisted for bot reactions. Do nothing...')
+            # Channel doesn't allow reactions
+            return
+        if event_obj.user in [static_bot.bot_id, static_bot.user_id]:
+            logg.debug('Bypassing bot react...')
+            # Don't allow this infinite loop
+            return
         logg.debug('Randomly selecting an emoji to react with.')
         emoji = np.random.choice(get_app_bot().state_store['reacts-store'])
         try:
@@ -216,7 +232,7 @@ def reaction():
         reacts = msg_obj.reactions
         if reacts is None or len(reacts) == 0:
             logg.debug('No more reacts from item. Skipping process.')
-            return make_response('', 200)
+            return
         # Otherwise, let's try to select a react to remove
         react = reacts[np.random.randint(len(reacts))]
         logg.debug(f'Attempting to remove react: {react.name}')
@@ -224,14 +240,15 @@ def reaction():
             resp = get_app_bot().st.bot.reactions_remove(channel=channel, timestamp=msg_ts, name=react.name)
         except SlackApiError:
             logg.error(f'Removing did no succeed. Reason: {resp.get("error")}')
-    return make_response('', 200)
 
 
 @bolt_app.event('emoji_changed')
 def record_new_emojis():
     """Make a post about a new emoji being added in the #emoji_suggestions channel"""
-    event_data = request.json
-    event_dict = event_data['event']
+    submit_event('general', _process_emoji_change, event_dict=request.json['event'])
+
+
+def _process_emoji_change(event_dict: Dict):
     logg = get_app_logger()
     eng = get_viktor_eng()
     logg.debug(f'Emoji change detected: {event_dict["subtype"]}')
@@ -240,52 +257,63 @@ def record_new_emojis():
             event_obj = EmojiAdded(event_dict)
             logg.debug('Attempting to add new emoji')
             with eng.session_mgr() as session:
-                session.add(TableEmoji(name=event_obj.name))
+                # If the name's been used before, bring the old row back instead
+                session.execute(
+                    insert(TableEmoji).values(name=event_obj.name).
+                    on_conflict_do_update(index_elements=[TableEmoji.name], set_={TableEmoji.is_deleted: False})
+                )
+            get_app_bot().emoji_catalog.add(event_obj.name)
         case 'rename':
             event_obj = EmojiRenamed(event_dict)
             logg.debug('Attempting to rename an emoji.')
-            with eng.session_mgr() as session:
-                session.query(TableEmoji).filter(TableEmoji.name == event_obj.old_name).\
-                    update({'name': event_obj.new_name})
+            eng.rename_emoji(event_obj.old_name, event_obj.new_name)
+            get_app_bot().emoji_catalog.rename(event_obj.old_name, event_obj.new_name)
         case 'remove':
             event_obj = EmojiRemoved(event_dict)
             logg.debug('Attempting to remove an emoji')
             with eng.session_mgr() as session:
                 session.query(TableEmoji).filter(TableEmoji.name.in_(event_obj.names)).update({'is_deleted': True})
+            get_app_bot().emoji_catalog.remove(event_obj.names)
 
 
 @bolt_app.event('pin_added')
 def store_pins():
-    event_data = request.json
+    submit_event('general', _process_pin_added, event_dict=request.json['event'])
+
+
+def _process_pin_added(event_dict: Dict):
     logg = get_app_logger()
     eng = get_viktor_eng()
 
-    pin_obj = PinAdded(event_dict=event_data['event'])
+    pin_obj = PinAdded(event_dict=event_dict)
     tbl_obj = collect_pins(pin_obj=pin_obj, psql_client=eng, log=logg, is_event=True)
-    # Add to db
+    # Add to db. Unset columns are left out so their defaults apply.
+    quote_vals = {attr.key: getattr(tbl_obj, attr.key) for attr in TableQuote.__mapper__.column_attrs}
     with eng.session_mgr() as session:
-        matches = session.query(TableQuote).filter(and_(
-            TableQuote.message_timestamp == tbl_obj.message_timestamp,
-            TableQuote.link == tbl_obj.link
-        )).all()
-        if len(matches) == 0:
-            logg.debug('No duplicates found for item - proceeding with pin')
-            session.add(tbl_obj)
-            msg = 'Pin successfully added, kommanderovnik o7'
-        else:
-            logg.debug(f'{len(matches)} quote item(s) with duplicate link and message timestamp found '
-                       f'- aborting pin')
-            msg = 'o7 KOMMANDEROVNIK! ...pin... was not added...  I... have failed you.'
+        quote_id = session.execute(
+            insert(TableQuote).values({k: v for k, v in quote_vals.items() if v is not None}).
+            on_conflict_do_nothing(index_elements=[TableQuote.message_timestamp, TableQuote.link]).
+            returning(TableQuote.quote_id)
+        ).scalar()
+    if quote_id is not None:
+        logg.debug('No duplicates found for item - proceeding with pin')
+        msg = 'Pin successfully added, kommanderovnik o7'
+    else:
+        logg.debug('Quote item with duplicate link and message timestamp found - aborting pin')
+        msg = 'o7 KOMMANDEROVNIK! ...pin... was not added...  I... have failed you.'
 
     get_app_bot().st.send_message(channel=pin_obj.channel_id, message=msg)
 
 
 @bolt_app.event('pin_removed')
 def remove_pins():
-    event_data = request.json
+    submit_event('general', _process_pin_removed, event_dict=request.json['event'])
+
+
+def _process_pin_removed(event_dict: Dict):
     logg = get_app_logger()
     eng = get_viktor_eng()
-    pin_obj = PinRemoved(event_dict=event_data['event'])
+    pin_obj = PinRemoved(event_dict=event_dict)
     tbl_obj = collect_pins(pin_obj=pin_obj, psql_client=eng, log=logg, is_event=True)
     # Add to db
     with eng.session_mgr() as session:
@@ -302,9 +330,11 @@ def remove_pins():
 def notify_new_statuses():
     """Triggered when a user updates their profile info. Gets saved to global dict
     where we then report it in #general"""
-    event_data = request.json
-    event = event_data['event']
-    user_info = event['user']
+    submit_event('general', _process_user_change, event_dict=request.json['event'])
+
+
+def _process_user_change(event_dict: Dict):
+    user_info = event_dict['user']
     logg = get_app_logger()
     eng = get_viktor_eng()
 
@@ -1,4 +1,8 @@
 import time
+from typing import (
+    Callable,
+    Dict,
+)
 
 from flask import (
     current_app,
@@ -28,6 +32,18 @@ def get_app_bot():
     return current_app.extensions['bot']
 
 
+def submit_event(lane: str, func: Callable[[Dict], None], event_dict: Dict) -> bool:
+    """Hands an event off to the bot's worker pool. The worker runs it inside the current app's context
+    so the usual get_app_* helpers keep working once the request itself has been answered."""
+    app = current_app._get_current_object()
+
+    def _run():
+        with app.app_context():
+            func(event_dict)
+
+    return get_app_bot().event_pool.submit(lane, _run)
+
+
 def log_before():
     g.start_time = time.perf_counter()
 
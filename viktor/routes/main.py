@@ -4,6 +4,8 @@ from flask import (
     jsonify,
 )
 
+from viktor.routes.helpers import get_app_bot
+
 bp_main = Blueprint('main', __name__)
 
 
@@ -13,3 +15,8 @@ def get_app_info():
         'app_name': current_app.name,
         'version': current_app.config.get('VERSION')
     }), 200
+
+
+@bp_main.route('/stats', methods=['GET'])
+def get_perf_stats():
+    return jsonify(get_app_bot().get_perf_stats()), 200
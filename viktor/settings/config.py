@@ -47,6 +47,37 @@ class Common(object):
     LOG_LEVEL = 'DEBUG'
     PORT = 5003
 
+    # Worker pool for Slack events. lane name -> number of worker threads
+    EVENT_WORKER_LANES = {
+        'messages': 4,
+        'reactions': 2,
+        'general': 2,
+    }
+    EVENT_QUEUE_MAX_DEPTH = 500
+    EVENT_QUEUE_PUT_TIMEOUT = 1.0
+    EVENT_QUEUE_DRAIN_TIMEOUT = 10.0
+    # Ceiling on the number of reaction event keys held for deduplication
+    REACT_EVENT_MAX_KEYS = 50000
+    # Reaction counts are written to the emoji table every n seconds or after m reactions, whichever is first
+    REACTION_FLUSH_INTERVAL = 30.0
+    REACTION_FLUSH_MAX_PENDING = 200
+    # Read-through cache for user/channel lookups by slack hash
+    LOOKUP_CACHE_TTL = 300.0
+    LOOKUP_CACHE_MAX_SIZE = 2000
+    # Seconds between refreshes of the in-memory bot settings, so changes made by other processes get picked up
+    BOT_SETTINGS_POLL_INTERVAL = 60.0
+    # Channel stats: messages per page of history and number of channel tallies held in memory
+    CHANNEL_STATS_PAGE_SIZE = 200
+    CHANNEL_STATS_MAX_CHANNELS = 50
+    # Times a Slack api call is retried after a 429 before giving up
+    SLACK_MAX_RETRIES = 3
+    # Cache of the results of word lookups (etymology, translations, examples, lemmas), kept in memory & on disk.
+    #   Words that weren't found are cached for a shorter time
+    WORD_LOOKUP_CACHE_PATH = LOG_DIR.joinpath('word_lookups.sqlite')
+    WORD_LOOKUP_TTL = 30 * 86400.0
+    WORD_LOOKUP_NEGATIVE_TTL = 86400.0
+    WORD_LOOKUP_MAX_SIZE = 1000
+
     SECRETS = None
     SQLALCHEMY_DATABASE_URI = 'postgresql+psycopg2://{usr}:{pwd}@{host}:{port}/{database}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False